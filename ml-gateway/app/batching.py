@@ -0,0 +1,235 @@
+"""
+Dynamic micro-batching for model inference.
+
+Callers submit single items and get a Future back. A background thread
+collects pending items for up to ``max_wait_ms`` (or until ``max_batch_size``
+items are waiting), runs one batched call, and fans the results back out.
+The pending queue is bounded so overload turns into fast rejections
+(QueueFullError) instead of unbounded latency.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence
+
+from .metrics import Histogram, LATENCY_MS_BUCKETS, registry
+from .pools import EngineStoppedError, QueueFullError
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+_STOP = object()
+
+
+class BatchFuture(Future):
+    """Future that also reports how long its item queued and the size of the batch it ran in."""
+
+    def __init__(self):
+        super().__init__()
+        self.queue_wait_ms: Optional[float] = None
+        self.batch_size: Optional[int] = None
+
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued_at", "trace", "traced_at")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.future = BatchFuture()
+        self.enqueued_at = time.monotonic()
+        # Trace of the submitting request, if it is being traced
+        self.trace = tracing.current()
+        self.traced_at = time.perf_counter() if self.trace is not None else None
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into batched calls.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], Sequence[Any]],
+                 max_batch_size: int = 8, max_wait_ms: float = 10.0,
+                 max_queue_size: int = 0, retry_after: int = 1,
+                 workers: int = 1, name: str = "inference",
+                 group_key: Optional[Callable[[Any], Any]] = None):
+        """
+        Initialize the batcher.
+
+        Args:
+            process_batch: Function mapping a list of items to a list of results
+                of the same length and order
+            max_batch_size: Upper bound on items per batched call
+            max_wait_ms: How long the first item of a batch may wait for company
+            max_queue_size: Maximum items waiting for a batch (0 = unbounded)
+            retry_after: Seconds suggested to callers rejected by a full queue
+            workers: Number of threads forming and running batches concurrently
+            name: Name used for the worker thread and log lines
+            group_key: Optional function of an item; a collected batch is split so
+                each ``process_batch`` call only sees items with equal keys
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue_size = max(0, int(max_queue_size))
+        self.retry_after = retry_after
+        self.workers = max(1, int(workers))
+        self.name = name
+        self.group_key = group_key
+
+        self.batch_size_hist = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_hist = Histogram(LATENCY_MS_BUCKETS)
+        self.rejected = 0
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.max_queue_size)
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def submit(self, item: Any, block: bool = True, timeout: Optional[float] = None) -> BatchFuture:
+        """
+        Queue an item for inference and return a Future for its result.
+
+        Args:
+            item: Input passed (inside a list) to ``process_batch``
+            block: Wait for queue space instead of failing immediately when full
+            timeout: Maximum seconds to wait for queue space when blocking
+
+        Raises:
+            QueueFullError: The queue stayed full
+            EngineStoppedError: The batcher has been closed
+        """
+        if self._closed:
+            raise EngineStoppedError(f"{self.name} engine is shutting down", retry_after=self.retry_after)
+        self._ensure_started()
+        pending = _Pending(item)
+        try:
+            self._queue.put(pending, block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError(
+                f"{self.name} queue is full ({self.max_queue_size} pending)",
+                retry_after=self.retry_after,
+            )
+        return pending.future
+
+    def close(self):
+        """Stop accepting work and stop the worker once queued items have been processed."""
+        with self._lock:
+            self._closed = True
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(_STOP)
+        for thread in threads:
+            thread.join()
+
+    def reset_stats(self):
+        self.batch_size_hist.reset()
+        self.queue_wait_hist.reset()
+        with self._lock:
+            self.rejected = 0
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "max_queue_size": self.max_queue_size,
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "rejected": self.rejected,
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_ms": self.queue_wait_hist.snapshot(),
+        }
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if not self._threads and not self._closed:
+                for i in range(self.workers):
+                    thread = threading.Thread(
+                        target=self._run, name=f"{self.name}-batcher-{i}", daemon=True
+                    )
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stop = False
+            # The window is measured from the arrival of the oldest item so a
+            # steady trickle of requests can't postpone a batch indefinitely.
+            deadline = first.enqueued_at + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        nxt = self._queue.get(timeout=remaining)
+                    else:
+                        nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop = True
+                    break
+                batch.append(nxt)
+            if self.group_key is None:
+                self._run_batch(batch)
+            else:
+                groups: dict = {}
+                for pending in batch:
+                    groups.setdefault(self.group_key(pending.item), []).append(pending)
+                for group in groups.values():
+                    self._run_batch(group)
+            if stop:
+                return
+
+    def _run_batch(self, batch: List[_Pending]):
+        started = time.monotonic()
+        self.batch_size_hist.observe(len(batch))
+        for pending in batch:
+            wait_ms = (started - pending.enqueued_at) * 1000
+            pending.future.queue_wait_ms = wait_ms
+            pending.future.batch_size = len(batch)
+            self.queue_wait_hist.observe(wait_ms)
+            registry.observe("stage_duration_ms", wait_ms, stage="queue")
+
+        traced = [p for p in batch if p.trace is not None]
+        # Model stages are recorded once per batch and shared with each traced request in it
+        batch_trace = tracing.Trace(self.name) if traced else None
+        token = tracing.activate(batch_trace)
+        batch_start = time.perf_counter()
+        try:
+            results = self.process_batch([p.item for p in batch])
+            registry.observe("stage_duration_ms", (time.monotonic() - started) * 1000, stage="inference")
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"Batch function returned {len(results)} results for {len(batch)} inputs"
+                )
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(batch)} failed - {e}")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        finally:
+            tracing.deactivate(token)
+            batch_end = time.perf_counter()
+            for pending in traced:
+                pending.trace.add("batch_queue", pending.traced_at, batch_start)
+            # A request with several items in this batch (crops, video frames) gets its spans once
+            for trace in {id(p.trace): p.trace for p in traced}.values():
+                trace.add("batch", batch_start, batch_end, batch_size=len(batch))
+                trace.extend(batch_trace, batch_size=len(batch))
+
+        for pending, result in zip(batch, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
@@ -0,0 +1,153 @@
+"""
+Content-addressed cache of image detection results.
+
+Cameras and the frontend often resubmit byte-identical snapshots, so
+/detect/image looks results up by a hash of the uploaded bytes (plus the
+model and confidence threshold that produced them) before decoding or
+running inference. Entries expire after a TTL and the least recently used
+ones are evicted beyond ``max_entries``. The cache can be persisted to a
+JSON file on shutdown and reloaded on startup.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Thread-safe LRU + TTL cache of JSON-serializable detection results."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0, path: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum cached results (0 disables the cache)
+            ttl_seconds: Lifetime of an entry (0 = never expires)
+            path: JSON file used by load()/save() for persistence across restarts
+        """
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+        self.path = path
+
+        # key -> (expires_at wall-clock time, result); oldest use first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(data: bytes, model_name: str, conf_threshold: float, scope: str = "") -> str:
+        """Cache key for an upload: content hash scoped to the model, threshold and any other options."""
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return f"{model_name}|{conf_threshold:g}|{scope}|{digest}"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for ``key`` (refreshing its recency), or None."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, result: Dict):
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            self._entries[key] = (expires_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load(self):
+        """Load persisted entries from ``path``, dropping any that expired meanwhile."""
+        if not self.enabled or not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable result cache {self.path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, expires_at, result in stored.get("entries", []):
+                if expires_at and expires_at <= now:
+                    continue
+                self._entries[key] = (expires_at, result)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            count = len(self._entries)
+        logger.info(f"💾 Loaded {count} cached results from {self.path}")
+
+    def save(self):
+        """Write live entries to ``path`` (atomically, via a temp file and rename)."""
+        if not self.enabled or not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [
+                [key, expires_at, result]
+                for key, (expires_at, result) in self._entries.items()
+                if not expires_at or expires_at > now
+            ]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"entries": entries}, f)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        logger.info(f"💾 Saved {len(entries)} cached results to {self.path}")
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "persistent": bool(self.path),
+        }
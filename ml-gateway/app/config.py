@@ -2,12 +2,65 @@ from pydantic_settings import BaseSettings
 from typing import Optional
 
 class Settings(BaseSettings):
-    model_kind: str = "yolo"   # "yolo" or "detr"
-    hf_filename: str = "yolov8n.pt"  # Model name for ultralytics
+    model_kind: str = "detr"   # Default backend: "detr", "yolo" or "detr-onnx"
+    hf_filename: str = "yolov8n.pt"  # Model name for ultralytics (yolo backend)
+    onnx_model_path: str = "models/detr-onnx/model.onnx"  # Exported DETR graph (detr-onnx backend)
     conf_threshold: float = 0.25
     iou_threshold: float = 0.45
     video_fps_sample: int = 2
     video_max_frames: int = 120
+    video_sampling: str = "auto"  # "grab", "seek" or "auto" (seek when the frame step >= video_seek_min_step)
+    video_seek_min_step: int = 30  # Roughly the source GOP length; below this grabbing is cheaper than seeking
+    video_pipeline_depth: int = 4  # Sampled frames decoded/in inference ahead of the tracker
+    video_motion_threshold: float = 0.0  # Fraction of changed thumbnail pixels needed to rerun inference (0 = always run; e.g. 0.002 to skip static frames)
+    video_motion_max_skip: int = 10  # Force inference after this many consecutive unchanged frames
+    tracker_method: str = "centroid"  # "centroid" or "sort" (Kalman + IoU); overridable per request
+    tracker_max_disappeared: int = 30  # Sampled frames an object may go unseen before it is dropped
+    tracker_max_distance: float = 100.0  # Centroid tracker matching distance in pixels
+    tracker_iou_threshold: float = 0.3  # Minimum IoU for the SORT tracker to match a detection
+    model_preload: bool = True  # Load the default backend in the background at startup (False = on first request)
+    model_warmup: bool = True  # Run a synthetic frame through a backend after loading it, before serving
+    batch_max_size: int = 8  # Max images per batched forward pass
+    batch_window_ms: float = 10.0  # How long a request may wait for others to join its batch
+    inference_queue_max: int = 64  # Images waiting for a batch before /detect/image gets 429
+    tile_size: int = 0  # Split frames (or ROI regions) larger than this many pixels into tiles (0 = off)
+    tile_overlap: float = 0.2  # Fraction of a tile shared with its neighbours
+    tile_include_full: bool = True  # Also run the whole region once when tiling, for large objects
+    roi_config_path: Optional[str] = None  # JSON file of per-camera ROI polygons {"camera": [[x, y], ...]}
+    batch_images_max: int = 64  # Images (or archive members) per /detect/images request
+    batch_upload_max_mb: int = 256  # Largest /detect/images request body, all files together (0 = unlimited)
+    decode_min_side: int = 0  # Decode large JPEGs at 1/2-1/8 size while the short side stays >= this (0 = full size; DETR resizes to 800)
+    decode_workers: int = 4  # Threads for image decoding off the event loop
+    result_cache_size: int = 256  # Cached /detect/image results (0 disables the cache)
+    result_cache_ttl_seconds: float = 300.0  # Lifetime of a cached result (0 = no expiry)
+    result_cache_path: Optional[str] = None  # JSON file to persist the cache across restarts
+    video_upload_max_mb: int = 512  # Largest accepted video upload (0 = unlimited)
+    video_upload_dir: Optional[str] = None  # Where uploads are spooled for processing (default: system temp dir)
+    video_max_concurrency: int = 2  # Videos processed at once
+    video_queue_max: int = 4  # Videos allowed to wait for a free slot before 429
+    jobs_dir: str = "data/jobs"  # SQLite queue, spooled uploads and results of async video jobs
+    jobs_workers: int = 1  # Video jobs processed at once (0 disables the job API)
+    jobs_max_queued: int = 1000  # Queued jobs allowed before POST /jobs gets 429
+    jobs_max_frames: int = 0  # Sampled frames per job (0 = the whole video)
+    metrics_window_seconds: float = 60.0  # Span of the latency percentiles in /metrics and /metrics/prometheus
+    metrics_window_slices: int = 6  # Window granularity: the oldest 1/N of the window is dropped at a time
+    system_sample_seconds: float = 5.0  # Refresh interval of the system stats behind /health and /system
+    trace_requests: bool = False  # Trace every request (otherwise only requests sent with X-Trace: 1)
+    trace_header: bool = True  # Honour the X-Trace request header
+    trace_keep: int = 100  # Finished traces kept in memory for /debug/traces
+    trace_dir: Optional[str] = None  # Also write each trace there as Chrome trace JSON
+    profiling_enabled: bool = False  # Enable POST /debug/profile (sampling CPU profiler)
+    retry_after_seconds: int = 2  # Retry-After hint sent with 429/503 responses
+    serving_mode: str = "thread"  # "thread" (model in this process) or "process" (model worker pool)
+    model_workers: int = 1  # Model worker processes in process serving mode
+    torch_threads_per_worker: int = 0  # Intra-op threads per model worker, or for the whole process in thread mode (0 = torch default)
+    torch_optimization: str = "none"  # DETR CPU inference: "none" (eager fp32), "int8" (dynamic quantization) or "compile"
+    torch_channels_last: bool = False  # Keep DETR conv weights in channels-last (NHWC) layout
+    shm_slot_mb: int = 64  # Shared-memory frame buffer per model worker
+    stream_max_sessions: int = 8  # Concurrent long-running camera sessions
+    stream_count_window_seconds: float = 300.0  # Window for rolling per-camera counts
+    stream_reconnect_max_backoff_seconds: float = 30.0  # Cap on reconnect backoff for live sources
+    stream_allow_files: bool = False  # Allow local video files as stream sources (testing / demos)
     port: int = 8000
     hf_token: Optional[str] = None  # Keep for future use if needed
     
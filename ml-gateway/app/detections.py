@@ -0,0 +1,106 @@
+"""
+Detections kept as parallel NumPy arrays.
+
+Backends return one ``DetectionArrays`` per image: boxes (N x 4, x1 y1 x2 y2
+in pixels), scores and labels. Everything on the video path (crop merging,
+motion reuse, the tracker, request stats and the video encoders) reads the
+arrays directly, so a long clip with dense traffic never builds a
+``Detection``/``BBox`` model per box. Those models are only built for the
+image endpoints' JSON responses (``to_image_detections``).
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .schemas import ImageDetections, VideoDetections
+
+
+class DetectionArrays:
+    """Detections of one image as ``boxes`` (N, 4), ``scores`` (N,) and ``labels`` (N,) arrays."""
+
+    __slots__ = ("model", "boxes", "scores", "labels")
+
+    def __init__(self, model: str, boxes, scores, labels):
+        self.model = model
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        labels_array = np.empty(len(labels), dtype=object)
+        labels_array[:] = list(labels)
+        self.labels = labels_array
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def take(self, keep: np.ndarray) -> "DetectionArrays":
+        """The detections at indices (or mask) ``keep``, in that order."""
+        return DetectionArrays(self.model, self.boxes[keep], self.scores[keep], self.labels[keep])
+
+    def to_dicts(self) -> List[Dict]:
+        """Detections as plain dicts shaped like ``Detection.model_dump()``."""
+        return [
+            {"bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}, "label": label, "cls_id": None, "score": score}
+            for (x1, y1, x2, y2), label, score in zip(self.boxes.tolist(), self.labels.tolist(), self.scores.tolist())
+        ]
+
+    def to_image_detections(self) -> ImageDetections:
+        # Validating plain dicts in one call is over twice as fast as constructing each model
+        return ImageDetections.model_validate({"model": self.model, "detections": self.to_dicts()})
+
+
+class VideoFrame:
+    """One sampled frame of a processed video."""
+
+    __slots__ = ("frame_index", "time_sec", "detections", "inference_skipped")
+
+    def __init__(self, frame_index: int, time_sec: float, detections: DetectionArrays, inference_skipped: bool = False):
+        self.frame_index = frame_index
+        self.time_sec = time_sec
+        self.detections = detections
+        self.inference_skipped = inference_skipped
+
+    def to_dict(self) -> Dict:
+        """The frame shaped like ``VideoFrameDetections.model_dump()``."""
+        return {
+            "frame_index": self.frame_index,
+            "time_sec": self.time_sec,
+            "detections": self.detections.to_dicts(),
+            "inference_skipped": self.inference_skipped,
+        }
+
+
+class VideoResult:
+    """
+    A processed video: ``summary`` holds every ``VideoDetections`` field
+    except ``results``, which are kept as array-backed ``frames``.
+    """
+
+    def __init__(self, summary: VideoDetections, frames: Optional[List[VideoFrame]] = None):
+        self.summary = summary
+        self.frames = frames or []
+
+    def to_dict(self) -> Dict:
+        """The full ``VideoDetections`` layout as plain dicts and lists."""
+        content = self.summary.model_dump()
+        content["results"] = [frame.to_dict() for frame in self.frames]
+        return content
+
+    @classmethod
+    def from_dict(cls, content: Dict) -> "VideoResult":
+        """Rebuild a result from its full layout, e.g. a stored job result."""
+        frames = [
+            VideoFrame(
+                frame["frame_index"],
+                frame["time_sec"],
+                DetectionArrays(
+                    content["model"],
+                    [(d["bbox"]["x1"], d["bbox"]["y1"], d["bbox"]["x2"], d["bbox"]["y2"]) for d in frame["detections"]],
+                    [d["score"] for d in frame["detections"]],
+                    [d["label"] for d in frame["detections"]],
+                ),
+                frame.get("inference_skipped", False),
+            )
+            for frame in content.get("results", [])
+        ]
+        summary = VideoDetections.model_validate({**content, "results": []})
+        return cls(summary, frames)
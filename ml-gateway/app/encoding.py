@@ -0,0 +1,141 @@
+"""
+Response encodings for video results.
+
+The video pipeline keeps each frame's detections as the backend's arrays
+(``DetectionArrays``), so encoding a long clip with dense traffic never
+walks thousands of ``Detection``/``BBox`` models:
+
+- The default ``full`` layout keeps the ``VideoDetections`` schema. Plain
+  dicts are built straight from the arrays and serialized in one pass by
+  pydantic's Rust serializer.
+- The ``columnar`` layout stores each frame as flat arrays: boxes as
+  ``[x1, y1, x2, y2, x1, ...]``, scores, and label codes indexing a shared
+  ``labels`` table. It is cut from the concatenated arrays with vectorized
+  rounding and slicing, and is several times smaller. Boxes are rounded to
+  0.1 px and scores to 4 decimals; ``cls_id`` is omitted.
+
+Either layout is sent as JSON, or as MessagePack when the client's
+``Accept`` header asks for it and the ``msgpack`` package is installed.
+``orjson`` is used for the columnar JSON when available.
+"""
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pydantic_core
+
+from .detections import VideoResult
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+LAYOUTS = ("full", "columnar")
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+
+class NotAcceptableError(ValueError):
+    """The client accepts no encoding this server can produce."""
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Media type to answer with for an ``Accept`` header: MSGPACK_TYPE or JSON_TYPE.
+
+    Types are tried in order of their q-values (then header order). JSON is
+    the answer for a missing header or wildcards; MessagePack only when it is
+    asked for explicitly. Raises NotAcceptableError when only MessagePack is
+    acceptable and msgpack is not installed, or nothing supported is.
+    """
+    if not accept:
+        return JSON_TYPE
+    ranked = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ranked.append((-q, position, media_type.strip().lower()))
+    wanted_msgpack = False
+    for _, _, media_type in sorted(ranked):
+        if media_type in MSGPACK_TYPES:
+            if MSGPACK_AVAILABLE:
+                return MSGPACK_TYPE
+            wanted_msgpack = True
+        elif media_type in (JSON_TYPE, "application/*", "*/*"):
+            return JSON_TYPE
+    if wanted_msgpack:
+        raise NotAcceptableError("MessagePack responses need the msgpack package (pip install msgpack)")
+    raise NotAcceptableError(f"Supported response types: {JSON_TYPE}, {MSGPACK_TYPE}")
+
+
+def columnar_video(res: VideoResult) -> Dict:
+    """``res`` in the columnar layout (see the module docstring)."""
+    dets = [frame.detections for frame in res.frames]
+    if dets:
+        boxes = np.round(np.concatenate([d.boxes for d in dets]), 1)
+        scores = np.round(np.concatenate([d.scores for d in dets]), 4)
+        labels = np.concatenate([d.labels for d in dets]).tolist()
+    else:
+        boxes, scores, labels = np.empty((0, 4)), np.empty(0), []
+    label_codes: Dict[str, int] = {}
+    codes = [label_codes.setdefault(label, len(label_codes)) for label in labels]
+
+    frames: List[Dict] = []
+    start = 0
+    for frame in res.frames:
+        end = start + len(frame.detections)
+        frames.append({
+            "frame_index": frame.frame_index,
+            "time_sec": frame.time_sec,
+            "inference_skipped": frame.inference_skipped,
+            "boxes": boxes[start:end].ravel().tolist(),
+            "scores": scores[start:end].tolist(),
+            "labels": codes[start:end],
+        })
+        start = end
+    summary = res.summary
+    return {
+        "layout": "columnar",
+        "model": summary.model,
+        "total_frames": summary.total_frames,
+        "processed_frames": summary.processed_frames,
+        "fps_sample": summary.fps_sample,
+        "labels": list(label_codes),
+        "results": frames,
+        "counts_by_label": summary.counts_by_label,
+        "tracking_info": summary.tracking_info,
+    }
+
+
+def encode_video(res: VideoResult, layout: str, media_type: str) -> Tuple[bytes, str]:
+    """Encode a video result; returns (body, content type)."""
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}'. Available: {', '.join(LAYOUTS)}")
+    if media_type == MSGPACK_TYPE:
+        content = res.to_dict() if layout == "full" else columnar_video(res)
+        # Single-precision floats: pixel coordinates and scores do not need more
+        return msgpack.packb(content, use_single_float=True), MSGPACK_TYPE
+    if layout == "full":
+        return pydantic_core.to_json(res.to_dict()), JSON_TYPE
+    content = columnar_video(res)
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content), JSON_TYPE
+    return json.dumps(content, separators=(",", ":")).encode(), JSON_TYPE
@@ -1,38 +1,297 @@
+import logging
+import threading
+import time
 import numpy as np
-from PIL import Image
-from .schemas import Detection, BBox, ImageDetections
+import psutil
+from typing import Dict, List, Optional
+from .detections import DetectionArrays
 from .config import settings
+from .batching import BatchFuture, MicroBatcher
+from .pools import BackpressureError
+from .models import MODELS, create_model, model_class, set_torch_threads
+from .regions import Crop, RegionPlanner, merge_crop_results, to_pixels
+from .serving import ProcessModelPool
 
-# DETR via Transformers
-from transformers import pipeline
+logger = logging.getLogger(__name__)
+
+WARMUP_FRAME_SHAPE = (720, 1280, 3)  # A typical camera frame
+
+
+def _frame_shape(img_bgr: np.ndarray):
+    return img_bgr.shape
 
 class Detector:
+    def __init__(self, backend: Optional[str] = None):
+        model_cls = model_class(backend or settings.model_kind)
+        self.model_name = model_cls.model_name
+        self.backend = model_cls.backend
+        self.serving_mode = settings.serving_mode
+        self.model = None
+        self.pool = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+
+        if self.serving_mode == "process":
+            # Weights live only in the worker processes; frames reach them via shared memory
+            self.pool = ProcessModelPool(
+                workers=settings.model_workers,
+                torch_threads=settings.torch_threads_per_worker,
+                slot_mb=settings.shm_slot_mb,
+                backend=self.backend,
+                retry_after=settings.retry_after_seconds,
+            )
+            predict_batch = self.pool.predict_batch
+            batch_workers = self.pool.workers_count
+        elif self.serving_mode == "thread":
+            set_torch_threads(settings.torch_threads_per_worker)
+            self.model = create_model(self.backend)
+            predict_batch = self.model.predict_batch
+            batch_workers = 1
+        else:
+            raise ValueError(f"Unknown serving_mode '{self.serving_mode}' (expected 'thread' or 'process')")
+
+        # Concurrent predict_image/submit calls are coalesced into batched forward passes.
+        # Frames are grouped by shape, so no backend has to stack unequal arrays and tiles
+        # are not padded up to the size of their frame's full-region crop.
+        self.batcher = MicroBatcher(
+            predict_batch,
+            max_batch_size=settings.batch_max_size,
+            max_wait_ms=settings.batch_window_ms,
+            max_queue_size=settings.inference_queue_max,
+            retry_after=settings.retry_after_seconds,
+            workers=batch_workers,
+            name=f"inference-{self.backend}",
+            group_key=_frame_shape,
+        )
+        self.regions = RegionPlanner(
+            tile_size=settings.tile_size,
+            tile_overlap=settings.tile_overlap,
+            include_full=settings.tile_include_full,
+        )
+
+    def submit(self, img_bgr: np.ndarray, block: bool = True,
+               timeout: Optional[float] = None, roi: Optional[np.ndarray] = None) -> BatchFuture:
+        """
+        Queue a BGR frame for batched inference; the Future resolves to DetectionArrays.
+        With block=False a full queue raises QueueFullError instead of waiting.
+
+        With an ROI polygon (or when the frame exceeds the configured tile
+        size) the frame is split into crops that are batched together and
+        merged back into full-frame coordinates.
+        """
+        if roi is not None:
+            roi = to_pixels(roi, img_bgr.shape)
+        crops = self.regions.crops(img_bgr.shape, roi)
+        if roi is None and len(crops) == 1:
+            return self.batcher.submit(img_bgr, block=block, timeout=timeout)
+
+        parts: List[BatchFuture] = []
+        try:
+            for x0, y0, x1, y1 in crops:
+                parts.append(self.batcher.submit(img_bgr[y0:y1, x0:x1], block=block, timeout=timeout))
+        except Exception:
+            for part in parts:
+                part.cancel()
+            raise
+        return self._merge(parts, crops, roi)
+
+    def _merge(self, parts: List[BatchFuture], crops: List[Crop], roi: Optional[np.ndarray]) -> BatchFuture:
+        """Future that resolves to the merged detections once every crop is done."""
+        merged = BatchFuture()
+        remaining = [len(parts)]
+        lock = threading.Lock()
+
+        def part_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            merged.queue_wait_ms = max((p.queue_wait_ms or 0.0) for p in parts)
+            merged.batch_size = max((p.batch_size or 0) for p in parts)
+            try:
+                results = [p.result() for p in parts]
+                merged.set_result(merge_crop_results(results, crops, roi, settings.iou_threshold))
+            except Exception as e:
+                merged.set_exception(e)
+
+        for part in parts:
+            part.add_done_callback(part_done)
+        return merged
+
+    def warmup(self):
+        """
+        Run a synthetic frame end to end so the first real request does not pay
+        for lazy allocations, thread-pool start-up or compilation.
+        """
+        frame = np.full(WARMUP_FRAME_SHAPE, 114, dtype=np.uint8)
+        if self.pool is not None:
+            # Every worker process has its own model to warm
+            self.pool.warmup(frame)
+        else:
+            self.submit(frame).result()
+        # Keep the warmup batch out of the batching stats
+        self.batcher.reset_stats()
+
+    def predict_image(self, img_bgr: np.ndarray) -> DetectionArrays:
+        return self.submit(img_bgr).result()
+
+    def close(self):
+        self.batcher.close()
+        if self.pool is not None:
+            self.pool.close()
+
+    def serving_info(self) -> dict:
+        info = {"mode": self.serving_mode}
+        if self.pool is not None:
+            info.update(self.pool.stats())
+        return info
+
+# Loaded backends, keyed by name; the default one (settings.model_kind) is
+# normally loaded in the background at startup by ``model_loader``
+_detectors: Dict[str, Detector] = {}
+_detectors_lock = threading.Lock()
+# One lock per backend, so loading one backend's weights never blocks another
+_load_locks: Dict[str, threading.Lock] = {}
+
+
+class ModelLoadingError(BackpressureError):
+    """The requested backend is still being loaded in the background."""
+
+    status_code = 503
+
+
+def _load(backend: str) -> Detector:
+    """Construct (and optionally warm up) a Detector; called with the backend's load lock held."""
+    start = time.perf_counter()
+    det = Detector(backend)
+    loaded = time.perf_counter()
+    if settings.model_warmup:
+        det.warmup()
+    det.load_seconds = round(loaded - start, 3)
+    det.warmup_seconds = round(time.perf_counter() - loaded, 3) if settings.model_warmup else None
+    logger.info(
+        f"🧠 '{backend}' backend ready: load {det.load_seconds:.2f}s"
+        + (f", warmup {det.warmup_seconds:.2f}s" if det.warmup_seconds is not None else "")
+    )
+    return det
+
+
+def get_detector(backend: Optional[str] = None) -> Detector:
+    """
+    Detector for ``backend`` (the default one if None), loading it on first use.
+
+    Raises ModelLoadingError while the background loader is still working on
+    that backend, so requests are answered with 503 + Retry-After instead of
+    hanging until the weights are in memory.
+    """
+    backend = backend or settings.model_kind
+    if backend not in MODELS:
+        raise ValueError(f"Unknown model backend '{backend}'. Available: {', '.join(MODELS)}")
+    det = _detectors.get(backend)
+    if det is not None:
+        return det
+    if model_loader.loading(backend):
+        raise ModelLoadingError(f"Model backend '{backend}' is still loading", retry_after=settings.retry_after_seconds)
+    return _load_once(backend)
+
+
+def _load_once(backend: str) -> Detector:
+    """Load ``backend`` unless another thread already has; waits only on loads of the same backend."""
+    with _detectors_lock:
+        lock = _load_locks.setdefault(backend, threading.Lock())
+    with lock:
+        det = _detectors.get(backend)
+        if det is None:
+            logger.info(f"🧠 Loading '{backend}' backend")
+            det = _load(backend)
+            with _detectors_lock:
+                _detectors[backend] = det
+        return det
+
+
+def default_detector() -> Optional[Detector]:
+    """The default backend's Detector if it is loaded, without triggering a load."""
+    return _detectors.get(settings.model_kind)
+
+
+def loaded_detectors() -> List[Detector]:
+    return list(_detectors.values())
+
+
+def close_detectors():
+    with _detectors_lock:
+        detectors = list(_detectors.values())
+        _detectors.clear()
+    for d in detectors:
+        d.close()
+
+
+class ModelLoader:
+    """
+    Loads the default backend on a background thread so the server can bind
+    and answer liveness probes right away; readiness flips once the weights
+    are loaded and a warmup frame has gone through.
+    """
+
     def __init__(self):
-        # Use DETR via Transformers pipeline
-        self.pipe = pipeline("object-detection", model="facebook/detr-resnet-50")
-        self.model_name = "facebook/detr-resnet-50"
-        self.backend = "detr"
-
-    def predict_image(self, img_bgr: np.ndarray) -> ImageDetections:
-        # Convert BGR (OpenCV) to RGB as most models expect RGB
-        img_rgb = img_bgr[:, :, ::-1]
-        
-        # DETR pipeline expects PIL Image
-        img_pil = Image.fromarray(img_rgb)
-        preds = self.pipe(img_pil)  # list of dicts with 'box' and 'score'/'label'
-        
-        # Filter detections by confidence threshold
-        dets = []
-        for p in preds:
-            if float(p["score"]) >= settings.conf_threshold:
-                box = p["box"]
-                dets.append(Detection(
-                    bbox=BBox(x1=float(box["xmin"]), y1=float(box["ymin"]),
-                              x2=float(box["xmax"]), y2=float(box["ymax"])),
-                    label=str(p["label"]),
-                    score=float(p["score"]),
-                    cls_id=None
-                ))
-        return ImageDetections(model=self.model_name, detections=dets)
-
-detector = Detector()
\ No newline at end of file
+        self.backend = settings.model_kind
+        self.state = "idle"  # idle -> loading -> ready | failed
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Begin loading in the background (no-op if already started)."""
+        if self._thread is not None:
+            return
+        # Everything before this point (imports, app construction) is "boot"
+        self.timings["boot_s"] = round(time.time() - psutil.Process().create_time(), 3)
+        self.state = "loading"
+        self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            det = _load_once(self.backend)
+        except Exception as e:
+            self.state = "failed"
+            self.error = f"{type(e).__name__}: {e}"
+            logger.error(f"❌ Loading '{self.backend}' backend failed: {self.error}")
+            return
+        self.timings["model_load_s"] = det.load_seconds
+        if det.warmup_seconds is not None:
+            self.timings["warmup_s"] = det.warmup_seconds
+        self.timings["ready_after_s"] = round(self.timings["boot_s"] + time.perf_counter() - start, 3)
+        self.state = "ready"
+        logger.info(
+            f"🚀 Ready {self.timings['ready_after_s']:.2f}s after process start "
+            f"(boot {self.timings['boot_s']:.2f}s, model load {det.load_seconds:.2f}s"
+            + (f", warmup {det.warmup_seconds:.2f}s)" if det.warmup_seconds is not None else ")")
+        )
+
+    def loading(self, backend: str) -> bool:
+        return self.state == "loading" and backend == self.backend
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until loading has finished (successfully or not); True if ready."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    @property
+    def ready(self) -> bool:
+        # Without preloading the default backend is loaded by the first request instead
+        return self.state == "ready" or (self.state == "idle" and not settings.model_preload)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "backend": self.backend,
+            "error": self.error,
+            "timings": self.timings,
+        }
+
+
+model_loader = ModelLoader()
@@ -0,0 +1,182 @@
+"""
+Turning request bytes into frames for the detector with as few copies as possible.
+
+Frames are BGR uint8 arrays throughout the service (that is what OpenCV
+decodes and what video capture yields). Three things keep ingestion cheap:
+
+- Large JPEGs can be decoded at 1/2, 1/4 or 1/8 size (``IMREAD_REDUCED_*``)
+  when the model would shrink them to its input size anyway; detections
+  are scaled back to the original resolution.
+- Raw uint8 frames with a shape header skip decoding entirely; the request
+  body is wrapped in an array view, and RGB frames become a channel-reversed
+  view rather than a converted copy.
+- Frames are handed to PIL in one pass that also swaps channels, instead of
+  materializing a reversed copy first.
+
+Batch uploads may also arrive as a zip or tar archive of images.
+"""
+
+import io
+import os
+import tarfile
+import zipfile
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .detections import DetectionArrays
+
+RAW_FORMATS = ("bgr", "rgb")
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+ARCHIVE_TYPES = ("application/zip", "application/x-zip-compressed", "application/x-tar", "application/gzip")
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+
+# (name, data, error) for each image in an upload; data is None when error is set
+ArchiveMember = Tuple[str, Optional[bytes], Optional[str]]
+
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def peek_jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) of a JPEG from its header alone, or None for other formats."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.size if img.format == "JPEG" else None
+    except Exception:
+        return None
+
+
+def reduction_factor(width: int, height: int, min_side: int) -> int:
+    """Largest of 1/2/4/8 that keeps the short side at or above ``min_side``."""
+    if min_side <= 0:
+        return 1
+    short = min(width, height)
+    factor = 1
+    for f in (2, 4, 8):
+        if short // f >= min_side:
+            factor = f
+    return factor
+
+
+def decode_image(data: bytes, min_side: int = 0) -> Tuple[Optional[np.ndarray], int]:
+    """
+    Decode an encoded image to BGR.
+
+    Args:
+        data: Encoded image bytes
+        min_side: Short side the model needs; larger JPEGs are decoded reduced
+            down to it (0 always decodes at full size)
+
+    Returns:
+        (frame or None if undecodable, reduction factor applied)
+    """
+    factor = 1
+    if min_side > 0:
+        size = peek_jpeg_size(data)
+        if size is not None:
+            factor = reduction_factor(size[0], size[1], min_side)
+    # frombuffer wraps the bytes without copying; the decoder writes straight into the frame
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), _REDUCED_FLAGS[factor])
+    return img, factor
+
+
+def parse_frame_shape(value: Optional[str]) -> Tuple[int, int, int]:
+    """Parse a raw-frame shape header such as "720x1280x3" (height x width x channels)."""
+    if not value:
+        raise ValueError("Raw frames need a shape header, e.g. X-Frame-Shape: 720x1280x3")
+    try:
+        dims = [int(v) for v in value.lower().replace(",", "x").split("x")]
+    except ValueError:
+        raise ValueError(f"Invalid frame shape '{value}'") from None
+    if len(dims) == 2:
+        dims.append(3)
+    if len(dims) != 3 or dims[2] != 3 or dims[0] <= 0 or dims[1] <= 0:
+        raise ValueError(f"Frame shape must be HxWx3, got '{value}'")
+    return dims[0], dims[1], dims[2]
+
+
+def frame_from_bytes(data: bytes, shape: Sequence[int], fmt: str = "bgr") -> np.ndarray:
+    """
+    Zero-copy BGR view of a raw uint8 frame.
+
+    RGB input is returned as a channel-reversed view of the same buffer;
+    ``to_pil_rgb`` recognizes that layout and reads it as RGB directly.
+    """
+    if fmt not in RAW_FORMATS:
+        raise ValueError(f"Unknown frame format '{fmt}'. Available: {', '.join(RAW_FORMATS)}")
+    expected = int(np.prod(shape))
+    if len(data) != expected:
+        raise ValueError(f"Frame is {len(data)} bytes but shape {'x'.join(map(str, shape))} needs {expected}")
+    frame = np.frombuffer(data, np.uint8).reshape(shape)
+    return frame[:, :, ::-1] if fmt == "rgb" else frame
+
+
+def to_pil_rgb(img_bgr: np.ndarray) -> Image.Image:
+    """RGB PIL image from a BGR frame, swapping channels in PIL's single unpacking copy."""
+    height, width = img_bgr.shape[:2]
+    if img_bgr.flags.c_contiguous:
+        return Image.frombuffer("RGB", (width, height), img_bgr, "raw", "BGR", 0, 1)
+    rgb = img_bgr[:, :, ::-1]
+    if rgb.flags.c_contiguous:
+        # BGR view over an RGB buffer (raw RGB uploads)
+        return Image.frombuffer("RGB", (width, height), rgb, "raw", "RGB", 0, 1)
+    # Crops and other strided views: one contiguous copy, then the same single pass
+    return Image.frombuffer("RGB", (width, height), np.ascontiguousarray(img_bgr), "raw", "BGR", 0, 1)
+
+
+def scale_detections(result: DetectionArrays, factor: float) -> DetectionArrays:
+    """Scale detection boxes from a reduced decode back to the original resolution."""
+    if factor == 1:
+        return result
+    return DetectionArrays(result.model, result.boxes * factor, result.scores, result.labels)
+
+
+def is_archive(filename: Optional[str], content_type: Optional[str]) -> bool:
+    return (filename or "").lower().endswith(ARCHIVE_SUFFIXES) or (content_type or "") in ARCHIVE_TYPES
+
+
+def read_archive(data: bytes, max_members: int, max_member_bytes: int) -> List[ArchiveMember]:
+    """
+    Image members of a zip or tar(.gz) archive, in archive order.
+
+    Members are checked against ``max_member_bytes`` before extraction, so an
+    oversized (or maliciously compressed) entry becomes a per-item error
+    instead of being inflated. Raises ValueError for an unreadable archive or
+    more than ``max_members`` images.
+    """
+    members: List[ArchiveMember] = []
+
+    def add(name: str, size: int, read):
+        if not name.lower().endswith(IMAGE_SUFFIXES) or os.path.basename(name).startswith("."):
+            return
+        if len(members) >= max_members:
+            raise ValueError(f"Archive holds more than {max_members} images")
+        if size > max_member_bytes:
+            members.append((name, None, f"File size must be less than {max_member_bytes // (1024 * 1024)}MB"))
+        else:
+            members.append((name, read(), None))
+
+    buffer = io.BytesIO(data)
+    if zipfile.is_zipfile(buffer):
+        with zipfile.ZipFile(buffer) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    add(info.filename, info.file_size, lambda: archive.read(info))
+        return members
+
+    buffer.seek(0)
+    try:
+        with tarfile.open(fileobj=buffer, mode="r:*") as archive:
+            for info in archive:
+                if info.isfile():
+                    add(info.name, info.size, lambda: archive.extractfile(info).read())
+    except tarfile.TarError as e:
+        raise ValueError("Not a readable zip or tar archive") from e
+    return members
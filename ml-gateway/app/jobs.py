@@ -0,0 +1,347 @@
+"""
+Asynchronous video jobs backed by a local SQLite queue.
+
+A job is submitted with an uploaded file or a URL and returns immediately;
+worker threads claim queued jobs, run the normal video pipeline on them and
+write the result to a JSON file next to the database. Progress (processed
+frames, ETA) is stored as the job runs, so clients poll or long-poll the job
+instead of holding a connection open for the whole video.
+
+The queue survives restarts: jobs that were running when the process
+stopped are put back in the queue on startup and run again from the start.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+import pydantic_core
+
+from .pools import QueueFullError
+from .detections import VideoResult
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL = (SUCCEEDED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    upload_path TEXT,
+    tracker TEXT,
+    model TEXT,
+    roi TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL,
+    processed_frames INTEGER NOT NULL DEFAULT 0,
+    expected_frames INTEGER NOT NULL DEFAULT 0,
+    eta_seconds REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    counts_by_label TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobStore:
+    """Job records in SQLite; safe to share between threads."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def create(self, source: str, upload_path: Optional[str], tracker: Optional[str],
+               model: Optional[str], roi: Optional[list]) -> Dict:
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, status, source, upload_path, tracker, model, roi, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, source, upload_path, tracker, model, json.dumps(roi) if roi is not None else None, now, now),
+        )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        if status:
+            rows = self._execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = self._execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def count(self, status: str) -> int:
+        return self._execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def claim_next(self) -> Optional[Dict]:
+        """Atomically move the oldest queued job to running and return it."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, updated_at = ?, attempts = attempts + 1 "
+                "WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1) RETURNING *",
+                (RUNNING, now, now, QUEUED),
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def progress(self, job_id: str, processed: int, expected: int, eta_seconds: float):
+        self._execute(
+            "UPDATE jobs SET processed_frames = ?, expected_frames = ?, eta_seconds = ?, updated_at = ? WHERE id = ?",
+            (processed, expected, round(eta_seconds, 1), time.time(), job_id),
+        )
+
+    def finish(self, job_id: str, status: str, processed: int = 0,
+               counts_by_label: Optional[Dict[str, int]] = None, error: Optional[str] = None):
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, updated_at = ?, processed_frames = MAX(processed_frames, ?), "
+            "eta_seconds = NULL, error = ?, counts_by_label = ? WHERE id = ?",
+            (status, now, now, processed, error,
+             json.dumps(counts_by_label) if counts_by_label is not None else None, job_id),
+        )
+
+    def cancel_queued(self, job_id: str) -> bool:
+        now = time.time()
+        cur = self._execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (CANCELLED, now, now, job_id, QUEUED),
+        )
+        return cur.rowcount > 0
+
+    def requeue_running(self) -> int:
+        """Put jobs interrupted by a shutdown or crash back in the queue."""
+        cur = self._execute(
+            "UPDATE jobs SET status = ?, started_at = NULL, processed_frames = 0, eta_seconds = NULL, updated_at = ? "
+            "WHERE status = ?",
+            (QUEUED, time.time(), RUNNING),
+        )
+        return cur.rowcount
+
+    def delete(self, job_id: str):
+        self._execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["roi"] = json.loads(job["roi"]) if job["roi"] else None
+        job["counts_by_label"] = json.loads(job["counts_by_label"]) if job["counts_by_label"] else None
+        return job
+
+
+class JobQueue:
+    """Runs queued video jobs on a fixed number of worker threads."""
+
+    def __init__(self, directory: str, workers: int = 1, max_queued: int = 1000,
+                 max_frames: int = 0, retry_after: int = 1):
+        """
+        Initialize the queue (call start() to begin processing).
+
+        Args:
+            directory: Holds jobs.sqlite3, uploads/ and results/
+            workers: Jobs processed at once
+            max_queued: Queued jobs allowed before submissions get 429
+            max_frames: Sampled frames per job (0 = the whole video)
+            retry_after: Seconds suggested to rejected clients
+        """
+        self.directory = directory
+        self.upload_dir = os.path.join(directory, "uploads")
+        self.result_dir = os.path.join(directory, "results")
+        self.workers_count = max(0, int(workers))
+        self.max_queued = max(1, int(max_queued))
+        self.max_frames = max(0, int(max_frames))
+        self.retry_after = retry_after
+        self.store: Optional[JobStore] = None
+
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: Dict[str, threading.Event] = {}  # job id -> stop event
+
+    def start(self):
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.result_dir, exist_ok=True)
+        self.store = JobStore(os.path.join(self.directory, "jobs.sqlite3"))
+        self._stopping.clear()
+        requeued = self.store.requeue_running()
+        if requeued:
+            logger.info(f"📋 Re-queued {requeued} video jobs interrupted by the last shutdown")
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"video-job-{i}", daemon=True)
+            for i in range(self.workers_count)
+        ]
+        for t in self._threads:
+            t.start()
+        logger.info(f"📋 Video job queue started with {self.workers_count} workers ({self.store.count(QUEUED)} queued)")
+
+    @property
+    def started(self) -> bool:
+        return self.store is not None
+
+    def submit(self, source: str, upload_path: Optional[str] = None, tracker: Optional[str] = None,
+               model: Optional[str] = None, roi: Optional[np.ndarray] = None) -> Dict:
+        """Queue a job; raises QueueFullError when ``max_queued`` jobs are already waiting."""
+        if self.store.count(QUEUED) >= self.max_queued:
+            raise QueueFullError(
+                f"Video job queue is full ({self.max_queued} queued)", retry_after=self.retry_after
+            )
+        job = self.store.create(source, upload_path, tracker, model, roi.tolist() if roi is not None else None)
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancel a queued job, or ask a running one to stop after its current frame."""
+        if self.store.cancel_queued(job_id):
+            self._remove_upload(self.store.get(job_id))
+        else:
+            stop = self._running.get(job_id)
+            if stop is not None:
+                stop.set()
+        return self.store.get(job_id)
+
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.result_dir, f"{job_id}.json")
+
+    def delete(self, job_id: str):
+        """Remove a finished job's record, upload and result file."""
+        self._remove_upload(self.store.get(job_id))
+        self.store.delete(job_id)
+        try:
+            os.unlink(self.result_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def stop(self):
+        """Stop the workers; jobs still running are re-queued on the next start."""
+        if not self.started:
+            return
+        self._stopping.set()
+        for stop in list(self._running.values()):
+            stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        deadline = time.monotonic() + 10
+        for t in self._threads:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
+        busy = [t.name for t in self._threads if t.is_alive()]
+        if busy:
+            # Closing the database now would fail their final writes; they hold their own
+            # reference and the connection is closed when the last of them lets go of it
+            logger.warning(f"📋 Video job workers still finishing after shutdown: {', '.join(busy)}")
+        else:
+            self.store.close()
+        self.store = None
+        self._threads = []
+
+    def _worker(self):
+        from .infer import model_loader
+        # This worker's store: stop() may drop self.store while a job is still finishing
+        store = self.store
+        # Re-queued jobs would otherwise fail while the default model is still loading
+        model_loader.wait()
+        while not self._stopping.is_set():
+            job = store.claim_next()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=1.0)
+                continue
+            self._run(store, job)
+
+    def _run(self, store: "JobStore", job: Dict):
+        # Imported here: the video module pulls in the detector front-end
+        from .video import _process_video
+
+        job_id = job["id"]
+        stop = threading.Event()
+        self._running[job_id] = stop
+        logger.info(f"📋 Job {job_id} started: {job['source']}")
+        roi = np.asarray(job["roi"], dtype=np.float64) if job["roi"] else None
+        try:
+            res = _process_video(
+                job["upload_path"] or job["source"],
+                stop_event=stop,
+                tracker_method=job["tracker"],
+                roi=roi,
+                backend=job["model"],
+                max_frames=self.max_frames,
+                on_progress=lambda processed, expected, eta: store.progress(job_id, processed, expected, eta),
+            )
+            if self._stopping.is_set():
+                # Shutting down mid-job: leave it running in the store so start() re-queues it
+                return
+            summary = res.summary
+            if stop.is_set():
+                store.finish(job_id, CANCELLED, summary.processed_frames)
+                logger.info(f"📋 Job {job_id} cancelled after {summary.processed_frames} frames")
+            else:
+                self._write_result(job_id, res)
+                store.finish(job_id, SUCCEEDED, summary.processed_frames, summary.counts_by_label)
+                logger.info(f"📋 Job {job_id} succeeded: {summary.processed_frames} frames, counts {summary.counts_by_label}")
+        except Exception as e:
+            if self._stopping.is_set():
+                return
+            logger.error(f"📋 Job {job_id} failed: {e}")
+            store.finish(job_id, FAILED, error=f"{type(e).__name__}: {e}")
+        finally:
+            self._running.pop(job_id, None)
+            if not self._stopping.is_set():
+                self._remove_upload(job)
+
+    @staticmethod
+    def _remove_upload(job: Optional[Dict]):
+        if job and job["upload_path"]:
+            try:
+                os.unlink(job["upload_path"])
+            except FileNotFoundError:
+                pass
+
+    def _write_result(self, job_id: str, result: VideoResult):
+        path = self.result_path(job_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pydantic_core.to_json(result.to_dict()))
+        os.replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        if not self.started:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "workers": self.workers_count,
+            "running": len(self._running),
+            "queued": self.store.count(QUEUED),
+            "max_queued": self.max_queued,
+        }
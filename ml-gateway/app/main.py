@@ -1,26 +1,46 @@
 import os
-import tempfile
+import asyncio
+import json
 import shutil
 import time
 import logging
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from typing import List, Optional
 import numpy as np
 import cv2
-import psutil
-try:
-    import torch
-    TORCH_AVAILABLE = True
-except ImportError:
-    TORCH_AVAILABLE = False
 
-from .schemas import ImageDetections, VideoDetections
-from .infer import detector
-from .video import detect_on_video
+from .schemas import (
+    BatchImageDetections, BatchImageResult, ImageDetections, VideoDetections, VideoJob, StreamStartRequest
+)
+from .config import settings
+from .infer import (
+    Detector, close_detectors, default_detector, get_detector, loaded_detectors, model_loader
+)
+from .models import MODELS, model_class
+from .video import detect_on_video, open_video_stream, video_pool
+from .pools import BackpressureError, BoundedExecutor
+from .streams import stream_manager
+from .tracker import TRACKERS
+from .cache import ResultCache
+from .regions import camera_roi, parse_polygon, to_pixels
+from .uploads import UploadLimitMiddleware, save_upload
+from .jobs import JobQueue, TERMINAL
+from .metrics import MetricsMiddleware, registry
+from .sysinfo import SystemSampler
+from . import tracing
+from .tracing import TraceMiddleware, TraceStore
+from .profiler import ProfilerBusyError, profiler
+from .encoding import JSON_TYPE, LAYOUTS, NotAcceptableError, encode_video, negotiate
+from .detections import VideoResult
+from .ingest import (
+    decode_image, frame_from_bytes, is_archive, parse_frame_shape, read_archive, scale_detections
+)
 
 # Setup enhanced logging
 logging.basicConfig(
@@ -29,71 +49,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# System information functions
-def get_gpu_info():
-    """Get GPU information if available"""
-    gpu_info = {
-        "available": False,
-        "device": "cpu",
-        "memory_used_mb": 0,
-        "memory_total_mb": 0,
-        "utilization_percent": 0
-    }
-    
-    if not TORCH_AVAILABLE:
-        return gpu_info
-    
-    try:
-        # Check for CUDA (NVIDIA)
-        if torch.cuda.is_available():
-            gpu_info["available"] = True
-            gpu_info["device"] = f"cuda:{torch.cuda.current_device()}"
-            gpu_info["name"] = torch.cuda.get_device_name(0)
-            
-            # Get memory info
-            memory_reserved = torch.cuda.memory_reserved(0)
-            memory_allocated = torch.cuda.memory_allocated(0)
-            gpu_info["memory_used_mb"] = round(memory_allocated / 1024**2, 2)
-            gpu_info["memory_total_mb"] = round(memory_reserved / 1024**2, 2)
-            
-        # Check for MPS (Apple Silicon)
-        elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
-            gpu_info["available"] = True
-            gpu_info["device"] = "mps:0"
-            gpu_info["name"] = "Apple Silicon GPU (MPS)"
-            # MPS doesn't provide detailed memory stats like CUDA
-            gpu_info["memory_used_mb"] = "N/A"
-            gpu_info["memory_total_mb"] = "N/A"
-            gpu_info["utilization_percent"] = "N/A"
-            
-    except Exception as e:
-        logger.warning(f"Could not get GPU info: {e}")
-    
-    return gpu_info
+VEHICLE_TYPES = ('car', 'truck', 'bus', 'motorcycle')
 
-def calculate_detection_stats(detections):
-    """Calculate statistics from detection results"""
-    vehicles = 0
-    total_confidence = 0.0
-    vehicle_types = ['car', 'truck', 'bus', 'motorcycle']
-    
-    for detection in detections:
-        total_confidence += detection.score
-        if detection.label.lower() in vehicle_types:
-            vehicles += 1
-    
-    accuracy = (total_confidence / len(detections) * 100) if detections else 95.0
+def tally_detections(scores, labels, tally: Optional[dict] = None) -> dict:
+    """Add detections' scores and labels to a running tally, e.g. frame by frame"""
+    if tally is None:
+        tally = {"count": 0, "vehicles": 0, "confidence": 0.0}
+    tally["count"] += len(scores)
+    tally["confidence"] += float(np.sum(scores))
+    tally["vehicles"] += sum(1 for label in labels if label.lower() in VEHICLE_TYPES)
+    return tally
+
+def stats_from_tally(tally: dict) -> dict:
+    """Dashboard statistics from a tally built with tally_detections"""
+    accuracy = (tally["confidence"] / tally["count"] * 100) if tally["count"] else 95.0
     
     return {
-        'vehicles_detected': vehicles,
+        'vehicles_detected': tally["vehicles"],
         'accuracy': round(accuracy, 1)
     }
 
-def update_last_detection_run(detections, processing_time_ms, detection_type):
+def calculate_detection_stats(detections):
+    """Calculate statistics from detection results"""
+    return stats_from_tally(tally_detections([d.score for d in detections], [d.label for d in detections]))
+
+def record_last_detection_run(stats, processing_time_ms, detection_type):
     """Update the last detection run tracking"""
     global last_detection_run
-    stats = calculate_detection_stats(detections)
-    
     last_detection_run.update({
         "timestamp": datetime.utcnow().isoformat(),
         "vehicles_detected": stats['vehicles_detected'],
@@ -121,11 +103,13 @@ def reset_performance_metrics():
     }
     logger.info("🔄 Performance metrics reset to zero")
 
+SERVICE_START_TIME = time.time()
+
 performance_metrics = {
     "requests_count": 0,
     "average_response_time": 0,
     "total_detections": 0,
-    "start_time": time.time()
+    "start_time": SERVICE_START_TIME
 }
 
 # Last detection run tracking
@@ -137,7 +121,83 @@ last_detection_run = {
     "detection_type": None
 }
 
-app = FastAPI(title="ML Gateway", version="0.1.0")
+# Image decoding runs here so large uploads don't stall the event loop
+decode_pool = BoundedExecutor(
+    "decode",
+    max_workers=settings.decode_workers,
+    max_pending=settings.inference_queue_max,
+    retry_after=settings.retry_after_seconds,
+)
+
+# /health and /system read this snapshot instead of querying psutil per request
+system_sampler = SystemSampler(settings.system_sample_seconds)
+
+trace_store = TraceStore(settings.trace_keep, settings.trace_dir)
+
+# Results for byte-identical uploads are served without decoding or inference
+result_cache = ResultCache(
+    max_entries=settings.result_cache_size,
+    ttl_seconds=settings.result_cache_ttl_seconds,
+    path=settings.result_cache_path,
+)
+
+# Service root (the directory holding app/); relative JOBS_DIR values resolve against it
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Long videos are queued here and processed in the background (see /jobs)
+job_queue = JobQueue(
+    os.path.join(SERVICE_DIR, settings.jobs_dir),
+    workers=settings.jobs_workers,
+    max_queued=settings.jobs_max_queued,
+    max_frames=settings.jobs_max_frames,
+    retry_after=settings.retry_after_seconds,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    result_cache.load()
+    system_sampler.start()
+    if settings.model_preload:
+        # Weights load in the background; /ready reports when requests can be served
+        model_loader.start()
+    if settings.jobs_workers > 0:
+        job_queue.start()
+    try:
+        yield
+    finally:
+        # Refuse new work with 503 and let queued batches finish
+        stream_manager.stop_all()
+        system_sampler.stop()
+        job_queue.stop()
+        close_detectors()
+        decode_pool.shutdown(wait=False)
+        video_pool.shutdown(wait=False)
+        try:
+            result_cache.save()
+        except Exception as e:
+            logger.warning(f"Could not persist result cache: {e}")
+
+app = FastAPI(title="ML Gateway", version="0.1.0", lifespan=lifespan)
+
+@app.exception_handler(BackpressureError)
+async def backpressure_handler(request: Request, exc: BackpressureError):
+    logger.warning(f"Rejected {request.method} {request.url.path} with {exc.status_code}: {exc}")
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+VIDEO_UPLOAD_MAX_BYTES = settings.video_upload_max_mb * 1024 * 1024
+BATCH_UPLOAD_MAX_BYTES = settings.batch_upload_max_mb * 1024 * 1024
+
+# Oversized uploads are refused from their Content-Length, or once a chunked body passes the limit
+app.add_middleware(
+    UploadLimitMiddleware,
+    paths=("/detect/video", "/detect/video/stream", "/jobs"),
+    max_bytes=VIDEO_UPLOAD_MAX_BYTES,
+)
+app.add_middleware(UploadLimitMiddleware, paths=("/detect/images",), max_bytes=BATCH_UPLOAD_MAX_BYTES)
 
 # Add CORS middleware to allow frontend access
 app.add_middleware(
@@ -148,31 +208,45 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Requests sent with X-Trace: 1 (or all, with TRACE_REQUESTS) get a span breakdown
+app.add_middleware(
+    TraceMiddleware,
+    store=trace_store,
+    always=settings.trace_requests,
+    header=settings.trace_header,
+)
+
+# Outermost, so rejections by the middlewares above are timed and counted too
+app.add_middleware(MetricsMiddleware, registry=registry, skip=("/metrics/prometheus",))
+
 @app.get("/health")
-def health():
+async def health():
+    """Service status with the latest system sample (refreshed every SYSTEM_SAMPLE_SECONDS)"""
     uptime = time.time() - performance_metrics["start_time"]
-    
-    # Get system information
-    memory = psutil.virtual_memory()
-    cpu_percent = psutil.cpu_percent(interval=0.05)  # Faster, less blocking call
-    gpu_info = get_gpu_info()
+    sample = system_sampler.snapshot()
+    memory = sample.get("memory", {})
     
     return {
         "status": "ok",
         "timestamp": datetime.utcnow().isoformat(),
         "model": {
-            "name": detector.model_name,
-            "backend": "detr"
+            "name": model_class(settings.model_kind).model_name,
+            "backend": settings.model_kind,
+            "serving_mode": settings.serving_mode,
+            "ready": model_loader.ready,
+            "available_backends": list(MODELS),
+            "loaded_backends": [d.backend for d in loaded_detectors()]
         },
         "system": {
             "uptime_seconds": round(uptime, 2),
-            "cpu_usage_percent": cpu_percent,
+            "cpu_usage_percent": sample.get("cpu", {}).get("usage_percent"),
             "memory": {
-                "total_gb": round(memory.total / (1024**3), 2),
-                "available_gb": round(memory.available / (1024**3), 2),
-                "used_percent": memory.percent
+                "total_gb": memory.get("total_gb"),
+                "available_gb": memory.get("available_gb"),
+                "used_percent": memory.get("used_percent")
             },
-            "gpu": gpu_info
+            "gpu": sample.get("gpu"),
+            "sampled_at": sample["timestamp"]
         },
         "performance": {
             "total_requests": performance_metrics["requests_count"],
@@ -182,10 +256,26 @@ def health():
         }
     }
 
+@app.get("/health/live")
+async def live():
+    """Minimal liveness probe: no system calls, answered on the event loop"""
+    return PlainTextResponse("ok")
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the default model is loaded and warmed up, 503 before"""
+    status = model_loader.status()
+    return JSONResponse(
+        status,
+        status_code=200 if status["ready"] else 503,
+        headers={} if status["ready"] else {"Retry-After": str(settings.retry_after_seconds)},
+    )
+
 @app.get("/metrics")
 def get_metrics():
     """Get real-time performance metrics"""
     uptime = time.time() - performance_metrics["start_time"]
+    detector = default_detector()
     return {
         "timestamp": datetime.utcnow().isoformat(),
         "uptime_seconds": round(uptime, 2),
@@ -194,70 +284,54 @@ def get_metrics():
         "avg_response_time_ms": round(performance_metrics["average_response_time"] * 1000, 2),
         "requests_per_minute": round(performance_metrics["requests_count"] / (uptime / 60), 2) if uptime > 0 else 0,
         "detections_per_request": round(performance_metrics["total_detections"] / performance_metrics["requests_count"], 2) if performance_metrics["requests_count"] > 0 else 0,
-        "last_detection_run": last_detection_run
+        "last_detection_run": last_detection_run,
+        "latency": registry.snapshot(),
+        "batching": detector.batcher.stats() if detector else None,
+        "serving": detector.serving_info() if detector else None,
+        "backends": {
+            d.backend: {"model": d.model_name, "batching": d.batcher.stats(), "serving": d.serving_info()}
+            for d in loaded_detectors()
+        },
+        "result_cache": result_cache.stats(),
+        "jobs": job_queue.stats(),
+        "workers": {
+            "decode": decode_pool.stats(),
+            "video": video_pool.stats()
+        }
     }
 
+@app.get("/metrics/prometheus")
+def get_prometheus_metrics():
+    """Request and stage latency summaries, request counters and queue gauges in Prometheus text format"""
+    gauges = [("uptime_seconds", {}, time.time() - SERVICE_START_TIME)]
+    gauges += [("batch_queue_depth", {"backend": d.backend}, d.batcher.stats()["queue_depth"]) for d in loaded_detectors()]
+    gauges += [("worker_in_flight", {"pool": name}, pool.stats()["in_flight"])
+               for name, pool in (("decode", decode_pool), ("video", video_pool))]
+    jobs = job_queue.stats()
+    if jobs["enabled"]:
+        gauges += [("jobs", {"state": "queued"}, jobs["queued"]), ("jobs", {"state": "running"}, jobs["running"])]
+    gauges.append(("result_cache_entries", {}, result_cache.stats()["entries"]))
+    return PlainTextResponse(registry.prometheus(gauges), media_type="text/plain; version=0.0.4")
+
 @app.get("/system")
-def get_system_metrics():
-    """Get real-time system performance metrics (CPU, Memory, GPU)"""
-    try:
-        # CPU information
-        cpu_percent = psutil.cpu_percent(interval=0.05)
-        cpu_count = psutil.cpu_count()
-        cpu_freq = psutil.cpu_freq()
-        
-        # Memory information
-        memory = psutil.virtual_memory()
-        swap = psutil.swap_memory()
-        
-        # Disk information
-        disk = psutil.disk_usage('/')
-        
-        # GPU information
-        gpu_info = get_gpu_info()
-        
-        # Process information
-        process = psutil.Process()
-        process_memory = process.memory_info()
-        
-        return {
-            "timestamp": datetime.utcnow().isoformat(),
-            "cpu": {
-                "usage_percent": cpu_percent,
-                "count": cpu_count,
-                "frequency_mhz": round(cpu_freq.current, 2) if cpu_freq else None,
-                "load_average": psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None
-            },
-            "memory": {
-                "total_gb": round(memory.total / (1024**3), 2),
-                "available_gb": round(memory.available / (1024**3), 2),
-                "used_gb": round(memory.used / (1024**3), 2),
-                "used_percent": memory.percent,
-                "swap_used_gb": round(swap.used / (1024**3), 2),
-                "swap_percent": swap.percent
-            },
-            "disk": {
-                "total_gb": round(disk.total / (1024**3), 2),
-                "free_gb": round(disk.free / (1024**3), 2),
-                "used_percent": round((disk.used / disk.total) * 100, 1)
-            },
-            "gpu": gpu_info,
-            "process": {
-                "memory_mb": round(process_memory.rss / (1024**2), 2),
-                "cpu_percent": process.cpu_percent()
-            }
-        }
-    except Exception as e:
-        logger.error(f"Error getting system metrics: {e}")
-        return {
-            "error": f"Could not retrieve system metrics: {str(e)}",
-            "timestamp": datetime.utcnow().isoformat()
-        }
+async def get_system_metrics():
+    """Latest system performance sample (CPU, Memory, Disk, GPU, process), refreshed in the background"""
+    sample = system_sampler.snapshot()
+    return {**sample, "age_seconds": round(time.time() - sample["sampled_at"], 2)}
 
 @app.post("/metrics/reset")
 def reset_metrics():
-    """Reset all performance metrics to zero"""
+    """
+    Reset the dashboard counters and pool statistics. The windowed latency
+    percentiles age out on their own, and the Prometheus counters stay
+    monotonic so scrapers never see them go backwards.
+    """
     reset_performance_metrics()
+    for d in loaded_detectors():
+        d.batcher.reset_stats()
+    decode_pool.reset_stats()
+    video_pool.reset_stats()
+    result_cache.reset_stats()
     return {
         "status": "success",
         "message": "All performance metrics have been reset to zero",
@@ -265,8 +339,59 @@ def reset_metrics():
         "reset_time": time.time()
     }
 
+@app.get("/debug/traces")
+def list_traces():
+    """Most recent traced requests, newest first"""
+    return trace_store.list()
+
+@app.get("/debug/traces/{trace_id}")
+def get_trace(trace_id: str, format: str = Query(default="chrome", description="chrome (Trace Event JSON) or summary")):
+    """A finished request trace; open the chrome format in chrome://tracing, Perfetto or speedscope"""
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (it may have been evicted)")
+    if format == "summary":
+        return {
+            "id": trace.id,
+            "request": trace.name,
+            "duration_ms": round(((trace.end or time.perf_counter()) - trace.start) * 1000, 2),
+            "spans": [{"name": name, "total_ms": round(ms, 3), "count": count} for name, ms, count in trace.summary()],
+        }
+    return trace.chrome_trace()
+
+@app.post("/debug/profile")
+async def profile_cpu(
+    seconds: float = Query(default=5.0, gt=0, le=60, description="How long to sample"),
+    interval_ms: float = Query(default=5.0, ge=1, le=1000, description="Time between stack samples"),
+    format: str = Query(default="collapsed", description="collapsed (flamegraph/speedscope input) or json (per-function table)")
+):
+    """Sample the stacks of every thread in this process for a few seconds (PROFILING_ENABLED only)"""
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILING_ENABLED=true)")
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'json'")
+    logger.info(f"🔬 Recording a {seconds:.1f}s CPU profile")
+    try:
+        result = await run_in_threadpool(profiler.record, seconds, interval_ms)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "json":
+        return result.top()
+    return PlainTextResponse(result.collapsed())
+
+IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+# A 4K BGR frame is ~25MB
+RAW_FRAME_MAX_BYTES = 64 * 1024 * 1024
+
 @app.post("/detect/image", response_model=ImageDetections)
-async def detect_image(request: Request, file: UploadFile = File(...)):
+async def detect_image(
+    request: Request,
+    file: UploadFile = File(...),
+    roi: Optional[str] = Query(default=None, description="ROI polygon as JSON [[x, y], ...]"),
+    camera: Optional[str] = Query(default=None, description="Camera name whose configured ROI to use"),
+    model: Optional[str] = Query(default=None, description="Model backend: detr, yolo or detr-onnx")
+):
     request_id = str(uuid.uuid4())[:8]
     start_time = time.time()
     
@@ -277,90 +402,556 @@ async def detect_image(request: Request, file: UploadFile = File(...)):
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        if file.size and file.size > 10 * 1024 * 1024:  # 10MB limit
+        if file.size and file.size > IMAGE_MAX_BYTES:  # 10MB limit
             raise HTTPException(status_code=400, detail="File size must be less than 10MB")
         
-        data = await file.read()
-        np_arr = np.frombuffer(data, np.uint8)
-        img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        if img is None:
-            raise ValueError("Not an image or unsupported format")
-        
-        # Perform inference
-        inference_start = time.time()
-        result = detector.predict_image(img)
-        inference_time = time.time() - inference_start
-        
-        # Update performance metrics
-        total_time = time.time() - start_time
-        performance_metrics["requests_count"] += 1
-        performance_metrics["total_detections"] += len(result.detections)
-        
-        # Update average response time
-        current_avg = performance_metrics["average_response_time"]
-        count = performance_metrics["requests_count"]
-        performance_metrics["average_response_time"] = (current_avg * (count - 1) + total_time) / count
-        
-        # Update last detection run
-        update_last_detection_run(result.detections, total_time * 1000, "image")
-        
-        logger.info(f"Request {request_id}: Completed - {len(result.detections)} detections in {inference_time:.3f}s (total: {total_time:.3f}s)")
-        
-        return JSONResponse(result.model_dump())
+        polygon = _resolve_roi(roi, camera)
+        det = await _get_detector(model)
+        with tracing.span("read_upload"):
+            data = await file.read()
+        # Tiling exists to find small distant objects, so it always gets the full resolution
+        min_side = 0 if settings.tile_size else settings.decode_min_side
+
+        async def load():
+            img, factor = await decode_pool.run(_decode, data, min_side)
+            if img is None:
+                raise ValueError("Not an image or unsupported format")
+            return img, factor
+
+        return await _run_detection(request_id, start_time, det, data, load, polygon, f"reduce={min_side}")
         
     except HTTPException:
         logger.warning(f"Request {request_id}: HTTP error - {file.filename}")
         raise
+    except BackpressureError:
+        raise
     except Exception as e:
         logger.error(f"Request {request_id}: Unexpected error - {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/detect/frame", response_model=ImageDetections)
+async def detect_frame(
+    request: Request,
+    x_frame_shape: Optional[str] = Header(default=None, description="Frame shape as HxWx3, e.g. 720x1280x3"),
+    x_frame_format: str = Header(default="bgr", description="Channel order of the raw pixels: bgr or rgb"),
+    roi: Optional[str] = Query(default=None, description="ROI polygon as JSON [[x, y], ...]"),
+    camera: Optional[str] = Query(default=None, description="Camera name whose configured ROI to use"),
+    model: Optional[str] = Query(default=None, description="Model backend: detr, yolo or detr-onnx")
+):
+    """Detect objects in a raw uint8 frame sent as the request body (no decoding)"""
+    request_id = str(uuid.uuid4())[:8]
+    start_time = time.time()
+
+    try:
+        content_length = int(request.headers.get("content-length") or 0)
+        if content_length > RAW_FRAME_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Raw frames are limited to {RAW_FRAME_MAX_BYTES // (1024 * 1024)}MB")
+        fmt = x_frame_format.lower()
+        try:
+            shape = parse_frame_shape(x_frame_shape)
+            polygon = _resolve_roi(roi, camera)
+            det = await _get_detector(model)
+            with tracing.span("read_body"):
+                data = await request.body()
+            # A view over the request body; the pixels are not copied until the model reads them
+            frame = frame_from_bytes(data, shape, fmt)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        logger.info(f"Request {request_id}: Raw frame detection started - {shape[1]}x{shape[0]} {fmt}")
+
+        async def load():
+            return frame, 1
+
+        return await _run_detection(request_id, start_time, det, data, load, polygon, f"raw={fmt}:{shape}")
+
+    except (HTTPException, BackpressureError):
+        raise
+    except Exception as e:
+        logger.error(f"Request {request_id}: Unexpected error - {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+async def _detect(det: Detector, data: bytes, load, polygon, scope: str):
+    """
+    Cache lookup, frame loading and batched inference for one image.
+
+    Returns (result, cache hit, inference seconds, queue seconds, batch size).
+    """
+    cache_scope = f"roi={polygon.tolist() if polygon is not None else None};tile={settings.tile_size};{scope}"
+    cache_key = ResultCache.key(data, det.model_name, settings.conf_threshold, cache_scope)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return ImageDetections(**cached), True, 0.0, 0.0, 0
+
+    img, factor = await load()
+    roi_px = None
+    if polygon is not None:
+        # ROI coordinates refer to the original resolution, not a reduced decode
+        roi_px = to_pixels(polygon, (img.shape[0] * factor, img.shape[1] * factor)) / factor
+
+    # Perform inference; awaiting the batcher lets concurrent requests share a forward pass.
+    # A full queue is rejected right away (429) rather than adding latency for everyone.
+    inference_start = time.time()
+    with tracing.span("inference"):
+        future = det.submit(img, block=False, roi=roi_px)
+        # Detection models are only built here, for the JSON response and the cache
+        result = scale_detections(await asyncio.wrap_future(future), factor).to_image_detections()
+    inference_time = time.time() - inference_start
+    result_cache.put(cache_key, result.model_dump())
+    return result, False, inference_time, (future.queue_wait_ms or 0.0) / 1000, future.batch_size
+
+def _decode(data: bytes, min_side: int):
+    """decode_image on a decode worker, timed as the "decode" stage"""
+    start = time.perf_counter()
+    with tracing.span("decode"):
+        out = decode_image(data, min_side)
+    registry.observe("stage_duration_ms", (time.perf_counter() - start) * 1000, stage="decode")
+    return out
+
+def _serialize(result, **kwargs) -> JSONResponse:
+    """JSONResponse for a pydantic result, timed as the "serialization" stage"""
+    start = time.perf_counter()
+    with tracing.span("serialize"):
+        response = JSONResponse(result.model_dump(), **kwargs)
+    registry.observe("stage_duration_ms", (time.perf_counter() - start) * 1000, stage="serialization")
+    return response
+
+def _serialize_video(res: VideoResult, layout: str, media_type: str, **kwargs) -> Response:
+    """Encoded video result (see app/encoding.py), timed as the "serialization" stage"""
+    start = time.perf_counter()
+    with tracing.span("serialize"):
+        body, content_type = encode_video(res, layout, media_type)
+    registry.observe("stage_duration_ms", (time.perf_counter() - start) * 1000, stage="serialization")
+    return Response(body, media_type=content_type, **kwargs)
+
+def _video_encoding(layout: str, accept: Optional[str]) -> str:
+    """Validate the layout and negotiate the media type before any work is done"""
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Unknown layout '{layout}'. Available: {', '.join(LAYOUTS)}")
+    try:
+        return negotiate(accept)
+    except NotAcceptableError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+def _record_request(detections, total_time: float, detection_type: str):
+    _record_totals(len(detections), calculate_detection_stats(detections), total_time, detection_type)
+
+def _record_totals(detection_count: int, stats: dict, total_time: float, detection_type: str):
+    # Only called from the event loop, so these updates never race
+    performance_metrics["requests_count"] += 1
+    performance_metrics["total_detections"] += detection_count
+    
+    # Update average response time
+    current_avg = performance_metrics["average_response_time"]
+    count = performance_metrics["requests_count"]
+    performance_metrics["average_response_time"] = (current_avg * (count - 1) + total_time) / count
+    
+    # Update last detection run
+    record_last_detection_run(stats, total_time * 1000, detection_type)
+
+async def _run_detection(request_id: str, start_time: float, det: Detector, data: bytes,
+                         load, polygon, scope: str) -> JSONResponse:
+    """Single-image detection with metrics, shared by the image endpoints"""
+    result, cached, inference_time, queue_time, batch_size = await _detect(det, data, load, polygon, scope)
+    total_time = time.time() - start_time
+    _record_request(result.detections, total_time, "image")
+    
+    trace = tracing.current()
+    trace_note = f", trace: {trace.id}" if trace is not None else ""
+    logger.info(f"Request {request_id}: Completed - {len(result.detections)} detections in {inference_time:.3f}s (queued: {queue_time:.3f}s, batch: {batch_size}, cache: {'hit' if cached else 'miss'}, total: {total_time:.3f}s{trace_note})")
+    
+    return _serialize(
+        result,
+        headers={
+            "X-Queue-Time-Ms": f"{queue_time * 1000:.1f}",
+            "X-Cache": "hit" if cached else "miss"
+        }
+    )
+
+@app.post("/detect/images", response_model=BatchImageDetections)
+async def detect_images(
+    files: List[UploadFile] = File(..., description="Images, or a single zip/tar archive of images"),
+    roi: Optional[str] = Query(default=None, description="ROI polygon as JSON [[x, y], ...], applied to every image"),
+    camera: Optional[str] = Query(default=None, description="Camera name whose configured ROI to use"),
+    model: Optional[str] = Query(default=None, description="Model backend: detr, yolo or detr-onnx")
+):
+    """
+    Detect objects in many images in one call. Images are decoded in parallel
+    and share batched forward passes; results come back in upload (or archive)
+    order, each with its own status so one bad image does not fail the rest.
+    """
+    request_id = str(uuid.uuid4())[:8]
+    start_time = time.time()
+
+    polygon = _resolve_roi(roi, camera)
+    det = await _get_detector(model)
+
+    # UploadLimitMiddleware has capped the body, so the spooled files fit in BATCH_UPLOAD_MAX_BYTES
+    items = []  # (filename, data or None, error or None)
+    for upload in files:
+        if is_archive(upload.filename, upload.content_type):
+            with tracing.span("read_upload"):
+                data = await upload.read()
+            try:
+                items += await run_in_threadpool(
+                    read_archive, data, settings.batch_images_max, IMAGE_MAX_BYTES
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"{upload.filename}: {e}")
+        elif not upload.content_type or not upload.content_type.startswith('image/'):
+            items.append((upload.filename, None, "File must be an image"))
+        elif upload.size and upload.size > IMAGE_MAX_BYTES:
+            items.append((upload.filename, None, "File size must be less than 10MB"))
+        else:
+            with tracing.span("read_upload"):
+                data = await upload.read()
+            items.append((upload.filename, data, None))
+    if len(items) > settings.batch_images_max:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_images_max} images per request")
+
+    logger.info(f"Request {request_id}: Batch detection started - {len(items)} images")
+    min_side = 0 if settings.tile_size else settings.decode_min_side
+
+    async def detect_one(index: int, filename: Optional[str], data: Optional[bytes], error: Optional[str]):
+        if error is not None:
+            return BatchImageResult(index=index, filename=filename, status=400, error=error)
+
+        async def load():
+            img, factor = await decode_pool.run(_decode, data, min_side)
+            if img is None:
+                raise ValueError("Not an image or unsupported format")
+            return img, factor
+
+        try:
+            result, cached, _, _, _ = await _detect(det, data, load, polygon, f"reduce={min_side}")
+        except BackpressureError as e:
+            # Only this image was refused; the client can resend it alone
+            return BatchImageResult(index=index, filename=filename, status=e.status_code, error=str(e))
+        except ValueError as e:
+            return BatchImageResult(index=index, filename=filename, status=400, error=str(e))
+        except Exception as e:
+            logger.error(f"Request {request_id}: image {index} ({filename}) failed - {e}")
+            return BatchImageResult(index=index, filename=filename, status=500, error=f"Internal server error: {e}")
+        return BatchImageResult(index=index, filename=filename, result=result, cached=cached)
+
+    # All images are admitted at once so their frames land in the same micro-batches
+    results = await asyncio.gather(*(detect_one(i, *item) for i, item in enumerate(items)))
+
+    detections = [d for r in results if r.result is not None for d in r.result.detections]
+    failed = sum(1 for r in results if r.error is not None)
+    total_time = time.time() - start_time
+    _record_request(detections, total_time, "images")
+    logger.info(f"Request {request_id}: Batch completed - {len(items) - failed}/{len(items)} images, {len(detections)} detections in {total_time:.3f}s")
+
+    return _serialize(BatchImageDetections(model=det.model_name, count=len(results), failed=failed, results=results))
+
+VIDEO_URL_PREFIXES = ("http://", "https://", "rtsp://", "rtmp://")
+
+def _resolve_roi(roi: Optional[str], camera: Optional[str]):
+    """ROI polygon from the request, else the one configured for the camera"""
+    try:
+        polygon = parse_polygon(roi)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if polygon is None and camera:
+        polygon = camera_roi(settings.roi_config_path, camera)
+        if polygon is None:
+            raise HTTPException(status_code=400, detail=f"No ROI configured for camera '{camera}'")
+    return polygon
+
+def _load_detector(model: Optional[str]) -> Detector:
+    """Detector for the requested backend, loading it on first use"""
+    if model and model not in MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown model backend '{model}'. Available: {', '.join(MODELS)}")
+    try:
+        return get_detector(model)
+    except BackpressureError:
+        raise
+    except Exception as e:
+        backend = model or settings.model_kind
+        logger.error(f"Failed to load '{backend}' backend: {e}")
+        raise HTTPException(status_code=503, detail=f"Model backend '{backend}' is unavailable: {e}")
+
+async def _get_detector(model: Optional[str]) -> Detector:
+    # Loading weights can take seconds, so keep it off the event loop
+    return await run_in_threadpool(_load_detector, model)
+
+def _check_tracker(tracker: Optional[str]):
+    if tracker is not None and tracker not in TRACKERS:
+        raise HTTPException(status_code=400, detail=f"Unknown tracker '{tracker}'. Available: {', '.join(TRACKERS)}")
+
+def _video_headers(res: VideoResult) -> dict:
+    queue_time_ms = (res.summary.tracking_info or {}).get("queue_time_ms", 0.0)
+    return {"X-Queue-Time-Ms": f"{queue_time_ms:.1f}"}
+
 @app.post("/detect/video", response_model=VideoDetections)
 async def detect_video(
     file: Optional[UploadFile] = File(None),
-    source_url: Optional[str] = Query(default=None, description="HTTP/HTTPS/RTSP URL")
+    source_url: Optional[str] = Query(default=None, description="HTTP/HTTPS/RTSP URL"),
+    tracker: Optional[str] = Query(default=None, description="Tracker engine: centroid or sort"),
+    roi: Optional[str] = Query(default=None, description="ROI polygon as JSON [[x, y], ...]"),
+    camera: Optional[str] = Query(default=None, description="Camera name whose configured ROI to use"),
+    model: Optional[str] = Query(default=None, description="Model backend: detr, yolo or detr-onnx"),
+    layout: str = Query(default="full", description="full (VideoDetections) or columnar (per-frame flat arrays)"),
+    accept: Optional[str] = Header(default=None, description="application/json (default) or application/msgpack")
 ):
     # Allow either an uploaded file OR a URL; prefer file if both provided
     if file is None and not source_url:
         raise HTTPException(status_code=400, detail="Provide a video file or source_url")
+    media_type = _video_encoding(layout, accept)
+    _check_tracker(tracker)
+    polygon = _resolve_roi(roi, camera)
+    await _get_detector(model)
 
     start_time = time.time()
     try:
         if file is not None:
-            # Handle uploaded video file
-            with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
-                tmp.write(await file.read())
-                tmp_path = tmp.name
+            # Handle uploaded video file; it is copied to disk in chunks, never read whole into memory
+            with tracing.span("save_upload"):
+                tmp_path = await save_upload(file, VIDEO_UPLOAD_MAX_BYTES, settings.video_upload_dir)
             try:
-                res = await detect_on_video(tmp_path)
-                
-                # Calculate total detections from all frames for last run tracking
-                all_detections = []
-                for frame_result in res.results:
-                    all_detections.extend(frame_result.detections)
-                
-                # Update last detection run
-                total_time = time.time() - start_time
-                update_last_detection_run(all_detections, total_time * 1000, "video")
-                
-                return JSONResponse(res.model_dump())
+                res = await detect_on_video(tmp_path, tracker, polygon, model)
             finally:
                 os.unlink(tmp_path)
         else:
             # Handle video URL
-            if not source_url.startswith(("http://", "https://", "rtsp://", "rtmp://")):
+            if not source_url.startswith(VIDEO_URL_PREFIXES):
                 raise ValueError("Invalid URL format. Must start with http://, https://, rtsp://, or rtmp://")
-            res = await detect_on_video(source_url)
-            
-            # Calculate total detections from all frames for last run tracking
-            all_detections = []
-            for frame_result in res.results:
-                all_detections.extend(frame_result.detections)
-            
-            # Update last detection run
-            total_time = time.time() - start_time
-            update_last_detection_run(all_detections, total_time * 1000, "video")
-            
-            return JSONResponse(res.model_dump())
+            res = await detect_on_video(source_url, tracker, polygon, model)
+
+        # Request metrics and last run tracking, tallied from the per-frame arrays
+        tally = tally_detections([], [])
+        for frame in res.frames:
+            tally_detections(frame.detections.scores, frame.detections.labels, tally)
+        _record_totals(tally["count"], stats_from_tally(tally), time.time() - start_time, "video")
+
+        return _serialize_video(res, layout, media_type, headers=_video_headers(res))
+    except (HTTPException, BackpressureError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Video processing error: {str(e)}")
+
+async def _encode_video_events(events, start_time: float, sse: bool, cleanup_path: Optional[str]):
+    """Serialize video events as NDJSON lines (or SSE messages) as they arrive"""
+    # Stats accumulate frame by frame, so the stream never holds every detection
+    tally = tally_detections([], [])
+    try:
+        async for event in events:
+            if event["type"] == "frame":
+                detections = event["detections"]
+                tally_detections([d["score"] for d in detections], [d["label"] for d in detections], tally)
+            elif event["type"] == "summary":
+                _record_totals(tally["count"], stats_from_tally(tally), time.time() - start_time, "video")
+            serialize_start = time.perf_counter()
+            with tracing.span("serialize"):
+                line = json.dumps(event)
+            registry.observe("stage_duration_ms", (time.perf_counter() - serialize_start) * 1000, stage="serialization")
+            yield f"data: {line}\n\n" if sse else line + "\n"
+    finally:
+        await events.aclose()
+        if cleanup_path:
+            os.unlink(cleanup_path)
+
+@app.post("/detect/video/stream")
+async def detect_video_stream(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    source_url: Optional[str] = Query(default=None, description="HTTP/HTTPS/RTSP URL"),
+    tracker: Optional[str] = Query(default=None, description="Tracker engine: centroid or sort"),
+    roi: Optional[str] = Query(default=None, description="ROI polygon as JSON [[x, y], ...]"),
+    camera: Optional[str] = Query(default=None, description="Camera name whose configured ROI to use"),
+    model: Optional[str] = Query(default=None, description="Model backend: detr, yolo or detr-onnx")
+):
+    """
+    Streaming variant of /detect/video: emits one JSON object per processed frame
+    (detections plus running unique counts) and a final summary, as NDJSON, or as
+    Server-Sent Events when the client sends `Accept: text/event-stream`.
+    """
+    if file is None and not source_url:
+        raise HTTPException(status_code=400, detail="Provide a video file or source_url")
+    if file is None and not source_url.startswith(VIDEO_URL_PREFIXES):
+        raise HTTPException(status_code=400, detail="Invalid URL format. Must start with http://, https://, rtsp://, or rtmp://")
+    _check_tracker(tracker)
+    polygon = _resolve_roi(roi, camera)
+    await _get_detector(model)
+
+    start_time = time.time()
+    tmp_path = None
+    if file is not None:
+        with tracing.span("save_upload"):
+            tmp_path = await save_upload(file, VIDEO_UPLOAD_MAX_BYTES, settings.video_upload_dir)
+
+    try:
+        events = open_video_stream(tmp_path or source_url, tracker, polygon, model)
+    except Exception:
+        if tmp_path:
+            os.unlink(tmp_path)
+        raise
+
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        _encode_video_events(events, start_time, sse, tmp_path),
+        media_type="text/event-stream" if sse else "application/x-ndjson"
+    )
+
+def _job_view(job: dict) -> VideoJob:
+    expected = job["expected_frames"]
+    progress = None
+    if job["status"] == "succeeded":
+        progress = 1.0
+    elif expected:
+        progress = round(min(1.0, job["processed_frames"] / expected), 4)
+    return VideoJob(
+        **{k: v for k, v in job.items() if k in VideoJob.model_fields},
+        progress=progress,
+        result_url=f"/jobs/{job['id']}/result" if job["status"] == "succeeded" else None,
+    )
+
+def _require_jobs():
+    if not job_queue.started:
+        raise HTTPException(status_code=503, detail="Video jobs are disabled (JOBS_WORKERS=0)")
+
+def _get_job(job_id: str) -> dict:
+    _require_jobs()
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/jobs", response_model=VideoJob, status_code=202)
+async def submit_job(
+    file: Optional[UploadFile] = File(None),
+    source_url: Optional[str] = Query(default=None, description="HTTP/HTTPS URL of a video file"),
+    tracker: Optional[str] = Query(default=None, description="Tracker engine: centroid or sort"),
+    roi: Optional[str] = Query(default=None, description="ROI polygon as JSON [[x, y], ...]"),
+    camera: Optional[str] = Query(default=None, description="Camera name whose configured ROI to use"),
+    model: Optional[str] = Query(default=None, description="Model backend: detr, yolo or detr-onnx")
+):
+    """
+    Queue a video for background processing and return its job right away.
+    Poll GET /jobs/{id} (optionally with ?wait=) and fetch GET /jobs/{id}/result when it succeeds.
+    """
+    _require_jobs()
+    if file is None and not source_url:
+        raise HTTPException(status_code=400, detail="Provide a video file or source_url")
+    if file is None and not source_url.startswith(("http://", "https://")):
+        # Live sources never end; they belong in /streams
+        raise HTTPException(status_code=400, detail="Jobs take uploaded files or http(s) URLs; use /streams for live sources")
+    _check_tracker(tracker)
+    polygon = _resolve_roi(roi, camera)
+    if model and model not in MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown model backend '{model}'. Available: {', '.join(MODELS)}")
+
+    upload_path = None
+    if file is not None:
+        upload_path = await save_upload(file, VIDEO_UPLOAD_MAX_BYTES, job_queue.upload_dir)
+    try:
+        job = job_queue.submit(file.filename if file is not None else source_url,
+                               upload_path, tracker, model, polygon)
+    except Exception:
+        if upload_path:
+            os.unlink(upload_path)
+        raise
+    logger.info(f"📋 Job {job['id']} queued: {job['source']}")
+    return JSONResponse(_job_view(job).model_dump(), status_code=202, headers={"Location": f"/jobs/{job['id']}"})
+
+@app.get("/jobs", response_model=List[VideoJob])
+def list_jobs(
+    status: Optional[str] = Query(default=None, description="Filter by status"),
+    limit: int = Query(default=50, ge=1, le=1000)
+):
+    """Most recent jobs first"""
+    _require_jobs()
+    return [_job_view(j) for j in job_queue.store.list(status, limit)]
+
+@app.get("/jobs/{job_id}", response_model=VideoJob)
+async def get_job(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, le=60, description="Long-poll: wait up to this many seconds for progress or completion")
+):
+    """Job status and progress; with ?wait= the response is held until the job changes"""
+    # SQLite reads go to the threadpool; the long-poll itself only sleeps on the event loop
+    job = await run_in_threadpool(_get_job, job_id)
+    deadline = time.time() + wait
+    while job["status"] not in TERMINAL and time.time() < deadline:
+        await asyncio.sleep(0.25)
+        current = await run_in_threadpool(job_queue.store.get, job_id)
+        if current is None or current["updated_at"] != job["updated_at"]:
+            job = current or job
+            break
+    return _job_view(job)
+
+@app.get("/jobs/{job_id}/result", response_model=VideoDetections)
+def get_job_result(
+    job_id: str,
+    layout: str = Query(default="full", description="full (VideoDetections) or columnar (per-frame flat arrays)"),
+    accept: Optional[str] = Header(default=None, description="application/json (default) or application/msgpack")
+):
+    """The VideoDetections of a succeeded job"""
+    media_type = _video_encoding(layout, accept)
+    job = _get_job(job_id)
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}; results are available once it has succeeded")
+    path = job_queue.result_path(job_id)
+    if layout == "full" and media_type == JSON_TYPE:
+        # Stored in exactly this form; send the file as is
+        return FileResponse(path, media_type=JSON_TYPE)
+    with open(path, "rb") as f:
+        res = VideoResult.from_dict(json.load(f))
+    return _serialize_video(res, layout, media_type)
+
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    """Cancel a queued or running job, or delete a finished one and its result"""
+    job = _get_job(job_id)
+    if job["status"] in TERMINAL:
+        job_queue.delete(job_id)
+        return {"id": job_id, "deleted": True}
+    return _job_view(job_queue.cancel(job_id))
+
+@app.post("/streams")
+def start_stream(body: StreamStartRequest):
+    """Start continuous detection and counting on a live stream"""
+    source = body.source_url
+    _check_tracker(body.tracker)
+    _load_detector(body.model)
+    try:
+        polygon = parse_polygon(body.roi)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if polygon is None and body.name:
+        polygon = camera_roi(settings.roi_config_path, body.name)
+    if not source.startswith(VIDEO_URL_PREFIXES):
+        if not settings.stream_allow_files:
+            raise HTTPException(status_code=400, detail="Invalid URL format. Must start with http://, https://, rtsp://, or rtmp://")
+        if not os.path.isfile(source):
+            raise HTTPException(status_code=400, detail=f"File not found: {source}")
+    session = stream_manager.start(
+        source,
+        name=body.name,
+        fps_sample=body.fps_sample,
+        loop=body.loop,
+        window_seconds=body.window_seconds,
+        tracker=body.tracker,
+        roi=polygon,
+        backend=body.model
+    )
+    return session.info()
+
+@app.get("/streams")
+def list_streams():
+    """List stream sessions with their counts"""
+    return {"streams": [session.info() for session in stream_manager.list()]}
+
+@app.get("/streams/{session_id}")
+def get_stream(session_id: str):
+    session = stream_manager.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Stream session not found")
+    return session.info()
+
+@app.delete("/streams/{session_id}")
+def stop_stream(session_id: str):
+    session = stream_manager.stop(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Stream session not found")
+    return session.info()
@@ -0,0 +1,430 @@
+"""
+Lightweight in-process metrics primitives.
+
+``Histogram`` is a fixed-bucket histogram used for small distributions
+(batch sizes, queue waits). ``WindowedHistogram`` and ``MetricsRegistry``
+track latencies per endpoint and per stage over a sliding window with
+percentiles and Prometheus exposition; ``registry`` is the process-wide
+instance.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import settings
+
+# Default bucket bounds (milliseconds) for latency / queue-wait histograms
+LATENCY_MS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram that can be updated from worker threads.
+
+    Each bucket counts observations less than or equal to its upper bound;
+    anything larger lands in the trailing "+Inf" bucket.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        """
+        Initialize the histogram.
+
+        Args:
+            buckets: Upper bounds of the buckets, in any order
+        """
+        self.buckets: List[float] = sorted(float(b) for b in buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop all recorded observations."""
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+            self._max = 0.0
+
+    def observe(self, value: float):
+        """Record a single observation."""
+        value = float(value)
+        idx = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                idx = i
+                break
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self) -> Dict:
+        """Return a JSON-friendly copy of the current state."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count, peak = self._sum, self._count, self._max
+        labels = [f"le_{b:g}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count": count,
+            "sum": round(total, 3),
+            "mean": round(total / count, 3) if count else 0,
+            "max": round(peak, 3),
+            "buckets": dict(zip(labels, counts)),
+        }
+
+
+class WindowedHistogram:
+    """
+    HDR-style latency histogram over a sliding time window.
+
+    Buckets grow geometrically (``precision`` relative width), so any
+    percentile is reported within that relative error from ~10us to hours
+    with about a thousand buckets. The window is split into ``slices``;
+    the oldest slice is dropped as time moves on, so percentiles describe
+    roughly the last ``window_seconds``. All-time count and sum are kept
+    for Prometheus.
+
+    Observations are lock-free: each thread writes to its own shard and
+    readers merge the shards. Only a thread's first observation takes a
+    lock, to register its shard.
+    """
+
+    def __init__(self, window_seconds: float = 60.0, slices: int = 6, min_value: float = 0.01,
+                 max_value: float = 3.6e6, precision: float = 0.02):
+        """
+        Initialize the histogram.
+
+        Args:
+            window_seconds: Span covered by the percentiles
+            slices: Sub-intervals the window is rotated by
+            min_value: Smallest distinguishable value (smaller ones share the first bucket)
+            max_value: Largest distinguishable value (larger ones share the last bucket)
+            precision: Relative bucket width, i.e. the worst-case percentile error
+        """
+        self.slices = max(1, int(slices))
+        self.window_seconds = float(window_seconds)
+        self.slice_seconds = self.window_seconds / self.slices
+        self.min_value = float(min_value)
+        self._log_growth = math.log1p(precision)
+        self.buckets = int(math.ceil(math.log(max_value / min_value) / self._log_growth)) + 1
+        self._shards: List["_Shard"] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._generation = 0
+        # All-time totals of pruned shards, so the Prometheus count and sum never go backwards
+        self._retired_count = 0
+        self._retired_sum = 0.0
+
+    def observe(self, value: float):
+        shard = getattr(self._local, "shard", None)
+        if shard is None or shard.generation != self._generation:
+            shard = self._register()
+        value = float(value)
+        idx = 0
+        if value > self.min_value:
+            idx = min(self.buckets - 1, int(math.log(value / self.min_value) / self._log_growth) + 1)
+        epoch = int(time.monotonic() // self.slice_seconds)
+        slot = epoch % self.slices
+        if shard.epochs[slot] != epoch:
+            # This thread's slot still holds an expired slice; recycle it
+            shard.counts[slot] = 0
+            shard.sums[slot] = 0.0
+            shard.maxes[slot] = 0.0
+            shard.epochs[slot] = epoch
+        shard.counts[slot, idx] += 1
+        shard.sums[slot] += value
+        if value > shard.maxes[slot]:
+            shard.maxes[slot] = value
+        shard.total_count += 1
+        shard.total_sum += value
+
+    def _register(self) -> "_Shard":
+        shard = _Shard(self.slices, self.buckets, self._generation)
+        with self._lock:
+            current = threading.current_thread()
+            # Drop shards of threads that have exited and have nothing left in the window
+            horizon = int(time.monotonic() // self.slice_seconds) - self.slices
+            kept = []
+            for s in self._shards:
+                if s.generation != self._generation:
+                    continue
+                if s.thread.is_alive() or max(s.epochs) > horizon:
+                    kept.append(s)
+                else:
+                    # The thread is gone, so its totals are final
+                    self._retired_count += s.total_count
+                    self._retired_sum += s.total_sum
+            shard.thread = current
+            kept.append(shard)
+            self._shards = kept
+        self._local.shard = shard
+        return shard
+
+    def reset(self):
+        """Drop all observations; threads register fresh shards on their next observation."""
+        with self._lock:
+            self._generation += 1
+            self._shards = []
+            self._retired_count = 0
+            self._retired_sum = 0.0
+
+    def _merged(self):
+        """(bucket counts, window sum, window max, all-time count, all-time sum) across shards."""
+        counts = np.zeros(self.buckets, dtype=np.int64)
+        window_sum = window_max = 0.0
+        with self._lock:
+            # Shards and retired totals are read together so a pruned shard is counted exactly once
+            shards = list(self._shards)
+            total_count, total_sum = self._retired_count, self._retired_sum
+        oldest = int(time.monotonic() // self.slice_seconds) - self.slices + 1
+        for shard in shards:
+            for slot, epoch in enumerate(list(shard.epochs)):
+                if epoch >= oldest:
+                    counts += shard.counts[slot]
+                    window_sum += shard.sums[slot]
+                    window_max = max(window_max, shard.maxes[slot])
+            total_count += shard.total_count
+            total_sum += shard.total_sum
+        return counts, window_sum, window_max, total_count, total_sum
+
+    def _value_at(self, idx: int) -> float:
+        # Geometric midpoint of the bucket
+        if idx == 0:
+            return self.min_value
+        return self.min_value * math.exp((idx - 0.5) * self._log_growth)
+
+    def snapshot(self, quantiles: Sequence[float] = (0.5, 0.95, 0.99)) -> Dict:
+        """Windowed count/mean/max and percentiles, plus all-time totals."""
+        counts, window_sum, window_max, total_count, total_sum = self._merged()
+        count = int(counts.sum())
+        out = {
+            "window_seconds": self.window_seconds,
+            "count": count,
+            "mean": round(window_sum / count, 3) if count else 0,
+            "max": round(window_max, 3),
+        }
+        cumulative = np.cumsum(counts)
+        for q in quantiles:
+            key = f"p{q * 100:g}"
+            if not count:
+                out[key] = 0
+                continue
+            idx = int(np.searchsorted(cumulative, q * count, side="left"))
+            # Never report more than the largest value actually seen
+            out[key] = round(min(self._value_at(idx), window_max), 3)
+        out["total_count"] = total_count
+        out["total_sum"] = round(total_sum, 3)
+        return out
+
+
+class _Shard:
+    """One thread's slices of a WindowedHistogram (written only by that thread)."""
+
+    __slots__ = ("counts", "sums", "maxes", "epochs", "total_count", "total_sum", "generation", "thread")
+
+    def __init__(self, slices: int, buckets: int, generation: int):
+        self.counts = np.zeros((slices, buckets), dtype=np.int64)
+        # Plain lists: scalar updates on them are much cheaper than on numpy arrays
+        self.sums = [0.0] * slices
+        self.maxes = [0.0] * slices
+        self.epochs = [-1] * slices
+        self.total_count = 0
+        self.total_sum = 0.0
+        self.generation = generation
+        self.thread = None
+
+
+class ShardedCounter:
+    """Monotonic counter incremented without locks (per-thread shards, summed on read)."""
+
+    def __init__(self):
+        self._shards: List[List[float]] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = [0]
+            with self._lock:
+                self._shards.append(cell)
+            self._local.cell = cell
+        cell[0] += amount
+
+    @property
+    def value(self) -> float:
+        return sum(cell[0] for cell in list(self._shards))
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """
+    Named, labelled latency histograms and counters.
+
+    Series are created on first use; after that, recording is a dict lookup
+    plus a lock-free update.
+    """
+
+    def __init__(self, window_seconds: float = 60.0, slices: int = 6, prefix: str = "gateway"):
+        self.window_seconds = window_seconds
+        self.slices = slices
+        self.prefix = prefix
+        self._histograms: Dict[str, Dict[LabelKey, WindowedHistogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, ShardedCounter]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def histogram(self, name: str, **labels) -> WindowedHistogram:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        series = self._histograms.get(name, {}).get(key)
+        if series is None:
+            with self._lock:
+                family = self._histograms.setdefault(name, {})
+                series = family.get(key)
+                if series is None:
+                    series = family[key] = WindowedHistogram(self.window_seconds, self.slices)
+        return series
+
+    def counter(self, name: str, **labels) -> ShardedCounter:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        series = self._counters.get(name, {}).get(key)
+        if series is None:
+            with self._lock:
+                family = self._counters.setdefault(name, {})
+                series = family.get(key)
+                if series is None:
+                    series = family[key] = ShardedCounter()
+        return series
+
+    def observe(self, name: str, value: float, **labels):
+        self.histogram(name, **labels).observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        self.counter(name, **labels).inc(amount)
+
+    def snapshot(self) -> Dict:
+        """JSON view: {histogram name: {"label=value,...": percentiles}}."""
+        out = {}
+        for name, family in list(self._histograms.items()):
+            out[name] = {
+                (",".join(f"{k}={v}" for k, v in key) or "all"): series.snapshot()
+                for key, series in sorted(family.items())
+            }
+        return out
+
+    def prometheus(self, gauges: Sequence[Tuple[str, Dict[str, str], float]] = ()) -> str:
+        """
+        Prometheus text exposition. Histograms become summaries whose
+        quantiles cover the sliding window and whose _sum/_count are all-time.
+
+        Args:
+            gauges: Point-in-time values sampled by the caller, as (name, labels, value)
+        """
+        lines: List[str] = []
+        for name, family in sorted(self._histograms.items()):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {metric} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {metric} summary")
+            for key, series in sorted(family.items()):
+                snap = series.snapshot((0.5, 0.9, 0.95, 0.99))
+                for q in ("0.5", "0.9", "0.95", "0.99"):
+                    lines.append(f"{metric}{_labels(key, quantile=q)} {snap[f'p{float(q) * 100:g}']}")
+                lines.append(f"{metric}_sum{_labels(key)} {snap['total_sum']}")
+                lines.append(f"{metric}_count{_labels(key)} {snap['total_count']}")
+        for name, family in sorted(self._counters.items()):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {metric} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+            for key, series in sorted(family.items()):
+                lines.append(f"{metric}{_labels(key)} {series.value:g}")
+        described = set()
+        for name, labels, value in gauges:
+            metric = f"{self.prefix}_{name}"
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {metric} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {metric} gauge")
+            key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+            lines.append(f"{metric}{_labels(key)} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key: LabelKey, **extra) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording every HTTP request in a registry: latency by
+    route and method, and a request count by route, method and status.
+
+    The clock stops at the last body message, so streaming responses are
+    measured to completion. Requests are labelled with the route template
+    ("/jobs/{job_id}") rather than the concrete path; unmatched paths share
+    one label so scanners cannot create unbounded series.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, skip: Sequence[str] = ()):
+        self.app = app
+        self.registry = registry
+        self.skip = tuple(skip)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            self.registry.observe("request_duration_ms", (time.perf_counter() - start) * 1000,
+                                  endpoint=endpoint, method=method)
+            self.registry.inc("requests_total", endpoint=endpoint, method=method, status=status)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Errors and disconnects still count
+            record()
+
+
+registry = MetricsRegistry(settings.metrics_window_seconds, settings.metrics_window_slices)
+registry.describe("request_duration_ms", "HTTP request latency in milliseconds by route")
+registry.describe("requests_total", "HTTP requests by route, method and status")
+registry.describe("stage_duration_ms", "Pipeline stage latency in milliseconds (queue, inference, decode, tracking, serialization)")
+registry.describe("uptime_seconds", "Seconds since the service started")
+registry.describe("batch_queue_depth", "Images waiting for a forward pass, by model backend")
+registry.describe("worker_in_flight", "Tasks running or queued on a bounded worker pool")
+registry.describe("jobs", "Background video jobs by state")
+registry.describe("result_cache_entries", "Entries in the detection result cache")
@@ -0,0 +1,225 @@
+"""
+Model wrappers that own the weights and turn raw frames into DetectionArrays.
+These are used directly in thread serving mode and inside each worker
+process in process serving mode, so importing this module must stay free
+of side effects.
+
+Backends (``settings.model_kind`` or per request):
+
+- "detr":      facebook/detr-resnet-50 through Transformers (PyTorch),
+               optionally optimized for CPU (``settings.torch_optimization``).
+- "yolo":      Ultralytics YOLO (``settings.hf_filename``, yolov8n by default);
+               a much smaller model for CPU-only deployments.
+- "detr-onnx": the same DETR exported to ONNX and run with ONNX Runtime.
+
+Every backend exposes ``model_name``, ``backend`` and ``predict_batch()``.
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Type
+from .detections import DetectionArrays
+from .config import settings
+from .ingest import to_pil_rgb
+from . import tracing
+
+DETR_MODEL = "facebook/detr-resnet-50"
+# Score cut-off of the Transformers object-detection pipeline, kept so results match it
+DETR_THRESHOLD = 0.5
+TORCH_OPTIMIZATIONS = ("none", "int8", "compile")
+
+
+def set_torch_threads(threads: int):
+    """Set torch's intra-op thread count for this process (0 keeps the default)."""
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def optimize_torch_model(model, optimization: str, channels_last: bool = False):
+    """
+    Prepare a torch model for CPU inference.
+
+    Args:
+        model: An eval-mode torch.nn.Module
+        optimization: "none" (eager fp32), "int8" (dynamic int8 quantization of the
+            Linear layers, i.e. DETR's transformer and heads) or "compile" (torch.compile)
+        channels_last: Store conv weights in NHWC, which oneDNN convolutions prefer
+
+    Returns:
+        The model to run; "compile" patches ``forward`` in place so the module
+        (and anything holding a reference to it) keeps its type and config.
+    """
+    import torch
+
+    if optimization not in TORCH_OPTIMIZATIONS:
+        raise ValueError(f"Unknown torch_optimization '{optimization}'. Available: {', '.join(TORCH_OPTIMIZATIONS)}")
+    model.eval()
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    if optimization == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif optimization == "compile":
+        # Input sizes follow the image aspect ratio, so compile for dynamic shapes up front
+        model.forward = torch.compile(model.forward, dynamic=True)
+    return model
+
+
+def _detr_name(optimization: str) -> str:
+    return DETR_MODEL if optimization == "none" else f"{DETR_MODEL}:{optimization}"
+
+
+def _detection_arrays(model_name: str, boxes, scores, labels) -> DetectionArrays:
+    """DetectionArrays from parallel box/score/label sequences, applying conf_threshold."""
+    dets = DetectionArrays(model_name, boxes, scores, labels)
+    return dets.take(dets.scores >= settings.conf_threshold)
+
+
+class DetrModel:
+    # Optimized variants are named apart so cached results never mix with eager ones
+    model_name = _detr_name(settings.torch_optimization)
+    backend = "detr"
+
+    def __init__(self, optimization: Optional[str] = None, channels_last: Optional[bool] = None):
+        # Heavy imports stay out of module import so the server can start before the model loads
+        import torch
+        from transformers import AutoImageProcessor, AutoModelForObjectDetection
+
+        optimization = optimization or settings.torch_optimization
+        channels_last = settings.torch_channels_last if channels_last is None else channels_last
+        self.model_name = _detr_name(optimization)
+        self.optimization = optimization
+        self._torch = torch
+        self.processor = AutoImageProcessor.from_pretrained(DETR_MODEL)
+        model = AutoModelForObjectDetection.from_pretrained(DETR_MODEL)
+        self.id2label = model.config.id2label
+        self.model = optimize_torch_model(model, optimization, channels_last)
+
+    def predict_batch(self, images_bgr: List[np.ndarray]) -> List[DetectionArrays]:
+        # Convert BGR (OpenCV) to RGB as most models expect RGB
+        with tracing.span("to_pil"):
+            imgs_pil = [to_pil_rgb(img) for img in images_bgr]
+        # inference_mode also skips autograd's version counters, which no_grad keeps
+        with self._torch.inference_mode():
+            # The processor resizes and pads the batch to a common size; pixel_mask marks the
+            # padding, so images of different sizes share one forward pass (the pipeline's
+            # collate cannot stack them)
+            with tracing.span("preprocess"):
+                inputs = self.processor(images=imgs_pil, return_tensors="pt")
+            with tracing.span("forward"):
+                outputs = self.model(pixel_values=inputs["pixel_values"], pixel_mask=inputs["pixel_mask"])
+            with tracing.span("postprocess"):
+                sizes = self._torch.tensor([img.shape[:2] for img in images_bgr])
+                results = self.processor.post_process_object_detection(
+                    outputs, threshold=DETR_THRESHOLD, target_sizes=sizes
+                )
+        return [self._to_detections(r) for r in results]
+
+    def _to_detections(self, result) -> DetectionArrays:
+        labels = [self.id2label[int(c)] for c in result["labels"].tolist()]
+        return _detection_arrays(self.model_name, result["boxes"].numpy(), result["scores"].numpy(), labels)
+
+
+class YoloModel:
+    model_name = settings.hf_filename
+    backend = "yolo"
+
+    def __init__(self):
+        try:
+            from ultralytics import YOLO
+        except ImportError as e:
+            raise RuntimeError("The 'yolo' backend needs the ultralytics package (pip install ultralytics)") from e
+        self.model = YOLO(self.model_name)
+        self.names = self.model.names
+
+    def predict_batch(self, images_bgr: List[np.ndarray]) -> List[DetectionArrays]:
+        # Ultralytics takes BGR arrays as-is and letterboxes each image itself
+        with tracing.span("predict"):
+            results = self.model.predict(list(images_bgr), conf=settings.conf_threshold, device="cpu", verbose=False)
+        out = []
+        for r in results:
+            boxes = r.boxes
+            out.append(_detection_arrays(
+                self.model_name,
+                boxes.xyxy.cpu().numpy(),
+                boxes.conf.cpu().numpy(),
+                [self.names[int(c)] for c in boxes.cls.cpu().numpy()],
+            ))
+        return out
+
+
+class DetrOnnxModel:
+    """
+    DETR exported to ONNX, e.g. with
+    ``optimum-cli export onnx --model facebook/detr-resnet-50 models/detr-onnx/``.
+    Pre-processing reuses the Transformers image processor; post-processing is
+    done in NumPy so inference does not touch torch.
+    """
+
+    model_name = f"{DETR_MODEL}:onnx"
+    backend = "detr-onnx"
+
+    def __init__(self):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("The 'detr-onnx' backend needs the onnxruntime package (pip install onnxruntime)") from e
+        from transformers import AutoConfig, AutoImageProcessor
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(settings.onnx_model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.processor = AutoImageProcessor.from_pretrained(DETR_MODEL)
+        self.id2label = AutoConfig.from_pretrained(DETR_MODEL).id2label
+
+    def predict_batch(self, images_bgr: List[np.ndarray]) -> List[DetectionArrays]:
+        with tracing.span("to_rgb"):
+            imgs_rgb = [np.ascontiguousarray(img[:, :, ::-1]) for img in images_bgr]
+        # The processor resizes and pads the batch to a common size; pixel_mask marks the padding
+        with tracing.span("preprocess"):
+            inputs = self.processor(images=imgs_rgb, return_tensors="np")
+        with tracing.span("forward"):
+            logits, pred_boxes = self.session.run(
+                ["logits", "pred_boxes"], {name: inputs[name] for name in self.input_names}
+            )
+        with tracing.span("postprocess"):
+            return self._postprocess(images_bgr, logits, pred_boxes)
+
+    def _postprocess(self, images_bgr: List[np.ndarray], logits: np.ndarray, pred_boxes: np.ndarray) -> List[DetectionArrays]:
+        # Softmax over classes; the last class is "no object"
+        probs = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        probs /= probs.sum(axis=-1, keepdims=True)
+        scores = probs[..., :-1].max(axis=-1)
+        classes = probs[..., :-1].argmax(axis=-1)
+
+        out = []
+        for img, box, score, cls in zip(images_bgr, pred_boxes, scores, classes):
+            h, w = img.shape[:2]
+            # (cx, cy, w, h) relative to the unpadded image -> absolute (x1, y1, x2, y2)
+            cx, cy, bw, bh = box.T
+            xyxy = np.stack([(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h], axis=1)
+            # Same cut-off as the torch backend, so both runtimes return the same detections
+            keep = score >= DETR_THRESHOLD
+            out.append(_detection_arrays(
+                self.model_name, xyxy[keep], score[keep], [self.id2label[int(c)] for c in cls[keep]]
+            ))
+        return out
+
+
+MODELS: Dict[str, Type] = {
+    "detr": DetrModel,
+    "yolo": YoloModel,
+    "detr-onnx": DetrOnnxModel,
+}
+
+
+def model_class(backend: str) -> Type:
+    try:
+        return MODELS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown model backend '{backend}'. Available: {', '.join(MODELS)}") from None
+
+
+def create_model(backend: str):
+    """Load the weights for ``backend``."""
+    return model_class(backend)()
@@ -0,0 +1,88 @@
+"""
+Scene-change gating for sampled video frames.
+
+Consecutive samples of a static scene (night, red lights) are near
+identical, so each frame is compared with the last frame that went to
+inference on a small blurred grayscale thumbnail. When only a tiny
+fraction of thumbnail pixels changed, the previous detections are reused
+instead of running the model again.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+THUMB_SIZE = (160, 90)
+
+
+class MotionGate:
+    """Decides per frame whether inference can be skipped."""
+
+    def __init__(self, threshold: float, pixel_delta: int = 25, max_skip: int = 10):
+        """
+        Initialize the gate.
+
+        Args:
+            threshold: Fraction of thumbnail pixels that must change to run inference (0 disables gating)
+            pixel_delta: Gray-level difference for a thumbnail pixel to count as changed
+            max_skip: Run inference at least once every this many consecutive skipped frames
+        """
+        self.threshold = max(0.0, float(threshold))
+        self.pixel_delta = int(pixel_delta)
+        self.max_skip = max(0, int(max_skip))
+        self._reference = None
+        self._run_length = 0
+        self.skipped = 0
+        self.inferred = 0
+        self.compare_time = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def should_infer(self, frame: np.ndarray) -> bool:
+        """
+        Return True if ``frame`` needs a fresh inference; the frame then
+        becomes the reference for the following ones.
+        """
+        if not self.enabled:
+            self.inferred += 1
+            return True
+
+        start = time.perf_counter()
+        thumb = self._thumbnail(frame)
+        changed = True
+        if self._reference is not None and self._run_length < self.max_skip:
+            diff = cv2.absdiff(thumb, self._reference)
+            changed = np.count_nonzero(diff > self.pixel_delta) > self.threshold * diff.size
+        self.compare_time += time.perf_counter() - start
+
+        if changed:
+            # Compare against the last inferred frame, so slow drift still adds up to a change
+            self._reference = thumb
+            self._run_length = 0
+            self.inferred += 1
+        else:
+            self._run_length += 1
+            self.skipped += 1
+        return changed
+
+    @staticmethod
+    def _thumbnail(frame: np.ndarray) -> np.ndarray:
+        # Shrink first so the colour conversion only touches the thumbnail
+        thumb = cv2.resize(frame, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        # Blur away sensor noise and compression artefacts
+        return cv2.GaussianBlur(thumb, (5, 5), 0)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "max_skip": self.max_skip,
+            "inferred": self.inferred,
+            "skipped": self.skipped,
+            "compare_ms": round(self.compare_time * 1000, 1),
+        }
@@ -0,0 +1,125 @@
+"""
+Bounded worker pools used to keep blocking work (decoding, video loops,
+inference) off the asyncio event loop.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from .metrics import Histogram, LATENCY_MS_BUCKETS
+
+
+class BackpressureError(RuntimeError):
+    """Raised when work is refused instead of queued; maps to an HTTP error with Retry-After."""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after))
+
+
+class QueueFullError(BackpressureError):
+    """The admission queue is at capacity; the client should retry later."""
+
+    status_code = 429
+
+
+class EngineStoppedError(BackpressureError):
+    """The worker is shutting down (or not running) and accepts no new work."""
+
+    status_code = 503
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a hard cap on running plus waiting tasks.
+
+    Submissions beyond ``max_workers + max_pending`` are rejected with
+    QueueFullError rather than piling up behind slow work.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int = 0, retry_after: int = 1):
+        """
+        Initialize the pool.
+
+        Args:
+            name: Thread name prefix and label used in errors/stats
+            max_workers: Number of worker threads
+            max_pending: Number of tasks allowed to wait for a free worker
+            retry_after: Seconds suggested to rejected clients
+        """
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(0, int(max_pending))
+        self.retry_after = retry_after
+        self.capacity = self.max_workers + self.max_pending
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.queue_wait_hist = Histogram(LATENCY_MS_BUCKETS)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn`` on the pool and await its result, or raise QueueFullError if saturated."""
+        return await self.submit(fn, *args, **kwargs)
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> "asyncio.Future":
+        """
+        Admit ``fn`` to the pool right away and return an awaitable for its result.
+        Must be called from the event loop; raises QueueFullError if saturated.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError(
+                f"{self.name} pool is saturated ({self.capacity} tasks in flight)",
+                retry_after=self.retry_after,
+            )
+
+        submitted_at = time.monotonic()
+
+        def call():
+            self.queue_wait_hist.observe((time.monotonic() - submitted_at) * 1000)
+            return fn(*args, **kwargs)
+
+        with self._lock:
+            self._in_flight += 1
+        # Run in the caller's context, so e.g. the request trace follows the task
+        context = contextvars.copy_context()
+        try:
+            future = self._executor.submit(context.run, call)
+        except RuntimeError as e:
+            self._release()
+            raise EngineStoppedError(f"{self.name} pool is shut down") from e
+        # Release from the worker side so a cancelled await can't free a slot early
+        future.add_done_callback(lambda _: self._release())
+        return asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def reset_stats(self):
+        with self._lock:
+            self.rejected = 0
+        self.queue_wait_hist.reset()
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._in_flight,
+            "rejected": self.rejected,
+            "queue_wait_ms": self.queue_wait_hist.snapshot(),
+        }
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
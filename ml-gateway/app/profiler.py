@@ -0,0 +1,130 @@
+"""
+In-process sampling CPU profiler.
+
+The recording thread snapshots every other thread's Python stack
+(``sys._current_frames``) at a fixed interval and counts identical stacks.
+Nothing is instrumented and the profiled code does not slow down beyond the
+sampler's own share of the GIL, so it is safe to run against live traffic
+for a few seconds. Native code (torch kernels, OpenCV) shows up as the Python
+frame that called into it. Model worker processes (SERVING_MODE=process) are
+not sampled.
+
+Results come out as collapsed stacks ("thread;outer;inner count" lines, the
+input format of flamegraph.pl and speedscope) or as a per-function table.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+
+class ProfilerBusyError(RuntimeError):
+    """A profile is already being recorded."""
+
+
+class SamplingProfiler:
+    """Records one sampling profile at a time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def record(self, seconds: float, interval_ms: float = 5.0) -> "Profile":
+        """
+        Sample all threads for ``seconds`` (blocking the calling thread).
+
+        Raises ProfilerBusyError if another profile is in progress.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already being recorded")
+        try:
+            return self._record(seconds, interval_ms / 1000)
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _record(seconds: float, interval: float) -> "Profile":
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(tid, f"thread-{tid}"))
+                stacks[tuple(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval)
+        return Profile(stacks, samples, time.perf_counter() - started, interval)
+
+
+class Profile:
+    def __init__(self, stacks: Counter, samples: int, duration: float, interval: float):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        self.interval = interval
+
+    def collapsed(self) -> str:
+        """One "root;...;leaf count" line per distinct stack, most frequent first."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 50, include_idle: bool = False) -> Dict:
+        """
+        Per-function sample counts, busiest first: ``self`` when the function
+        was on top of the stack, ``total`` when it was anywhere on it. Threads
+        parked in a wait are left out unless ``include_idle``.
+        """
+        own: Counter = Counter()
+        total: Counter = Counter()
+        busy = 0
+        for stack, count in self.stacks.items():
+            leaf = stack[-1]
+            if not include_idle and _idle(leaf):
+                continue
+            busy += count
+            own[leaf] += count
+            for fn in set(stack[1:]):
+                total[fn] += count
+        rows: List[Tuple[str, int]] = sorted(total.items(), key=lambda kv: (-own[kv[0]], -kv[1]))[:limit]
+        return {
+            "samples": self.samples,
+            "duration_seconds": round(self.duration, 3),
+            "interval_ms": round(self.interval * 1000, 3),
+            "busy_stack_samples": busy,
+            "functions": [
+                {
+                    "function": fn,
+                    "self": own[fn],
+                    "total": count,
+                    "self_percent": round(own[fn] / busy * 100, 1) if busy else 0,
+                    "total_percent": round(count / busy * 100, 1) if busy else 0,
+                }
+                for fn, count in rows
+            ],
+        }
+
+
+# Leaf frames of threads that are blocked rather than running
+_IDLE_FUNCTIONS = ("wait (threading.py", "select (selectors.py", "_worker (thread.py", "_recv_bytes (connection.py")
+
+
+def _idle(leaf: str) -> bool:
+    return leaf.startswith(_IDLE_FUNCTIONS)
+
+
+profiler = SamplingProfiler()
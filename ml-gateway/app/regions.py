@@ -0,0 +1,186 @@
+"""
+Region-of-interest cropping and tiled inference.
+
+High-resolution intersection cameras mostly show sky and buildings, and
+DETR shrinks the whole frame before detecting, so distant vehicles end up
+a few pixels wide. Instead, a frame can be cut down to the bounding box of
+a camera's ROI polygon and, when that region is still large, into
+overlapping tiles. All crops are submitted together; the batcher runs
+crops of the same shape (the tiles) in shared forward passes and the
+full-region crop in its own. Their detections are shifted back into full-frame
+coordinates, filtered to the polygon and de-duplicated with class-wise
+NMS across tiles.
+"""
+
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .detections import DetectionArrays
+
+logger = logging.getLogger(__name__)
+
+Crop = Tuple[int, int, int, int]  # x0, y0, x1, y1 in full-frame pixels
+
+
+def parse_polygon(value) -> Optional[np.ndarray]:
+    """
+    Parse an ROI polygon given as a JSON string or a list of [x, y] points.
+
+    Points are in pixels, or fractions of the frame size if every
+    coordinate is between 0 and 1. Returns None for an empty value and
+    raises ValueError for anything that is not a polygon.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError as e:
+            raise ValueError(f"ROI is not valid JSON: {e}") from e
+    try:
+        polygon = np.asarray(value, dtype=np.float64)
+    except (TypeError, ValueError) as e:
+        raise ValueError("ROI must be a list of [x, y] points") from e
+    if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+        raise ValueError("ROI must be a list of at least three [x, y] points")
+    if not np.isfinite(polygon).all() or (polygon < 0).any():
+        raise ValueError("ROI coordinates must be non-negative numbers")
+    return polygon
+
+
+@lru_cache(maxsize=None)
+def _load_camera_rois(path: str) -> Dict[str, np.ndarray]:
+    with open(path, "r") as f:
+        raw = json.load(f)
+    rois = {name: parse_polygon(points) for name, points in raw.items()}
+    logger.info(f"📐 Loaded ROIs for {len(rois)} cameras from {path}")
+    return rois
+
+
+def camera_roi(path: Optional[str], camera: str) -> Optional[np.ndarray]:
+    """ROI configured for ``camera`` in the JSON file at ``path`` ({"name": [[x, y], ...]})."""
+    if not path or not os.path.exists(path):
+        return None
+    return _load_camera_rois(path).get(camera)
+
+
+def to_pixels(polygon: np.ndarray, shape: Sequence[int]) -> np.ndarray:
+    """Scale a fractional polygon to the frame size (pixel polygons pass through)."""
+    if polygon.max() <= 1.0:
+        return polygon * (shape[1], shape[0])
+    return polygon
+
+
+def points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Even-odd rule test of (N, 2) points against a polygon, vectorized over points and edges."""
+    x = points[:, 0:1]
+    y = points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    crossings = straddles & (x < x_cross)
+    return (crossings.sum(axis=1) % 2) == 1
+
+
+class RegionPlanner:
+    """Decides which crops of a frame are sent to the model."""
+
+    def __init__(self, tile_size: int = 0, tile_overlap: float = 0.2, include_full: bool = True):
+        """
+        Initialize the planner.
+
+        Args:
+            tile_size: Tile edge in pixels; regions larger than this are tiled (0 disables tiling)
+            tile_overlap: Fraction of a tile shared with its neighbour, so objects on a seam
+                appear whole in at least one tile
+            include_full: Also run the whole region once, for objects larger than a tile
+        """
+        self.tile_size = max(0, int(tile_size))
+        self.tile_overlap = min(max(0.0, float(tile_overlap)), 0.9)
+        self.include_full = include_full
+
+    def crops(self, shape: Sequence[int], roi: Optional[np.ndarray] = None) -> List[Crop]:
+        """Crops for a frame of ``shape`` (h, w, ...) restricted to the ROI's bounding box."""
+        height, width = int(shape[0]), int(shape[1])
+        x0, y0, x1, y1 = 0, 0, width, height
+        if roi is not None:
+            x0, y0 = (int(v) for v in np.floor(roi.min(axis=0)))
+            x1, y1 = (int(v) for v in np.ceil(roi.max(axis=0)))
+            x0, y0 = max(0, x0), max(0, y0)
+            x1, y1 = min(width, x1), min(height, y1)
+            if x1 <= x0 or y1 <= y0:
+                raise ValueError("ROI lies outside the frame")
+
+        region = (x0, y0, x1, y1)
+        if not self.tile_size or (x1 - x0 <= self.tile_size and y1 - y0 <= self.tile_size):
+            return [region]
+
+        tiles = [
+            (tx, ty, min(tx + self.tile_size, x1), min(ty + self.tile_size, y1))
+            for ty in self._starts(y0, y1)
+            for tx in self._starts(x0, x1)
+        ]
+        return ([region] if self.include_full else []) + tiles
+
+    def _starts(self, lo: int, hi: int) -> List[int]:
+        if hi - lo <= self.tile_size:
+            return [lo]
+        stride = max(1, int(self.tile_size * (1.0 - self.tile_overlap)))
+        starts = list(range(lo, hi - self.tile_size, stride))
+        # Last tile is flush with the far edge
+        starts.append(hi - self.tile_size)
+        return starts
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, labels: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Class-wise non-maximum suppression; returns indices of kept boxes, best first."""
+    # Offsetting each class into its own coordinate range keeps classes from suppressing each other
+    offsets = labels[:, None] * (boxes.max() + 1.0)
+    shifted = boxes + offsets
+    areas = (shifted[:, 2] - shifted[:, 0]) * (shifted[:, 3] - shifted[:, 1])
+    order = scores.argsort()[::-1]
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(shifted[i, 0], shifted[rest, 0])
+        yy1 = np.maximum(shifted[i, 1], shifted[rest, 1])
+        xx2 = np.minimum(shifted[i, 2], shifted[rest, 2])
+        yy2 = np.minimum(shifted[i, 3], shifted[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def merge_crop_results(results: List[DetectionArrays], crops: List[Crop],
+                       roi: Optional[np.ndarray], iou_threshold: float) -> DetectionArrays:
+    """
+    Shift per-crop detections into full-frame coordinates, keep those whose
+    centre lies inside the ROI, and suppress duplicates across overlapping crops.
+    """
+    model = results[0].model if results else ""
+    if not any(len(res) for res in results):
+        return DetectionArrays(model, [], [], [])
+
+    boxes = np.concatenate([res.boxes + (x0, y0, x0, y0) for res, (x0, y0, _, _) in zip(results, crops)])
+    scores = np.concatenate([res.scores for res in results])
+    names = np.concatenate([res.labels for res in results])
+
+    keep = np.arange(len(scores))
+    if roi is not None:
+        centres = (boxes[:, 0:2] + boxes[:, 2:4]) * 0.5
+        keep = keep[points_in_polygon(centres, roi)]
+    if len(crops) > 1 and len(keep):
+        codes = {name: i for i, name in enumerate(dict.fromkeys(names[keep].tolist()))}
+        labels = np.array([codes[name] for name in names[keep].tolist()], dtype=np.float64)
+        keep = keep[nms(boxes[keep], scores[keep], labels, iou_threshold)]
+    return DetectionArrays(model, boxes[keep], scores[keep], names[keep])
@@ -17,10 +17,25 @@ class ImageDetections(BaseModel):
     model: str
     detections: List[Detection] = Field(default_factory=list)
 
+class BatchImageResult(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    status: int = Field(default=200, description="HTTP status this image would have had on /detect/image")
+    error: Optional[str] = None
+    cached: bool = False
+    result: Optional[ImageDetections] = None
+
+class BatchImageDetections(BaseModel):
+    model: str
+    count: int
+    failed: int = 0
+    results: List[BatchImageResult] = Field(default_factory=list)
+
 class VideoFrameDetections(BaseModel):
     frame_index: int
     time_sec: float
     detections: List[Detection] = Field(default_factory=list)
+    inference_skipped: bool = Field(default=False, description="Scene unchanged; detections reused from the previous frame")
 
 class VideoDetections(BaseModel):
     model: str
@@ -30,3 +45,32 @@ class VideoDetections(BaseModel):
     results: List[VideoFrameDetections] = Field(default_factory=list)
     counts_by_label: Dict[str, int] = Field(default_factory=dict)
     tracking_info: Optional[dict] = Field(default=None, description="Object tracking information for unique counts")
+
+class VideoJob(BaseModel):
+    id: str
+    status: str = Field(description="queued, running, succeeded, failed or cancelled")
+    source: str
+    tracker: Optional[str] = None
+    model: Optional[str] = None
+    roi: Optional[List[List[float]]] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    processed_frames: int = 0
+    expected_frames: int = Field(default=0, description="Sampled frames the job will produce (0 = unknown)")
+    progress: Optional[float] = Field(default=None, description="Fraction of expected frames processed")
+    eta_seconds: Optional[float] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    counts_by_label: Optional[Dict[str, int]] = None
+    result_url: Optional[str] = None
+
+class StreamStartRequest(BaseModel):
+    source_url: str
+    name: Optional[str] = None
+    fps_sample: Optional[float] = Field(default=None, gt=0, description="Frames per second to run inference on")
+    loop: bool = Field(default=False, description="Replay file sources forever (simulated camera)")
+    window_seconds: Optional[float] = Field(default=None, gt=0, description="Rolling count window")
+    tracker: Optional[str] = Field(default=None, description="Tracker engine: centroid or sort")
+    model: Optional[str] = Field(default=None, description="Model backend: detr, yolo or detr-onnx")
+    roi: Optional[List[List[float]]] = Field(default=None, description="ROI polygon [[x, y], ...]; defaults to the camera's configured ROI")
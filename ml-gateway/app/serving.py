@@ -0,0 +1,342 @@
+"""
+Multi-process model serving.
+
+The FastAPI process keeps no model weights. Each worker process loads its
+own model and owns one shared-memory block; the front process copies
+decoded frames straight into that block and only sends a small layout
+header (offset + shape per frame) over a pipe, so frame pixels are never
+pickled. Detections come back over the same pipe as DetectionArrays. A
+worker that dies is replaced by a fresh process attached to the same block.
+"""
+
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .pools import BackpressureError
+from .detections import DetectionArrays
+
+logger = logging.getLogger(__name__)
+
+_ALIGN = 64  # byte alignment of each frame inside a shared-memory block
+MAX_LOAD_FAILURES = 3  # Consecutive workers failing to load the model before the pool gives up
+
+
+class WorkerPoolFailedError(BackpressureError):
+    """Model workers keep failing to start; the pool no longer accepts batches."""
+
+    status_code = 503
+
+
+def _aligned(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _worker_main(conn, shm_name: str, torch_threads: int, backend: str):
+    """Entry point of a model worker process."""
+    if torch_threads > 0:
+        # Must be set before torch is imported to size the OpenMP pool
+        os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+        os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+
+    try:
+        from .models import create_model, set_torch_threads
+        set_torch_threads(torch_threads)
+        model = create_model(backend)
+        shm = shared_memory.SharedMemory(name=shm_name)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", model.model_name))
+
+    try:
+        while True:
+            cmd, layout = conn.recv()
+            if cmd == "stop":
+                break
+            try:
+                images = [
+                    np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+                    for offset, shape in layout
+                ]
+                results = model.predict_batch(images)
+                # Views must not outlive the call; the block is reused for the next batch
+                del images
+                conn.send(("ok", results))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        shm.close()
+
+
+class _Worker:
+    def __init__(self, index: int, ctx, slot_bytes: int, torch_threads: int, backend: str,
+                 shm: Optional[shared_memory.SharedMemory] = None):
+        self.index = index
+        # A replacement worker takes over the shared-memory block of the one that died
+        self.shm = shm or shared_memory.SharedMemory(create=True, size=slot_bytes)
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.shm.name, torch_threads, backend),
+            name=f"model-worker-{index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.batches = 0
+        self.frames = 0
+        self.restarts = 0
+
+    def wait_ready(self):
+        if self.ready:
+            return
+        try:
+            status, payload = self.conn.recv()
+        except EOFError:
+            status, payload = "error", f"exited with code {self.process.exitcode}"
+        if status != "ready":
+            # The process exits after reporting; reap it so the pool sees it as dead
+            self.process.join(timeout=5)
+            raise RuntimeError(f"model-worker-{self.index} failed to start: {payload}")
+        self.ready = True
+        logger.info(f"🧠 model-worker-{self.index} (pid {self.process.pid}) ready with {payload}")
+
+    def run(self, images: List[np.ndarray]) -> List[DetectionArrays]:
+        layout: List[Tuple[int, Tuple[int, ...]]] = []
+        offset = 0
+        for img in images:
+            # Strided views (crops, RGB uploads) are gathered straight into shared memory in one copy
+            np.ndarray(img.shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset)[...] = img
+            layout.append((offset, img.shape))
+            offset += _aligned(img.nbytes)
+
+        try:
+            self.conn.send(("predict", layout))
+            status, payload = self.conn.recv()
+        except (EOFError, OSError) as e:
+            # EOFError / BrokenPipeError: the process is gone; reap it so is_alive() agrees
+            self.process.join(timeout=1)
+            raise RuntimeError(
+                f"model-worker-{self.index} exited (code {self.process.exitcode}) during a batch"
+            ) from e
+        if status != "ok":
+            raise RuntimeError(f"model-worker-{self.index}: {payload}")
+        self.batches += 1
+        self.frames += len(images)
+        return payload
+
+    def close(self):
+        try:
+            if self.process.is_alive():
+                self.conn.send(("stop", None))
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+        finally:
+            self.conn.close()
+            self.shm.close()
+            self.shm.unlink()
+
+
+class ProcessModelPool:
+    """
+    Pool of model worker processes fed through shared memory.
+
+    ``predict_batch`` is safe to call from several threads at once; each call
+    checks out one idle worker for the duration of the batch. Workers are
+    spawned on first use so importing the app never forks processes.
+    """
+
+    def __init__(self, workers: int = 1, torch_threads: int = 0, slot_mb: int = 64, backend: str = "detr",
+                 retry_after: int = 1):
+        """
+        Configure the pool.
+
+        Args:
+            workers: Number of model worker processes
+            torch_threads: Intra-op thread count per worker (0 = torch default)
+            slot_mb: Size of each worker's shared-memory frame block in MiB
+            backend: Model backend each worker loads (see models.MODELS)
+            retry_after: Seconds suggested to callers once the pool has failed
+        """
+        self.workers_count = max(1, int(workers))
+        self.torch_threads = max(0, int(torch_threads))
+        self.slot_bytes = max(1, int(slot_mb)) * 1024 * 1024
+        self.backend = backend
+        self.retry_after = retry_after
+        # Set after MAX_LOAD_FAILURES workers in a row could not load the model
+        self.failed: Optional[str] = None
+        self._load_failures = 0
+
+        self._workers: List[_Worker] = []
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._ctx = None
+
+    def start(self):
+        """Spawn the worker processes if they are not running yet."""
+        with self._lock:
+            if self._workers:
+                return
+            # spawn keeps torch/OpenMP state from being inherited through fork
+            self._ctx = mp.get_context("spawn")
+            self._workers = [
+                _Worker(i, self._ctx, self.slot_bytes, self.torch_threads, self.backend)
+                for i in range(self.workers_count)
+            ]
+            for w in self._workers:
+                self._idle.put(w)
+        logger.info(
+            f"🚀 Started {self.workers_count} {self.backend} model workers "
+            f"({self.torch_threads or 'default'} torch threads each, "
+            f"{self.slot_bytes // (1024 * 1024)} MiB shm per worker)"
+        )
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[DetectionArrays]:
+        self._check_failed()
+        if not self._workers:
+            self.start()
+        worker = self._idle.get()
+        if self.failed:
+            self._idle.put(worker)
+            self._check_failed()
+        if not worker.process.is_alive():
+            # Died while idle; nothing was lost, so run this batch on its replacement
+            worker = self._replace(worker)
+            if worker is None:
+                raise RuntimeError("Model worker pool is closed")
+        try:
+            self._wait_ready(worker)
+            results: List[DetectionArrays] = []
+            for chunk in self._chunks(images):
+                results.extend(worker.run(chunk))
+            return results
+        finally:
+            if not worker.process.is_alive():
+                worker = self._replace(worker)
+            if worker is not None:
+                self._idle.put(worker)
+
+    def _replace(self, dead: _Worker) -> Optional[_Worker]:
+        """
+        Start a fresh process in a dead worker's slot, reusing its
+        shared-memory block. Returns None once the pool has been closed,
+        and the dead worker itself once the pool has failed.
+        """
+        dead.conn.close()
+        with self._lock:
+            # Once closed the pool's close() has the block, so it is unlinked exactly once
+            if dead not in self._workers:
+                return None
+            if self.failed:
+                # Kept checked in, so callers waiting for a worker see the failure instead of hanging
+                return dead
+            logger.error(
+                f"💥 model-worker-{dead.index} (pid {dead.process.pid}) exited with code "
+                f"{dead.process.exitcode}; starting a replacement"
+            )
+            fresh = _Worker(dead.index, self._ctx, self.slot_bytes, self.torch_threads, self.backend, shm=dead.shm)
+            fresh.restarts = dead.restarts + 1
+            self._workers[self._workers.index(dead)] = fresh
+        return fresh
+
+    def warmup(self, image: np.ndarray):
+        """Start the workers and run ``image`` through each of them once, in parallel."""
+        self.start()
+        workers = [self._idle.get() for _ in range(len(self._workers))]
+        errors: List[Exception] = []
+
+        def run(worker: _Worker):
+            try:
+                self._wait_ready(worker)
+                worker.run([image])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(w,), name=f"warmup-{w.index}") for w in workers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for w in workers:
+            if not w.process.is_alive():
+                w = self._replace(w)
+            if w is not None:
+                self._idle.put(w)
+        if errors:
+            raise errors[0]
+
+    def _wait_ready(self, worker: _Worker):
+        if worker.ready:
+            return
+        try:
+            worker.wait_ready()
+        except RuntimeError as e:
+            with self._lock:
+                self._load_failures += 1
+                if self._load_failures >= MAX_LOAD_FAILURES and not self.failed:
+                    self.failed = f"{self.backend} model workers failed to start {self._load_failures} times in a row: {e}"
+                    logger.error(f"💥 {self.failed}; not restarting them again")
+            raise
+        with self._lock:
+            self._load_failures = 0
+
+    def _check_failed(self):
+        if self.failed:
+            raise WorkerPoolFailedError(self.failed, retry_after=self.retry_after)
+
+    def _chunks(self, images: List[np.ndarray]):
+        """Split a batch so every chunk fits in one shared-memory block."""
+        chunk: List[np.ndarray] = []
+        used = 0
+        for img in images:
+            size = _aligned(img.nbytes)
+            if size > self.slot_bytes:
+                raise ValueError(
+                    f"Frame of {img.nbytes} bytes exceeds the {self.slot_bytes} byte shared-memory slot"
+                )
+            if used + size > self.slot_bytes:
+                yield chunk
+                chunk, used = [], 0
+            chunk.append(img)
+            used += size
+        if chunk:
+            yield chunk
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for w in workers:
+            try:
+                w.close()
+            except Exception as e:
+                logger.warning(f"Error stopping model-worker-{w.index}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "workers": [
+                {
+                    "index": w.index,
+                    "pid": w.process.pid,
+                    "alive": w.process.is_alive(),
+                    "ready": w.ready,
+                    "batches": w.batches,
+                    "frames": w.frames,
+                    "restarts": w.restarts,
+                }
+                for w in self._workers
+            ],
+            "failed": self.failed,
+            "torch_threads_per_worker": self.torch_threads or None,
+            "shm_slot_mb": self.slot_bytes // (1024 * 1024),
+        }
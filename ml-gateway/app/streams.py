@@ -0,0 +1,322 @@
+"""
+Long-running stream sessions for continuous counting on live cameras.
+
+Each session owns a capture thread and a processing thread:
+
+- The capture thread reads frames as fast as the source delivers them and
+  keeps only the newest one, so when inference falls behind stale frames
+  are dropped instead of queueing up latency. It reconnects with
+  exponential backoff when the source fails (or rewinds looped files).
+- The processing thread samples the newest frame at ``fps_sample``, runs
+  inference and a tracker, and maintains cumulative and rolling
+  (time-windowed) counts of unique objects.
+
+An unexpected error in either thread stops the session with status
+"failed" and the error in ``last_error``, rather than leaving the other
+thread running behind a session that still reports itself as running.
+"""
+
+import cv2
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .config import settings
+from .infer import get_detector
+from .pools import QueueFullError
+from .sampling import is_live_source
+from .video import make_tracker
+
+logger = logging.getLogger(__name__)
+
+
+class StreamSession:
+    """One camera: capture, inference, tracking and counts."""
+
+    def __init__(self, source: str, name: Optional[str] = None, fps_sample: Optional[float] = None,
+                 loop: bool = False, window_seconds: Optional[float] = None,
+                 tracker: Optional[str] = None, roi=None, backend: Optional[str] = None):
+        """
+        Initialize the session (call start() to begin).
+
+        Args:
+            source: Stream URL or, when allowed, a local video file
+            name: Human-readable camera name
+            fps_sample: Frames per second to run inference on
+            loop: Rewind file sources at EOF and replay them in real time (simulated camera)
+            window_seconds: Length of the rolling count window
+            tracker: Tracker engine ("centroid" or "sort"); defaults to settings.tracker_method
+            roi: ROI polygon (N x 2 array) restricting detection to part of the frame
+            backend: Model backend; defaults to settings.model_kind
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.name = name or source
+        self.fps_sample = float(fps_sample or settings.video_fps_sample)
+        self.loop = loop
+        self.window_seconds = float(window_seconds or settings.stream_count_window_seconds)
+        self.live = is_live_source(source)
+        self.started_at = datetime.utcnow().isoformat()
+        self.status = "starting"
+        self.last_error: Optional[str] = None
+
+        self.tracker = make_tracker(tracker)
+        self.roi = roi
+        self.detector = get_detector(backend)
+        self.total_counts: Counter = Counter()
+        self._recent = deque()  # (timestamp, label) of newly tracked objects
+        self._last_seen_id = -1
+
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.frames_skipped = 0  # superseded by a newer frame before inference got to them
+        self.inference_rejected = 0
+        self.reconnects = 0
+        self.last_latency_ms: Optional[float] = None
+
+        self._latest = None  # (capture_index, frame, captured_at)
+        self._latest_consumed = True
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for target, role in ((self._capture_loop, "capture"), (self._process_loop, "process")):
+            thread = threading.Thread(
+                target=self._run_thread, args=(target, role), name=f"stream-{self.id}-{role}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"📡 Stream {self.id} started: {self.name} ({self.fps_sample} fps sample)")
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        if self.status != "failed":
+            self.status = "stopped"
+        logger.info(f"⏹️ Stream {self.id} stopped after {self.frames_processed} processed frames")
+
+    def info(self) -> dict:
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            window_counts = dict(Counter(label for _, label in self._recent))
+            total_counts = dict(self.total_counts)
+            current = self.tracker.get_unique_counts()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "source": self.source,
+            "status": self.status,
+            "started_at": self.started_at,
+            "fps_sample": self.fps_sample,
+            "loop": self.loop,
+            "counts_total": total_counts,
+            "counts_window": window_counts,
+            "window_seconds": self.window_seconds,
+            "model": self.detector.model_name,
+            "tracking_method": self.tracker.method,
+            "roi": self.roi.tolist() if self.roi is not None else None,
+            "currently_tracked": current,
+            "frames_captured": self.frames_captured,
+            "frames_processed": self.frames_processed,
+            "frames_skipped": self.frames_skipped,
+            "inference_rejected": self.inference_rejected,
+            "reconnects": self.reconnects,
+            "last_latency_ms": self.last_latency_ms,
+            "last_error": self.last_error,
+        }
+
+    def _run_thread(self, target, role: str):
+        try:
+            target()
+        except Exception as e:
+            self.last_error = f"{role.capitalize()} failed: {type(e).__name__}: {e}"
+            self.status = "failed"
+            logger.exception(f"📡 Stream {self.id}: {self.last_error}; stopping the session")
+            # Take the other thread down with this one
+            self._stop.set()
+            with self._cond:
+                self._cond.notify_all()
+
+    # Capture side
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        return cap
+
+    def _capture_loop(self):
+        backoff = 1.0
+        cap = None
+        index = 0
+        while not self._stop.is_set():
+            if cap is None:
+                cap = self._open()
+                if cap is None:
+                    self.status = "reconnecting"
+                    self.last_error = f"Unable to open {self.source}"
+                    logger.warning(f"📡 Stream {self.id}: open failed, retrying in {backoff:.0f}s")
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, settings.stream_reconnect_max_backoff_seconds)
+                    continue
+                # Backoff is only reset once frames flow: a source can open and still deliver nothing
+                delivered = False
+                if self._stop.is_set():
+                    break
+                self.status = "running"
+                # Files are replayed at their native rate so they behave like a camera
+                fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+                frame_interval = 0.0 if self.live else 1.0 / fps
+                next_frame_at = time.monotonic()
+
+            ret, frame = cap.read()
+            if not ret:
+                if delivered and self.loop and not self.live and cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                    delivered = False
+                    continue
+                cap.release()
+                cap = None
+                if not self.live and not self.loop:
+                    self.status = "finished"
+                    break
+                self.reconnects += 1
+                self.status = "reconnecting"
+                self.last_error = "Stream read failed"
+                logger.warning(f"📡 Stream {self.id}: read failed, reconnecting in {backoff:.0f}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, settings.stream_reconnect_max_backoff_seconds)
+                continue
+
+            if not delivered:
+                delivered = True
+                backoff = 1.0
+            self.frames_captured += 1
+            index += 1
+            with self._cond:
+                if not self._latest_consumed:
+                    self.frames_skipped += 1
+                self._latest = (index, frame, time.monotonic())
+                self._latest_consumed = False
+                self._cond.notify()
+
+            if frame_interval:
+                next_frame_at += frame_interval
+                delay = next_frame_at - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                else:
+                    next_frame_at = time.monotonic()
+
+        if cap is not None:
+            cap.release()
+        with self._cond:
+            self._cond.notify_all()
+
+    # Processing side
+
+    def _next_frame(self):
+        with self._cond:
+            while self._latest_consumed and not self._stop.is_set():
+                if self.status == "finished":
+                    return None
+                self._cond.wait(timeout=0.5)
+            if self._stop.is_set():
+                return None
+            self._latest_consumed = True
+            return self._latest
+
+    def _process_loop(self):
+        interval = 1.0 / self.fps_sample if self.fps_sample > 0 else 0.0
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            delay = next_at - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            next_at = max(next_at + interval, time.monotonic())
+
+            latest = self._next_frame()
+            if latest is None:
+                break
+            _, frame, captured_at = latest
+            try:
+                # Never wait for queue space: a newer frame will be along shortly
+                img_res = self.detector.submit(frame, block=False, roi=self.roi).result()
+            except QueueFullError:
+                self.inference_rejected += 1
+                continue
+            except Exception as e:
+                self.last_error = f"Inference failed: {e}"
+                logger.error(f"📡 Stream {self.id}: {self.last_error}")
+                continue
+
+            now = time.time()
+            with self._lock:
+                objects = self.tracker.update_boxes(img_res.boxes, img_res.labels)
+                # Object ids only grow, so anything above the last seen id is new
+                for object_id, obj in objects.items():
+                    if object_id > self._last_seen_id:
+                        self.total_counts[obj["label"]] += 1
+                        self._recent.append((now, obj["label"]))
+                if objects:
+                    self._last_seen_id = max(self._last_seen_id, max(objects))
+                self._prune(now)
+            self.frames_processed += 1
+            self.last_latency_ms = round((time.monotonic() - captured_at) * 1000, 1)
+
+    def _prune(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._recent and self._recent[0][0] < cutoff:
+            self._recent.popleft()
+
+
+class StreamManager:
+    """Registry of running stream sessions."""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self._sessions: Dict[str, StreamSession] = {}
+        self._lock = threading.Lock()
+
+    def start(self, source: str, **kwargs) -> StreamSession:
+        with self._lock:
+            active = [s for s in self._sessions.values() if s.status not in ("stopped", "finished", "failed")]
+            if len(active) >= self.max_sessions:
+                raise QueueFullError(
+                    f"Maximum of {self.max_sessions} stream sessions already running",
+                    retry_after=settings.retry_after_seconds,
+                )
+            session = StreamSession(source, **kwargs)
+            self._sessions[session.id] = session
+        return session.start()
+
+    def get(self, session_id: str) -> Optional[StreamSession]:
+        return self._sessions.get(session_id)
+
+    def list(self) -> List[StreamSession]:
+        return list(self._sessions.values())
+
+    def stop(self, session_id: str) -> Optional[StreamSession]:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.stop()
+        return session
+
+    def stop_all(self):
+        for session_id in list(self._sessions):
+            self.stop(session_id)
+
+
+stream_manager = StreamManager(max_sessions=settings.stream_max_sessions)
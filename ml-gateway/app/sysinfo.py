@@ -0,0 +1,165 @@
+"""
+Host and process statistics sampled in the background.
+
+``psutil.cpu_percent(interval=...)`` sleeps for its interval, and disk and
+GPU queries are not free either; doing that inside /health and /system made
+every dashboard poll hold a worker thread. ``SystemSampler`` refreshes one
+snapshot on a fixed cadence instead, and the endpoints just return it. CPU
+percentages are measured over the time between two samples, so they need
+no blocking interval at all.
+"""
+
+import logging
+import sys
+import threading
+import time
+from datetime import datetime
+from importlib.util import find_spec
+from typing import Dict, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# torch is never imported here: importing it would delay startup by seconds
+TORCH_AVAILABLE = find_spec("torch") is not None
+
+
+def get_gpu_info():
+    """
+    Get GPU information if available.
+
+    Only reported once a model backend has imported torch; before that (or
+    without torch) the service is shown as running on the CPU.
+    """
+    gpu_info = {
+        "available": False,
+        "device": "cpu",
+        "memory_used_mb": 0,
+        "memory_total_mb": 0,
+        "utilization_percent": 0
+    }
+
+    torch = sys.modules.get("torch") if TORCH_AVAILABLE else None
+    if torch is None:
+        return gpu_info
+
+    try:
+        # Check for CUDA (NVIDIA)
+        if torch.cuda.is_available():
+            gpu_info["available"] = True
+            gpu_info["device"] = f"cuda:{torch.cuda.current_device()}"
+            gpu_info["name"] = torch.cuda.get_device_name(0)
+
+            # Get memory info
+            memory_reserved = torch.cuda.memory_reserved(0)
+            memory_allocated = torch.cuda.memory_allocated(0)
+            gpu_info["memory_used_mb"] = round(memory_allocated / 1024**2, 2)
+            gpu_info["memory_total_mb"] = round(memory_reserved / 1024**2, 2)
+
+        # Check for MPS (Apple Silicon)
+        elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
+            gpu_info["available"] = True
+            gpu_info["device"] = "mps:0"
+            gpu_info["name"] = "Apple Silicon GPU (MPS)"
+            # MPS doesn't provide detailed memory stats like CUDA
+            gpu_info["memory_used_mb"] = "N/A"
+            gpu_info["memory_total_mb"] = "N/A"
+            gpu_info["utilization_percent"] = "N/A"
+
+    except Exception as e:
+        logger.warning(f"Could not get GPU info: {e}")
+
+    return gpu_info
+
+
+class SystemSampler:
+    """Refreshes a snapshot of system and process stats every ``interval`` seconds."""
+
+    def __init__(self, interval: float = 5.0, disk_path: str = "/"):
+        self.interval = max(0.5, float(interval))
+        self.disk_path = disk_path
+        self._process = psutil.Process()
+        self._snapshot: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Start the CPU counters; the first real reading covers the time since now
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def refresh(self) -> Dict:
+        """Take a new sample now and publish it."""
+        try:
+            snapshot = self._sample()
+        except Exception as e:
+            logger.error(f"Error getting system metrics: {e}")
+            snapshot = {"error": f"Could not retrieve system metrics: {str(e)}"}
+        snapshot["sampled_at"] = time.time()
+        snapshot["timestamp"] = datetime.utcfromtimestamp(snapshot["sampled_at"]).isoformat()
+        # Readers get the whole dict or the previous one, never a half-built sample
+        self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self) -> Dict:
+        """The latest sample (taken on the spot if the sampler has not produced one yet)."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot or self.refresh()
+        return snapshot
+
+    def _sample(self) -> Dict:
+        cpu_freq = psutil.cpu_freq()
+        memory = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        with self._process.oneshot():
+            process_memory = self._process.memory_info()
+            process_cpu = self._process.cpu_percent(interval=None)
+            process_threads = self._process.num_threads()
+        return {
+            "cpu": {
+                "usage_percent": psutil.cpu_percent(interval=None),
+                "count": psutil.cpu_count(),
+                "frequency_mhz": round(cpu_freq.current, 2) if cpu_freq else None,
+                "load_average": psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None
+            },
+            "memory": {
+                "total_gb": round(memory.total / (1024**3), 2),
+                "available_gb": round(memory.available / (1024**3), 2),
+                "used_gb": round(memory.used / (1024**3), 2),
+                "used_percent": memory.percent,
+                "swap_used_gb": round(swap.used / (1024**3), 2),
+                "swap_percent": swap.percent
+            },
+            "disk": {
+                "total_gb": round(disk.total / (1024**3), 2),
+                "free_gb": round(disk.free / (1024**3), 2),
+                "used_percent": round((disk.used / disk.total) * 100, 1)
+            },
+            "gpu": get_gpu_info(),
+            "process": {
+                "memory_mb": round(process_memory.rss / (1024**2), 2),
+                "cpu_percent": process_cpu,
+                "threads": process_threads
+            }
+        }
@@ -0,0 +1,242 @@
+"""
+Opt-in per-request span tracing.
+
+A request is traced when it carries ``X-Trace: 1`` (or every request, with
+TRACE_REQUESTS). Code along the request path wraps its stages in
+``span("name")``; spans go to the request's ``Trace`` through a context
+variable, so they follow the request across awaits and onto worker threads
+(pools copy the caller's context). Untraced requests pay one context-variable
+lookup per span.
+
+Model stages run on a batcher thread shared by many requests. The batcher
+collects that batch's spans once and copies them into the trace of every
+traced request in the batch.
+
+Finished traces are summarized in a ``Server-Timing`` header, kept in memory
+for ``GET /debug/traces/{id}`` as Chrome trace JSON (chrome://tracing,
+Perfetto, speedscope), and optionally written to TRACE_DIR.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = b"x-trace"
+
+# (name, start, end, thread id, args); start/end are time.perf_counter() values
+Span = Tuple[str, float, float, int, Dict]
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+_NOOP = nullcontext()
+
+
+class Trace:
+    """Spans recorded for one request (or one batch, on a batcher thread)."""
+
+    def __init__(self, name: str = ""):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        self.threads: Dict[int, str] = {}
+
+    def add(self, name: str, start: float, end: float, tid: Optional[int] = None, **args):
+        if tid is None:
+            tid = threading.get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        # list.append is atomic, so spans can arrive from several threads at once
+        self.spans.append((name, start, end, tid, args))
+
+    def extend(self, other: "Trace", **args):
+        """Copy ``other``'s spans in (e.g. a shared batch), tagging each with ``args``."""
+        self.threads.update(other.threads)
+        for name, start, end, tid, span_args in list(other.spans):
+            self.spans.append((name, start, end, tid, {**span_args, **args}))
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    def summary(self) -> List[Tuple[str, float, int]]:
+        """(name, total ms, count) per span name, in first-seen order."""
+        totals: Dict[str, List] = {}
+        for name, start, end, _, _ in list(self.spans):
+            entry = totals.setdefault(name, [0.0, 0])
+            entry[0] += (end - start) * 1000
+            entry[1] += 1
+        return [(name, ms, count) for name, (ms, count) in totals.items()]
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value: total ms per span name, plus the elapsed time so far."""
+        parts = []
+        for name, ms, count in self.summary():
+            desc = f';desc="{count}x"' if count > 1 else ""
+            parts.append(f"{name}{desc};dur={ms:.2f}")
+        parts.append(f"total;dur={((self.end or time.perf_counter()) - self.start) * 1000:.2f}")
+        return ", ".join(parts)
+
+    def chrome_trace(self) -> Dict:
+        """The trace in Chrome's Trace Event format (complete events, microseconds)."""
+        pid = os.getpid()
+        end = self.end or time.perf_counter()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self.threads.items()
+        ]
+        root_tid = next(iter(self.threads), 0)
+        events.append({
+            "name": self.name or "request", "ph": "X", "pid": pid, "tid": root_tid,
+            "ts": 0, "dur": round((end - self.start) * 1e6, 1), "args": {"trace_id": self.id},
+        })
+        for name, start, span_end, tid, args in list(self.spans):
+            events.append({
+                "name": name, "ph": "X", "pid": pid, "tid": tid,
+                "ts": round((start - self.start) * 1e6, 1), "dur": round((span_end - start) * 1e6, 1),
+                "args": args,
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.id, "request": self.name, "started_at": self.started_at},
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "args", "start")
+
+    def __init__(self, trace: Trace, name: str, args: Dict):
+        self.trace = trace
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.start, time.perf_counter(), **self.args)
+        return False
+
+
+def current() -> Optional[Trace]:
+    """The trace of the request being handled, or None when it is not traced."""
+    return _current.get()
+
+
+def activate(trace: Optional[Trace]) -> contextvars.Token:
+    return _current.set(trace)
+
+
+def deactivate(token: contextvars.Token):
+    _current.reset(token)
+
+
+def span(name: str, **args):
+    """Context manager timing a stage of the current request; a no-op when untraced."""
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name, args)
+
+
+class TraceStore:
+    """The most recent finished traces, optionally also written to ``directory``."""
+
+    def __init__(self, keep: int = 100, directory: Optional[str] = None):
+        self.keep = max(1, int(keep))
+        self.directory = directory
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace):
+        with self._lock:
+            self._traces[trace.id] = trace
+            while len(self._traces) > self.keep:
+                self._traces.popitem(last=False)
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(os.path.join(self.directory, f"{trace.id}.json"), "w") as f:
+                    json.dump(trace.chrome_trace(), f)
+            except OSError as e:
+                logger.warning(f"Could not write trace {trace.id}: {e}")
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return self._traces.get(trace_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            traces = list(self._traces.values())
+        return [
+            {
+                "id": t.id,
+                "request": t.name,
+                "started_at": t.started_at,
+                "duration_ms": round(((t.end or time.perf_counter()) - t.start) * 1000, 2),
+                "spans": len(t.spans),
+            }
+            for t in reversed(traces)
+        ]
+
+
+class TraceMiddleware:
+    """
+    ASGI middleware that traces requests sent with ``X-Trace: 1`` (or all of
+    them with ``always``), adds ``X-Trace-Id`` and ``Server-Timing`` to the
+    response, and hands the finished trace to ``store``.
+
+    Headers go out before a streaming body is produced, so for streams the
+    ``Server-Timing`` summary is partial; the stored trace is complete.
+    """
+
+    def __init__(self, app, store: TraceStore, always: bool = False, header: bool = True):
+        self.app = app
+        self.store = store
+        self.always = always
+        self.header = header
+
+    def _wanted(self, scope) -> bool:
+        if self.always:
+            return True
+        if not self.header:
+            return False
+        for name, value in scope["headers"]:
+            if name == TRACE_HEADER:
+                return value.strip().lower() in (b"1", b"true", b"yes", b"on")
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        trace.threads[threading.get_ident()] = "event-loop"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace.id.encode()))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = activate(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            deactivate(token)
+            trace.finish()
+            self.store.add(trace)
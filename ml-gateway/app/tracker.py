@@ -1,185 +1,615 @@
 """
 Object tracking module for video processing.
-Implements centroid-based tracking to associate objects across frames.
+
+Two interchangeable engines share the ``Tracker`` interface:
+
+- ``CentroidTracker`` ("centroid"): associates objects by centroid distance.
+- ``SortTracker`` ("sort"): SORT-style constant-velocity Kalman prediction
+  with IoU association, which keeps identities across larger gaps between
+  sampled frames.
+
+Tracker state lives in preallocated NumPy arrays (grown by doubling) rather
+than per-object Python containers, and gating, matching and updates are
+vectorized so the per-frame cost stays low in dense scenes.
+
+Objects only match detections with the same label, so the cost matrix is
+block-diagonal: each label's block is gated and solved on its own with a
+linear-assignment solver (scipy), or greedily if scipy is not installed.
 """
 
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Type
 from collections import OrderedDict
-import math
 
 from .schemas import Detection
 
+try:
+    from scipy.optimize import linear_sum_assignment
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
 
-class CentroidTracker:
+class TrackedObjects(Mapping):
     """
-    Simple centroid-based object tracker.
-    Tracks objects across frames by computing centroids and associating
-    them based on minimum distance.
+    Read-only snapshot of the tracked objects returned by ``update()``.
+
+    Behaves like ``Dict[int, Dict]`` (object_id -> centroid/label/size/disappeared)
+    but only builds the per-object dicts when they are accessed.
     """
-    
-    def __init__(self, max_disappeared: int = 30, max_distance: float = 100.0):
+
+    def __init__(self, ids: np.ndarray, centroids: np.ndarray, sizes: np.ndarray,
+                 labels: np.ndarray, disappeared: np.ndarray, label_names: List[str]):
+        self._ids = ids
+        self._centroids = centroids
+        self._sizes = sizes
+        self._labels = labels
+        self._disappeared = disappeared
+        self._label_names = label_names
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids.tolist())
+
+    def __getitem__(self, object_id: int) -> Dict:
+        if self._index is None:
+            self._index = {oid: i for i, oid in enumerate(self._ids.tolist())}
+        i = self._index[object_id]
+        return {
+            'centroid': (float(self._centroids[i, 0]), float(self._centroids[i, 1])),
+            'label': self._label_names[self._labels[i]],
+            'size': (float(self._sizes[i, 0]), float(self._sizes[i, 1])),
+            'disappeared': int(self._disappeared[i])
+        }
+
+
+def _assign(cost: np.ndarray, feasible: np.ndarray, max_cost: float,
+            method: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Solve one label block of the assignment problem.
+
+    Args:
+        cost: Pairwise cost (tracks x detections), lower is better
+        feasible: Pairs allowed to match (inside the gate)
+        max_cost: Upper bound of cost over feasible pairs
+        method: "optimal" (linear assignment) or "greedy"
+
+    Returns:
+        Matched (row, col) index arrays into cost
+    """
+    # Gate first: rows/cols with no pair inside the gate can't match anything
+    row_idx = np.flatnonzero(feasible.any(axis=1))
+    if len(row_idx) == 0:
+        return row_idx, row_idx
+    col_idx = np.flatnonzero(feasible.any(axis=0))
+    sub = cost[np.ix_(row_idx, col_idx)]
+    sub_feasible = feasible[np.ix_(row_idx, col_idx)]
+
+    if method == "optimal":
+        sub = sub.copy()
+        # Gated-out pairs cost more than any full set of feasible matches,
+        # so the solver maximizes the number of feasible matches first
+        sub[~sub_feasible] = max_cost * (min(sub.shape) + 1)
+        rows, cols = linear_sum_assignment(sub)
+    else:
+        # Greedy: rows in order of their cheapest detection each claim it;
+        # the first claim on a column wins
+        cols = sub.argmin(axis=1)
+        rows = sub[np.arange(len(cols)), cols].argsort()
+        cols = cols[rows]
+        order = np.argsort(cols, kind='stable')
+        sorted_cols = cols[order]
+        first = np.ones(len(order), dtype=bool)
+        np.not_equal(sorted_cols[1:], sorted_cols[:-1], out=first[1:])
+        rows, cols = rows[order[first]], sorted_cols[first]
+
+    ok = sub_feasible[rows, cols]
+    return row_idx[rows[ok]], col_idx[cols[ok]]
+
+
+class Tracker:
+    """
+    Base class for trackers: array-backed object store, label codes and counts.
+
+    Subclasses implement ``_match_objects()`` and set ``method`` (reported as
+    ``tracking_method``). Per-object state lives in the arrays named in
+    ``_arrays``; rows [0, count) are the active objects in registration order.
+    """
+
+    method = "base"
+    gating_option = ""  # create_tracker argument passed on as this engine's association gate
+    _arrays = ("_ids", "_centroids", "_sizes", "_labels", "_disappeared")
+
+    def __init__(self, max_disappeared: int = 30, capacity: int = 64, assignment: Optional[str] = None):
         """
-        Initialize the centroid tracker.
-        
+        Initialize the tracker.
+
         Args:
             max_disappeared: Maximum number of frames an object can disappear
-            max_distance: Maximum distance for associating objects between frames
+            capacity: Initial number of object slots (grows automatically)
+            assignment: "optimal" (linear assignment) or "greedy"; defaults to
+                optimal when scipy is available
         """
         self.next_object_id = 0
-        self.objects = OrderedDict()  # object_id -> centroid
-        self.disappeared = OrderedDict()  # object_id -> disappeared_count
-        self.object_labels = OrderedDict()  # object_id -> label
-        self.object_sizes = OrderedDict()  # object_id -> (width, height)
         self.max_disappeared = max_disappeared
-        self.max_distance = max_distance
-        
+        if assignment is None:
+            assignment = "optimal" if SCIPY_AVAILABLE else "greedy"
+        if assignment == "optimal" and not SCIPY_AVAILABLE:
+            raise ValueError("Optimal assignment requires scipy")
+        if assignment not in ("optimal", "greedy"):
+            raise ValueError(f"Unknown assignment method '{assignment}'")
+        self.assignment = assignment
+
+        self.count = 0
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._centroids = np.empty((capacity, 2), dtype=np.float64)
+        self._sizes = np.empty((capacity, 2), dtype=np.float64)
+        self._labels = np.empty(capacity, dtype=np.int32)  # codes into _label_names
+        self._disappeared = np.empty(capacity, dtype=np.int32)
+
+        self._label_codes: Dict[str, int] = {}
+        self._label_names: List[str] = []
+
+    def describe(self) -> Dict:
+        """Engine name and parameters, merged into ``tracking_info``."""
+        return {
+            "tracking_method": self.method,
+            "assignment": self.assignment,
+            "max_disappeared_frames": self.max_disappeared,
+        }
+
+    # Compatibility views of the tracker state (built on demand)
+
+    @property
+    def objects(self) -> "OrderedDict[int, Tuple[float, float]]":
+        return OrderedDict(zip(self._ids[:self.count].tolist(), map(tuple, self._centroids[:self.count].tolist())))
+
+    @property
+    def disappeared(self) -> "OrderedDict[int, int]":
+        return OrderedDict(zip(self._ids[:self.count].tolist(), self._disappeared[:self.count].tolist()))
+
+    @property
+    def object_labels(self) -> "OrderedDict[int, str]":
+        return OrderedDict(zip(self._ids[:self.count].tolist(),
+                               (self._label_names[c] for c in self._labels[:self.count])))
+
+    @property
+    def object_sizes(self) -> "OrderedDict[int, Tuple[float, float]]":
+        return OrderedDict(zip(self._ids[:self.count].tolist(), map(tuple, self._sizes[:self.count].tolist())))
+
+    def label_code(self, label: str) -> int:
+        """Return the integer code for a label, assigning a new one if needed."""
+        code = self._label_codes.get(label)
+        if code is None:
+            code = len(self._label_names)
+            self._label_codes[label] = code
+            self._label_names.append(label)
+        return code
+
     def register_object(self, centroid: Tuple[float, float], label: str, size: Tuple[float, float]):
         """Register a new object with the tracker."""
-        self.objects[self.next_object_id] = centroid
-        self.disappeared[self.next_object_id] = 0
-        self.object_labels[self.next_object_id] = label
-        self.object_sizes[self.next_object_id] = size
-        self.next_object_id += 1
-        
+        self._register(np.asarray([centroid], dtype=np.float64),
+                       np.asarray([size], dtype=np.float64),
+                       np.asarray([self.label_code(label)], dtype=np.int32))
+
     def deregister_object(self, object_id: int):
         """Remove an object from tracking."""
-        del self.objects[object_id]
-        del self.disappeared[object_id]
-        del self.object_labels[object_id]
-        del self.object_sizes[object_id]
-        
-    def update(self, detections: List[Detection]) -> Dict[int, Dict]:
+        keep = self._ids[:self.count] != object_id
+        self._compact(keep)
+
+    def update(self, detections: List[Detection]) -> TrackedObjects:
         """
         Update the tracker with new detections.
-        
+
         Args:
             detections: List of detections from current frame
-            
+
         Returns:
-            Dictionary mapping object_id to object info
+            Mapping of object_id to object info
         """
-        # If no detections, mark all existing objects as disappeared
         if len(detections) == 0:
-            for object_id in list(self.disappeared.keys()):
-                self.disappeared[object_id] += 1
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self.deregister_object(object_id)
+            return self.update_boxes(np.empty((0, 4)), [])
+        boxes = np.array([(d.bbox.x1, d.bbox.y1, d.bbox.x2, d.bbox.y2) for d in detections],
+                         dtype=np.float64)
+        return self.update_boxes(boxes, [d.label for d in detections])
+
+    def update_boxes(self, boxes: np.ndarray, labels: Sequence[str]) -> TrackedObjects:
+        """
+        Update the tracker from raw boxes.
+
+        Args:
+            boxes: Array of shape (N, 4) with x1, y1, x2, y2 per detection
+            labels: N label strings
+
+        Returns:
+            Mapping of object_id to object info
+        """
+        n = self.count
+
+        # If no detections, mark all existing objects as disappeared
+        if len(boxes) == 0:
+            self._age(np.ones(n, dtype=bool))
             return self._get_current_objects()
-        
+
         # Calculate centroids and sizes for new detections
-        input_centroids = []
-        input_labels = []
-        input_sizes = []
-        
-        for detection in detections:
-            bbox = detection.bbox
-            cx = (bbox.x1 + bbox.x2) / 2.0
-            cy = (bbox.y1 + bbox.y2) / 2.0
-            width = bbox.x2 - bbox.x1
-            height = bbox.y2 - bbox.y1
-            
-            input_centroids.append((cx, cy))
-            input_labels.append(detection.label)
-            input_sizes.append((width, height))
-        
+        boxes = np.asarray(boxes, dtype=np.float64)
+        input_centroids = (boxes[:, 0:2] + boxes[:, 2:4]) * 0.5
+        input_sizes = boxes[:, 2:4] - boxes[:, 0:2]
+        input_labels = np.fromiter((self.label_code(l) for l in labels), dtype=np.int32, count=len(labels))
+
         # If no existing objects, register all detections as new objects
-        if len(self.objects) == 0:
-            for i in range(len(input_centroids)):
-                self.register_object(input_centroids[i], input_labels[i], input_sizes[i])
+        if n == 0:
+            self._register(input_centroids, input_sizes, input_labels)
         else:
             # Match existing objects to new detections
-            self._match_objects(input_centroids, input_labels, input_sizes)
-            
+            self._match_objects(boxes, input_centroids, input_labels, input_sizes)
+
         return self._get_current_objects()
-    
-    def _match_objects(self, input_centroids: List[Tuple[float, float]], 
-                      input_labels: List[str], input_sizes: List[Tuple[float, float]]):
-        """Match existing objects to new detections."""
-        object_centroids = list(self.objects.values())
-        object_ids = list(self.objects.keys())
-        
-        # Compute distance matrix between existing objects and new detections
-        D = np.linalg.norm(np.array(object_centroids)[:, np.newaxis] - input_centroids, axis=2)
-        
-        # Find the minimum values and sort by distance
-        rows = D.min(axis=1).argsort()
-        cols = D.argmin(axis=1)[rows]
-        
-        # Track which row and column indices have been used
-        used_row_idxs = set()
-        used_col_idxs = set()
-        
-        # Match objects based on minimum distance and same label
-        for (row, col) in zip(rows, cols):
-            if row in used_row_idxs or col in used_col_idxs:
-                continue
-            
-            # Check if distance is acceptable and labels match
-            object_id = object_ids[row]
-            distance = D[row, col]
-            
-            if (distance <= self.max_distance and 
-                self.object_labels[object_id] == input_labels[col]):
-                
-                # Update object position and reset disappeared counter
-                self.objects[object_id] = input_centroids[col]
-                self.disappeared[object_id] = 0
-                self.object_sizes[object_id] = input_sizes[col]
-                
-                used_row_idxs.add(row)
-                used_col_idxs.add(col)
-        
-        # Handle unmatched detections and objects
-        unused_row_idxs = set(range(0, D.shape[0])).difference(used_row_idxs)
-        unused_col_idxs = set(range(0, D.shape[1])).difference(used_col_idxs)
-        
-        # If more objects than detections, mark missing objects as disappeared
-        if D.shape[0] >= D.shape[1]:
-            for row in unused_row_idxs:
-                object_id = object_ids[row]
-                self.disappeared[object_id] += 1
-                
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self.deregister_object(object_id)
-        
-        # If more detections than objects, register new objects
-        else:
-            for col in unused_col_idxs:
-                # Only register if it's a reasonable distance from existing objects
-                min_distance_to_existing = float('inf')
-                if len(object_centroids) > 0:
-                    distances_to_existing = [
-                        math.sqrt((input_centroids[col][0] - oc[0])**2 + 
-                                 (input_centroids[col][1] - oc[1])**2)
-                        for oc in object_centroids
-                    ]
-                    min_distance_to_existing = min(distances_to_existing)
-                
-                # Register as new object if far enough from existing ones
-                if min_distance_to_existing > self.max_distance * 0.5:
-                    self.register_object(input_centroids[col], input_labels[col], input_sizes[col])
-    
-    def _get_current_objects(self) -> Dict[int, Dict]:
+
+    def _match_objects(self, boxes: np.ndarray, input_centroids: np.ndarray, input_labels: np.ndarray,
+                       input_sizes: np.ndarray):
+        """Associate detections with existing objects, age the rest and register new ones."""
+        raise NotImplementedError
+
+    def _register(self, centroids: np.ndarray, sizes: np.ndarray, labels: np.ndarray):
+        k = len(centroids)
+        self._reserve(self.count + k)
+        s = slice(self.count, self.count + k)
+        self._ids[s] = np.arange(self.next_object_id, self.next_object_id + k)
+        self._centroids[s] = centroids
+        self._sizes[s] = sizes
+        self._labels[s] = labels
+        self._disappeared[s] = 0
+        self.next_object_id += k
+        self.count += k
+
+    def _age(self, unmatched: np.ndarray):
+        """Age objects that got no detection this frame and drop expired ones."""
+        self._disappeared[:self.count][unmatched] += 1
+        self._expire()
+
+    def _expire(self):
+        expired = self._disappeared[:self.count] > self.max_disappeared
+        if expired.any():
+            self._compact(~expired)
+
+    def _compact(self, keep: np.ndarray):
+        """Drop rows where keep is False, preserving registration order."""
+        k = int(keep.sum())
+        if k == self.count:
+            return
+        for name in self._arrays:
+            arr = getattr(self, name)
+            arr[:k] = arr[:self.count][keep]
+        self.count = k
+
+    def _reserve(self, needed: int):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self._arrays:
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def _get_current_objects(self) -> TrackedObjects:
         """Get current tracked objects."""
-        current_objects = {}
-        for object_id in self.objects.keys():
-            current_objects[object_id] = {
-                'centroid': self.objects[object_id],
-                'label': self.object_labels[object_id],
-                'size': self.object_sizes[object_id],
-                'disappeared': self.disappeared[object_id]
-            }
-        return current_objects
-    
+        n = self.count
+        return TrackedObjects(
+            self._ids[:n].copy(), self._centroids[:n].copy(), self._sizes[:n].copy(),
+            self._labels[:n].copy(), self._disappeared[:n].copy(), self._label_names
+        )
+
     def get_unique_counts(self) -> Dict[str, int]:
         """Get count of unique objects by label."""
-        counts = {}
-        for object_id in self.objects.keys():
-            label = self.object_labels[object_id]
-            counts[label] = counts.get(label, 0) + 1
-        return counts
-    
+        counts = np.bincount(self._labels[:self.count], minlength=len(self._label_names))
+        return {self._label_names[code]: int(c) for code, c in enumerate(counts) if c}
+
     def get_total_unique_objects(self) -> int:
         """Get total number of unique objects tracked."""
-        return len(self.objects)
+        return self.count
+
+
+class CentroidTracker(Tracker):
+    """
+    Simple centroid-based object tracker.
+    Tracks objects across frames by computing centroids and associating
+    them based on minimum distance.
+    """
+
+    method = "centroid_based"
+    gating_option = "max_distance"
+
+    def __init__(self, max_disappeared: int = 30, max_distance: float = 100.0, capacity: int = 64,
+                 assignment: Optional[str] = None):
+        """
+        Initialize the centroid tracker.
+
+        Args:
+            max_disappeared: Maximum number of frames an object can disappear
+            max_distance: Maximum distance for associating objects between frames
+            capacity: Initial number of object slots (grows automatically)
+            assignment: "optimal" (linear assignment) or "greedy"; defaults to
+                optimal when scipy is available
+        """
+        super().__init__(max_disappeared, capacity, assignment)
+        self.max_distance = max_distance
+
+        # Reused scratch space for the object x detection distance matrix
+        self._scratch = np.empty(0, dtype=np.float64)
+        self._scratch_y = np.empty(0, dtype=np.float64)
+
+    def describe(self) -> Dict:
+        info = super().describe()
+        info["max_distance_threshold"] = self.max_distance
+        return info
+
+    def _match_objects(self, boxes: np.ndarray, input_centroids: np.ndarray, input_labels: np.ndarray,
+                       input_sizes: np.ndarray):
+        """Match existing objects to new detections, one label at a time."""
+        n = self.count
+        m = len(input_centroids)
+        object_labels = self._labels[:n]
+        max_d2 = self.max_distance ** 2
+
+        matched_objects = np.zeros(n, dtype=bool)
+        matched_detections = np.zeros(m, dtype=bool)
+        # Unmatched detections this close to any tracked object (whatever its label) are treated
+        # as duplicates, so a detection whose label flips (car/truck) is not counted again
+        near_existing = self._squared_distances(self._centroids[:n], input_centroids).min(axis=0) <= max_d2 * 0.25
+
+        for code in np.unique(input_labels):
+            det_idx = np.flatnonzero(input_labels == code)
+            obj_idx = np.flatnonzero(object_labels == code)
+            if len(obj_idx) == 0:
+                continue
+
+            # Squared distances between this label's objects and detections
+            D = self._squared_distances(self._centroids[obj_idx], input_centroids[det_idx])
+
+            # Square roots keep the optimal solver minimizing total distance
+            cost = D if self.assignment == "greedy" else np.sqrt(D)
+            rows, cols = _assign(cost, D <= max_d2, self.max_distance, self.assignment)
+            if len(rows) == 0:
+                continue
+            obj_rows, det_cols = obj_idx[rows], det_idx[cols]
+            matched_objects[obj_rows] = True
+            matched_detections[det_cols] = True
+
+            # Update object position and reset disappeared counter
+            self._centroids[obj_rows] = input_centroids[det_cols]
+            self._sizes[obj_rows] = input_sizes[det_cols]
+            self._disappeared[obj_rows] = 0
+
+        # Objects without a detection this frame age and eventually expire
+        self._age(~matched_objects)
+
+        # Register detections that matched nothing and aren't duplicates of a tracked object
+        new = ~matched_detections & ~near_existing
+        if new.any():
+            self._register(input_centroids[new], input_sizes[new], input_labels[new])
+
+    def _squared_distances(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Pairwise squared distances of shape (len(a), len(b)) in a reused buffer."""
+        size = len(a) * len(b)
+        if self._scratch.size < size:
+            self._scratch = np.empty(size * 2, dtype=np.float64)
+            self._scratch_y = np.empty(size * 2, dtype=np.float64)
+        shape = (len(a), len(b))
+        d = self._scratch[:size].reshape(shape)
+        dy = self._scratch_y[:size].reshape(shape)
+        np.subtract.outer(a[:, 0], b[:, 0], out=d)
+        np.multiply(d, d, out=d)
+        np.subtract.outer(a[:, 1], b[:, 1], out=dy)
+        np.multiply(dy, dy, out=dy)
+        np.add(d, dy, out=d)
+        return d
+
+
+# Constant-velocity model over [cx, cy, area, aspect, vx, vy, varea] (as in SORT)
+_F = np.eye(7)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+_R = np.diag([1.0, 1.0, 10.0, 10.0])
+_P0 = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+_GATE_CHI2 = 9.21  # 99% quantile of chi-square with 2 degrees of freedom
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of shape (len(a), len(b)) for x1, y1, x2, y2 boxes."""
+    x1 = np.maximum.outer(a[:, 0], b[:, 0])
+    y1 = np.maximum.outer(a[:, 1], b[:, 1])
+    x2 = np.minimum.outer(a[:, 2], b[:, 2])
+    y2 = np.minimum.outer(a[:, 3], b[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = np.add.outer(area_a, area_b) - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class SortTracker(Tracker):
+    """
+    SORT-style tracker: every object carries a constant-velocity Kalman
+    filter over its box; each frame boxes are predicted forward and matched
+    to detections by IoU. Prediction lets objects that moved further than
+    their own size between sampled frames keep their identity, so lower
+    ``video_fps_sample`` values still give accurate unique counts.
+
+    Objects and detections left over by the IoU pass get a second pass on
+    the Mahalanobis distance of the centre under each filter's own position
+    uncertainty. New objects (velocity still unknown) get a wide gate, so
+    fast objects are picked up at their second sighting; established tracks
+    get a tight one. Neither gate is a fixed pixel distance.
+    """
+
+    method = "sort_kalman_iou"
+    gating_option = "iou_threshold"
+    _arrays = Tracker._arrays + ("_state", "_cov")
+
+    def __init__(self, max_disappeared: int = 30, iou_threshold: float = 0.3, capacity: int = 64,
+                 assignment: Optional[str] = None):
+        """
+        Initialize the SORT tracker.
+
+        Args:
+            max_disappeared: Maximum number of frames an object can go unmatched
+            iou_threshold: Minimum IoU between a predicted box and a detection to match
+            capacity: Initial number of object slots (grows automatically)
+            assignment: "optimal" (linear assignment) or "greedy"; defaults to
+                optimal when scipy is available
+        """
+        super().__init__(max_disappeared, capacity, assignment)
+        self.iou_threshold = iou_threshold
+        self._state = np.empty((capacity, 7), dtype=np.float64)
+        self._cov = np.empty((capacity, 7, 7), dtype=np.float64)
+
+    def describe(self) -> Dict:
+        info = super().describe()
+        info["iou_threshold"] = self.iou_threshold
+        return info
+
+    def update_boxes(self, boxes: np.ndarray, labels: Sequence[str]) -> TrackedObjects:
+        self._predict()
+        return super().update_boxes(boxes, labels)
+
+    def _predict(self):
+        """Advance every filter one frame and refresh centroids/sizes from the prediction."""
+        n = self.count
+        if n == 0:
+            return
+        x = self._state[:n]
+        # Keep the predicted area positive
+        shrinking = x[:, 2] + x[:, 6] <= 0
+        x[shrinking, 6] = 0.0
+        x[:] = x @ _F.T
+        P = self._cov[:n]
+        P[:] = _F @ P @ _F.T + _Q
+        self._sync(slice(0, n))
+
+    def _match_objects(self, boxes: np.ndarray, input_centroids: np.ndarray, input_labels: np.ndarray,
+                       input_sizes: np.ndarray):
+        """Match predicted boxes to new detections, one label at a time."""
+        n = self.count
+        m = len(boxes)
+        object_labels = self._labels[:n]
+        centroids = self._centroids[:n]
+        sizes = self._sizes[:n]
+        predicted = np.hstack([centroids - sizes / 2, centroids + sizes / 2])
+
+        matched_objects = np.zeros(n, dtype=bool)
+        matched_detections = np.zeros(m, dtype=bool)
+        obj_matches, det_matches = [], []
+
+        for code in np.unique(input_labels):
+            det_idx = np.flatnonzero(input_labels == code)
+            obj_idx = np.flatnonzero(object_labels == code)
+            if len(obj_idx) == 0:
+                continue
+            iou = _iou(predicted[obj_idx], boxes[det_idx])
+            rows, cols = _assign(1.0 - iou, iou >= self.iou_threshold, 1.0, self.assignment)
+            obj_matches.append(obj_idx[rows])
+            det_matches.append(det_idx[cols])
+
+            # Second pass on whatever IoU left unmatched
+            obj_left = np.setdiff1d(obj_idx, obj_idx[rows], assume_unique=True)
+            det_left = np.setdiff1d(det_idx, det_idx[cols], assume_unique=True)
+            if len(obj_left) == 0 or len(det_left) == 0:
+                continue
+            d2 = self._mahalanobis(obj_left, input_centroids[det_left])
+            rows, cols = _assign(np.sqrt(d2), d2 <= _GATE_CHI2, np.sqrt(_GATE_CHI2), self.assignment)
+            obj_matches.append(obj_left[rows])
+            det_matches.append(det_left[cols])
+
+        if obj_matches:
+            obj_rows = np.concatenate(obj_matches)
+            det_cols = np.concatenate(det_matches)
+            matched_objects[obj_rows] = True
+            matched_detections[det_cols] = True
+            self._correct(obj_rows, input_centroids[det_cols], input_sizes[det_cols])
+
+        self._age(~matched_objects)
+
+        new = ~matched_detections
+        if new.any():
+            self._register(input_centroids[new], input_sizes[new], input_labels[new])
+
+    def _mahalanobis(self, rows: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Squared Mahalanobis distances (len(rows), len(centroids)) of centres under each filter."""
+        S = self._cov[rows, :2, :2] + _R[:2, :2]
+        a, b, d = S[:, 0, 0], S[:, 0, 1], S[:, 1, 1]
+        det = a * d - b * b
+        dx = centroids[None, :, 0] - self._state[rows, 0][:, None]
+        dy = centroids[None, :, 1] - self._state[rows, 1][:, None]
+        return (d[:, None] * dx * dx - 2 * b[:, None] * dx * dy + a[:, None] * dy * dy) / det[:, None]
+
+    def _correct(self, rows: np.ndarray, centroids: np.ndarray, sizes: np.ndarray):
+        """Batched Kalman measurement update for matched objects."""
+        z = self._measurement(centroids, sizes)
+        x = self._state[rows]
+        P = self._cov[rows]
+        S = P[:, :4, :4] + _R
+        # K^T = S^-1 H P (S is symmetric)
+        K = np.linalg.solve(S, P[:, :4, :]).transpose(0, 2, 1)
+        y = z - x[:, :4]
+        self._state[rows] = x + np.einsum('kij,kj->ki', K, y)
+        self._cov[rows] = P - K @ P[:, :4, :]
+        self._disappeared[rows] = 0
+        self._sync(rows)
+
+    def _register(self, centroids: np.ndarray, sizes: np.ndarray, labels: np.ndarray):
+        start = self.count
+        super()._register(centroids, sizes, labels)
+        s = slice(start, self.count)
+        self._state[s, :4] = self._measurement(centroids, sizes)
+        self._state[s, 4:] = 0.0
+        self._cov[s] = _P0
+        self._sync(s)
+
+    @staticmethod
+    def _measurement(centroids: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        w = np.maximum(sizes[:, 0], 1e-6)
+        h = np.maximum(sizes[:, 1], 1e-6)
+        return np.column_stack([centroids, w * h, w / h])
+
+    def _sync(self, rows):
+        """Derive centroid and size of the given rows from their filter state."""
+        x = self._state[rows]
+        area = np.maximum(x[:, 2], 1e-6)
+        aspect = np.maximum(x[:, 3], 1e-6)
+        w = np.sqrt(area * aspect)
+        self._centroids[rows] = x[:, :2]
+        self._sizes[rows, 0] = w
+        self._sizes[rows, 1] = area / w
+
+
+TRACKERS: Dict[str, Type[Tracker]] = {
+    "centroid": CentroidTracker,
+    "sort": SortTracker,
+}
+
+
+def create_tracker(method: str, max_disappeared: int = 30, max_distance: float = 100.0,
+                   iou_threshold: float = 0.3) -> Tracker:
+    """
+    Build a tracker by name ("centroid" or "sort").
+
+    Args:
+        method: Key into TRACKERS
+        max_disappeared: Frames an object may go unmatched before it is dropped
+        max_distance: Centroid gating distance in pixels (centroid only)
+        iou_threshold: Minimum IoU to associate a detection (sort only)
+    """
+    try:
+        tracker_cls = TRACKERS[method]
+    except KeyError:
+        raise ValueError(f"Unknown tracker '{method}'. Available: {', '.join(TRACKERS)}") from None
+    gates = {"max_distance": max_distance, "iou_threshold": iou_threshold}
+    option = tracker_cls.gating_option
+    return tracker_cls(max_disappeared=max_disappeared, **{option: gates[option]})
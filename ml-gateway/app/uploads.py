@@ -0,0 +1,143 @@
+"""
+Video uploads spooled to disk in bounded chunks.
+
+Starlette already spools multipart files above 1 MiB to an anonymous temp
+file, but OpenCV needs a path, and reading the whole upload back with
+``await file.read()`` would pull it into memory. ``save_upload`` copies that
+spool into a named temp file chunk by chunk on a worker thread (so a video
+is written to disk twice).
+
+The size limit is enforced by ``UploadLimitMiddleware`` while the body is
+still arriving, before or during multipart parsing, whether or not the
+client sent a Content-Length.
+"""
+
+import logging
+import mimetypes
+import os
+import tempfile
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 1024 * 1024
+VIDEO_SUFFIXES = (".mp4", ".m4v", ".mov", ".avi", ".mkv", ".webm", ".ts", ".mpg", ".mpeg", ".flv", ".wmv", ".3gp")
+
+
+class UploadTooLargeError(HTTPException):
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Upload exceeds the {max_bytes // (1024 * 1024)}MB limit")
+
+
+def upload_suffix(filename: Optional[str], content_type: Optional[str]) -> str:
+    """
+    Temp-file suffix for an upload, so the container format can be probed
+    from the extension: the file's own extension if it is a known video
+    type, else one guessed from the content type, else ".mp4".
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in VIDEO_SUFFIXES:
+        return ext
+    guessed = mimetypes.guess_extension(content_type or "")
+    if guessed in VIDEO_SUFFIXES:
+        return guessed
+    return ".mp4"
+
+
+def _copy(src, dst, max_bytes: int) -> int:
+    src.seek(0)
+    total = 0
+    while True:
+        chunk = src.read(CHUNK_BYTES)
+        if not chunk:
+            return total
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+        dst.write(chunk)
+
+
+async def save_upload(file: UploadFile, max_bytes: int, directory: Optional[str] = None) -> str:
+    """
+    Copy an upload to a named temp file in ``directory`` and return its path.
+
+    At most one chunk is held in memory. The request body has already been
+    capped by UploadLimitMiddleware; ``max_bytes`` (0 = unlimited) bounds the
+    single file as well, raising UploadTooLargeError (413) and removing the
+    partial copy.
+    """
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    suffix = upload_suffix(file.filename, file.content_type)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            size = await run_in_threadpool(_copy, file.file, dst, max_bytes)
+    except BaseException:
+        os.unlink(path)
+        raise
+    finally:
+        await file.close()
+    logger.info(f"📥 Saved upload {file.filename} ({size / (1024 * 1024):.1f} MB) to {path}")
+    return path
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that answers 413 to requests on ``paths`` whose body
+    exceeds ``max_bytes``: straight away from a declared Content-Length, or
+    (for chunked uploads) as soon as the bytes received pass the limit, so
+    the multipart parser never spools more than ``max_bytes`` to disk.
+    """
+
+    def __init__(self, app, paths: Sequence[str], max_bytes: int):
+        self.app = app
+        self.paths = tuple(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if not (self.max_bytes and scope["type"] == "http" and scope["path"] in self.paths):
+            await self.app(scope, receive, send)
+            return
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > self.max_bytes:
+                    await self._refuse(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # An HTTPException, so FastAPI's body parsing passes it through as a 413
+                    raise UploadTooLargeError(self.max_bytes)
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except UploadTooLargeError:
+            if started:
+                raise
+            await self._refuse(scope, receive, send)
+
+    async def _refuse(self, scope, receive, send):
+        logger.warning(f"📥 Refused {scope['path']} upload larger than {self.max_bytes} bytes")
+        error = UploadTooLargeError(self.max_bytes)
+        response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+        await response(scope, receive, send)
@@ -1,89 +1,310 @@
 import cv2
 import math
+import sys
 import numpy as np
 import logging
 import asyncio
-from collections import Counter
-from .infer import detector
-from .schemas import VideoDetections, VideoFrameDetections
+import queue
+import threading
+import time
+import concurrent.futures
+import contextvars
+from collections import Counter, deque
+from typing import AsyncIterator, Callable, Optional
+from .infer import get_detector
+from .detections import VideoFrame, VideoResult
+from .schemas import VideoDetections
 from .config import settings
-from .tracker import CentroidTracker
+from .tracker import Tracker, create_tracker
+from .pools import BoundedExecutor
+from .sampling import FrameSampler, is_live_source
+from .motion import MotionGate
+from .metrics import registry
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
-def _sample_frames(cap, fps_sample: int, max_frames: int):
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-    step = max(1, int(round(fps / fps_sample)))
-    processed = 0
-    i = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if i % step == 0:
-            yield i, frame, (i / (fps or 1.0))
-            processed += 1
-            if processed >= max_frames:
+# Whole-video loops (decode, inference, tracking) run here, never on the event loop
+video_pool = BoundedExecutor(
+    "video",
+    max_workers=settings.video_max_concurrency,
+    max_pending=settings.video_queue_max,
+    retry_after=settings.retry_after_seconds,
+)
+
+_END = object()
+
+def make_tracker(method: Optional[str] = None) -> Tracker:
+    """Build the configured tracker, or the named one ("centroid" / "sort")."""
+    return create_tracker(
+        method or settings.tracker_method,
+        max_disappeared=settings.tracker_max_disappeared,
+        max_distance=settings.tracker_max_distance,
+        iou_threshold=settings.tracker_iou_threshold,
+    )
+
+class FrameDecoder:
+    """
+    Decodes sampled frames on a background thread into a bounded queue so
+    decoding overlaps with inference and tracking of earlier frames.
+    """
+
+    def __init__(self, sampler: FrameSampler, depth: int):
+        self.sampler = sampler
+        self.queue = queue.Queue(maxsize=max(1, depth))
+        self.decode_time = 0.0  # time spent decoding on the decoder thread
+        self.stall_time = 0.0  # time the consumer spent waiting for frames
+        self.error = None
+        self._stop = threading.Event()
+        # The decoder thread inherits the caller's context (and with it the request trace)
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._run,), name="video-decode", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop decoding early (e.g. on error) and wait for the thread to exit."""
+        self._stop.set()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
                 break
-        i += 1
+        self._thread.join()
+
+    def __iter__(self):
+        while True:
+            wait_start = time.perf_counter()
+            item = self.queue.get()
+            self.stall_time += time.perf_counter() - wait_start
+            if item is _END:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+    def _run(self):
+        trace = tracing.current()
+        try:
+            frames = iter(self.sampler)
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                item = next(frames, None)
+                t1 = time.perf_counter()
+                self.decode_time += t1 - t0
+                if item is None:
+                    break
+                registry.observe("stage_duration_ms", (t1 - t0) * 1000, stage="decode")
+                if trace is not None:
+                    trace.add("decode_frame", t0, t1)
+                self._put(item)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(_END)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+async def detect_on_video(source_path: str, tracker_method: Optional[str] = None,
+                          roi: Optional[np.ndarray] = None, backend: Optional[str] = None) -> VideoResult:
+    """
+    Process a video on the bounded video pool.
+    Raises QueueFullError when all video slots and waiting slots are taken.
+    """
+    return await video_pool.run(_process_video, source_path, time.time(),
+                                tracker_method=tracker_method, roi=roi, backend=backend)
+
+def open_video_stream(source_path: str, tracker_method: Optional[str] = None,
+                      roi: Optional[np.ndarray] = None, backend: Optional[str] = None) -> AsyncIterator[dict]:
+    """
+    Start processing a video and return an async iterator of events:
+    one {"type": "frame", ...} per sampled frame with running tracker counts,
+    then a final {"type": "summary", ...} (or {"type": "error", ...}).
+
+    Admission happens immediately, so QueueFullError is raised here rather
+    than after the response has started. Frame results are never
+    accumulated; a slow consumer pauses the video worker instead.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.video_pipeline_depth) * 2)
+    stop = threading.Event()
+
+    def push(event):
+        while not stop.is_set():
+            put = asyncio.run_coroutine_threadsafe(events.put(event), loop)
+            try:
+                put.result(timeout=0.5)
+                return
+            except concurrent.futures.TimeoutError:
+                if not put.cancel():
+                    return  # completed while we were timing out
+
+    def on_frame(frame_res: VideoFrame, tracker: Tracker):
+        event = frame_res.to_dict()
+        event["type"] = "frame"
+        event["unique_counts"] = tracker.get_unique_counts()
+        event["total_unique_objects"] = tracker.get_total_unique_objects()
+        push(event)
 
-async def detect_on_video(source_path: str) -> VideoDetections:
+    def work(queued_at: float):
+        try:
+            res = _process_video(source_path, queued_at, on_frame=on_frame, stop_event=stop,
+                                 tracker_method=tracker_method, roi=roi, backend=backend)
+            event = res.summary.model_dump(exclude={"results"})
+            event["type"] = "summary"
+            push(event)
+        except Exception as e:
+            logger.error(f"Video stream error for {source_path}: {e}")
+            push({"type": "error", "detail": f"Video processing error: {str(e)}"})
+        finally:
+            push(_END)
+
+    done = video_pool.submit(work, time.time())
+
+    async def drain():
+        try:
+            while True:
+                event = await events.get()
+                if event is _END:
+                    break
+                yield event
+            await done
+        finally:
+            # Client went away (or we finished): let the worker wind down
+            stop.set()
+
+    return drain()
+
+def _process_video(source_path: str, queued_at: Optional[float] = None,
+                   on_frame: Optional[Callable[[VideoFrame, Tracker], None]] = None,
+                   stop_event: Optional[threading.Event] = None,
+                   tracker_method: Optional[str] = None,
+                   roi: Optional[np.ndarray] = None,
+                   backend: Optional[str] = None,
+                   max_frames: Optional[int] = None,
+                   on_progress: Optional[Callable[[int, int, float], None]] = None) -> VideoResult:
+    """
+    Run the decode/inference/tracking pipeline on a worker thread.
+
+    Frame results are collected into the returned VideoResult unless
+    ``on_frame`` is given, in which case each one is handed to it as soon as
+    the tracker has been updated and ``frames`` stays empty. Detections stay
+    in the backends' arrays throughout; no per-box models are built.
+
+    ``max_frames`` overrides settings.video_max_frames (0 = the whole video);
+    ``on_progress(processed, expected, eta_seconds)`` is called every 10 frames.
+    """
+    queue_time = (time.time() - queued_at) if queued_at else 0.0
+    detector = get_detector(backend)
+    # Initialize object tracker for unique counting
+    tracker = make_tracker(tracker_method)
     cap = cv2.VideoCapture(source_path)
     if not cap.isOpened():
         raise RuntimeError(f"Unable to open video source: {source_path}")
 
     fps_sample = int(settings.video_fps_sample)
-    max_frames = int(settings.video_max_frames)
+    max_frames = int(settings.video_max_frames if max_frames is None else max_frames)
+    if max_frames <= 0:
+        max_frames = sys.maxsize
     results = []
-    
-    # Initialize object tracker for unique counting
-    tracker = CentroidTracker(max_disappeared=30, max_distance=100.0)
     raw_counts = Counter()  # Track raw detections for comparison
 
     processed = 0
     total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
     
     logger.info(f"🎬 Starting video processing: {source_path}")
-    logger.info(f"📊 Settings: fps_sample={fps_sample}, max_frames={max_frames}")
-    logger.info(f"🔄 Video processing is async - other endpoints will remain responsive")
+    logger.info(f"📊 Settings: fps_sample={fps_sample}, max_frames={max_frames if max_frames < sys.maxsize else 'all'}, tracker={tracker.method}")
+    logger.info(f"🔄 Video processing runs on a worker thread (queued {queue_time * 1000:.0f}ms) - other endpoints will remain responsive")
     
-    import time
     start_time = time.time()
 
-    for idx, frame, tsec in _sample_frames(cap, fps_sample, max_frames):
-        # Get detections for current frame
-        img_res = detector.predict_image(frame)
-        
-        # Count raw detections for comparison
-        for detection in img_res.detections:
-            raw_counts[detection.label] += 1
+    # Three overlapping stages: the decoder thread fills a bounded frame queue,
+    # up to `depth` frames are in flight in the batcher at once, and this
+    # thread applies results to the tracker strictly in frame order.
+    depth = max(1, int(settings.video_pipeline_depth))
+    # Live streams can't seek; files may jump straight to sampled frames
+    strategy = "grab" if is_live_source(source_path) else settings.video_sampling
+    sampler = FrameSampler(cap, fps_sample, max_frames, strategy=strategy,
+                           seek_min_step=settings.video_seek_min_step)
+    decoder = FrameDecoder(sampler, depth).start()
+    # Sampled frames this run will produce, for progress and ETA (0 = unknown)
+    expected = max_frames if max_frames < sys.maxsize else 0
+    if sampler.frame_count > 0:
+        expected = min(max_frames, math.ceil(sampler.frame_count / sampler.step))
+    # Near-identical frames reuse the last inference instead of running the model
+    gate = MotionGate(settings.video_motion_threshold, max_skip=settings.video_motion_max_skip)
+    in_flight = deque()
+    inference_wait = 0.0
+    tracking_time = 0.0
+    last_res = None
+
+    def finish_oldest():
+        nonlocal processed, inference_wait, tracking_time, last_res
+        idx, tsec, future = in_flight.popleft()
+        skipped = future is None
+        if not skipped:
+            wait_start = time.perf_counter()
+            last_res = future.result()
+            inference_wait += time.perf_counter() - wait_start
+        img_res = last_res
         
-        # Update tracker with current frame detections
-        tracked_objects = tracker.update(img_res.detections)
+        track_start = time.perf_counter()
+        # Update tracker with current frame detections; a skipped frame shows
+        # the same scene, so the tracker state from the reference frame stands
+        if not skipped:
+            # Count raw detections for comparison (reused detections were counted already)
+            raw_counts.update(img_res.labels.tolist())
+            with tracing.span("track"):
+                tracker.update_boxes(img_res.boxes, img_res.labels)
+        track_elapsed = time.perf_counter() - track_start
+        tracking_time += track_elapsed
+        registry.observe("stage_duration_ms", track_elapsed * 1000, stage="tracking")
         
         # Store frame results (with original detections for visualization)
-        results.append(VideoFrameDetections(
-            frame_index=idx,
-            time_sec=float(tsec),
-            detections=img_res.detections
-        ))
+        frame_res = VideoFrame(idx, float(tsec), img_res, inference_skipped=skipped)
+        if on_frame is None:
+            results.append(frame_res)
+        else:
+            on_frame(frame_res, tracker)
         
         processed += 1
         
-        # Yield control every 3 frames to allow other requests to be processed
-        if processed % 3 == 0:
-            await asyncio.sleep(0.001)  # Small sleep to yield control to event loop
-        
         # Log progress every 10 frames
         if processed % 10 == 0:
-            progress_percent = (processed / max_frames * 100) if max_frames > 0 else 0
+            progress_percent = (processed / expected * 100) if expected > 0 else 0
             elapsed = time.time() - start_time
-            if processed > 0:
-                eta_seconds = (elapsed / processed) * (max_frames - processed)
-                logger.info(f"🎬 Progress: {processed}/{max_frames} frames ({progress_percent:.1f}%) - ETA: {eta_seconds:.1f}s - Server responsive")
-            else:
-                logger.info(f"🎬 Progress: {processed}/{max_frames} frames ({progress_percent:.1f}%) - Server remains responsive")
+            eta_seconds = (elapsed / processed) * max(0, expected - processed) if expected else 0.0
+            logger.info(f"🎬 Progress: {processed}/{expected} frames ({progress_percent:.1f}%) - ETA: {eta_seconds:.1f}s - Server responsive")
+            if on_progress is not None:
+                on_progress(processed, expected, eta_seconds)
+
+    try:
+        for idx, frame, tsec in decoder:
+            if stop_event is not None and stop_event.is_set():
+                logger.info(f"⏹️ Video processing stopped early after {processed} frames")
+                break
+            # Blocking submit: when the inference queue is full this stage waits.
+            # The first frame always runs, so a skipped frame always has a predecessor to reuse.
+            future = detector.submit(frame, roi=roi) if gate.should_infer(frame) else None
+            in_flight.append((idx, tsec, future))
+            if len(in_flight) >= depth:
+                finish_oldest()
+        while in_flight:
+            finish_oldest()
+    finally:
+        decoder.close()
+        cap.release()
+
+    wall_time = time.time() - start_time
 
     # Get unique object counts from tracker (this is the key change!)
     unique_counts = tracker.get_unique_counts()
@@ -104,23 +325,32 @@ async def detect_on_video(source_path: str) -> VideoDetections:
         "unique_counts_by_label": unique_counts,
         "raw_counts_comparison": dict(raw_counts),
         "reduction_percentage": round(reduction_percent, 1),
-        "tracking_method": "centroid_based",
-        "max_disappeared_frames": 30,
-        "max_distance_threshold": 100.0
+        **tracker.describe(),
+        "queue_time_ms": round(queue_time * 1000, 1),
+        "skipped_inferences": gate.skipped,
+        "motion_gate": gate.stats(),
+        "roi": roi.tolist() if roi is not None else None,
+        "sampling": sampler.stats(),
+        "pipeline": {
+            "depth": depth,
+            "wall_ms": round(wall_time * 1000, 1),
+            "decode_ms": round(decoder.decode_time * 1000, 1),
+            "decode_stall_ms": round(decoder.stall_time * 1000, 1),
+            "inference_wait_ms": round(inference_wait * 1000, 1),
+            "tracking_ms": round(tracking_time * 1000, 1)
+        }
     }
     
-    cap.release()
-    
     # Log completion
     total_time = time.time() - start_time
     logger.info(f"✅ Video processing completed in {total_time:.2f}s - Processed {processed} frames - Server was responsive throughout")
     
-    return VideoDetections(
+    summary = VideoDetections(
         model=detector.model_name,
         total_frames=total,
         processed_frames=processed,
         fps_sample=fps_sample,
-        results=results,
         counts_by_label=unique_counts,  # Now returns unique object counts, not frame-by-frame counts
         tracking_info=tracking_info
     )
+    return VideoResult(summary, results)
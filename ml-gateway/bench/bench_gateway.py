@@ -0,0 +1,333 @@
+"""
+End-to-end gateway benchmark with a regression check, for comparing commits.
+
+Runs the FastAPI app in-process (ASGI, no network or server) with the model
+configured as for the server (environment / .env), and measures:
+
+    image     sequential /detect/image latency (mean, p50, p95)
+    load      /detect/image images/s and p95 latency at each --concurrency level
+    video     /detect/video sampled frames/s on a generated clip
+    tracker   update cost per frame at 10/100/1000 objects for each tracker
+    memory    peak RSS of the process (and of model worker processes)
+
+Everything is generated from fixed seeds, and the result cache is disabled,
+so two runs on the same machine measure the same work.
+
+Usage (from ml-gateway/):
+    python bench/bench_gateway.py --output bench-main.json
+    python bench/bench_gateway.py --baseline bench-main.json --threshold 0.10
+    python bench/bench_gateway.py --skip video,load --image ../test_image.jpg
+
+With --baseline, every metric is compared to the baseline file and the
+script exits with status 1 if any is worse by more than --threshold
+(relative). Latencies, costs and memory regress when they grow, throughput
+when it shrinks.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+# Identical images would otherwise be answered from the result cache after the first
+os.environ.setdefault("RESULT_CACHE_SIZE", "0")
+# The job queue would create its SQLite store under data/
+os.environ.setdefault("JOBS_WORKERS", "0")
+
+SECTIONS = ("image", "load", "video", "tracker")
+LOWER, HIGHER = "lower", "higher"
+
+
+def make_image(size=(1280, 720), seed: int = 0) -> bytes:
+    """Synthetic street-like JPEG: road gradient, lane marks and car-sized boxes."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    frame = np.empty((h, w, 3), np.uint8)
+    frame[...] = np.linspace(60, 160, h, dtype=np.uint8)[:, None, None]
+    cv2.line(frame, (w // 2, 0), (w // 2, h), (230, 230, 230), 6)
+    for _ in range(14):
+        x, y = int(rng.integers(0, w - 160)), int(rng.integers(h // 3, h - 90))
+        color = tuple(int(c) for c in rng.integers(20, 235, 3))
+        cv2.rectangle(frame, (x, y), (x + 160, y + 90), color, -1)
+    frame += rng.integers(0, 12, frame.shape, dtype=np.uint8)
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buf.tobytes()
+
+
+def make_clip(path: str, seconds: float, fps: int = 15, size=(960, 540), seed: int = 0):
+    """Synthetic clip of boxes driving across a static background."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    background = np.empty((h, w, 3), np.uint8)
+    background[...] = np.linspace(60, 160, h, dtype=np.uint8)[:, None, None]
+    n = 12
+    pos = rng.uniform([0, h / 3], [w, h - 80], (n, 2))
+    vel = rng.uniform(2, 9, (n, 1)) * rng.choice([-1, 1], (n, 1)) * [1, 0]
+    colors = [tuple(int(c) for c in rng.integers(20, 235, 3)) for _ in range(n)]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        raise SystemExit("OpenCV cannot write mp4 files here; run with --skip video")
+    for _ in range(int(seconds * fps)):
+        frame = background.copy()
+        pos += vel
+        pos[:, 0] %= w
+        for (x, y), color in zip(pos.astype(int), colors):
+            cv2.rectangle(frame, (x, y), (x + 120, y + 70), color, -1)
+        writer.write(frame)
+    writer.release()
+
+
+def percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 2) if values else 0.0
+
+
+def metric(value: float, unit: str, better: str) -> Dict:
+    return {"value": round(float(value), 3), "unit": unit, "better": better}
+
+
+async def bench_image(client, image: bytes, requests: int) -> Dict[str, Dict]:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        r = await client.post("/detect/image", files={"file": ("bench.jpg", image, "image/jpeg")})
+        latencies.append((time.perf_counter() - start) * 1000)
+        r.raise_for_status()
+    return {
+        "image.latency_ms.mean": metric(np.mean(latencies), "ms", LOWER),
+        "image.latency_ms.p50": metric(percentile(latencies, 50), "ms", LOWER),
+        "image.latency_ms.p95": metric(percentile(latencies, 95), "ms", LOWER),
+    }
+
+
+async def bench_load(client, image: bytes, concurrency: int, requests: int) -> Dict[str, Dict]:
+    """``requests`` uploads with at most ``concurrency`` in flight; 429s are retried and counted."""
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+    rejected = 0
+
+    async def one():
+        nonlocal rejected
+        async with gate:
+            while True:
+                start = time.perf_counter()
+                r = await client.post("/detect/image", files={"file": ("bench.jpg", image, "image/jpeg")})
+                if r.status_code != 429:
+                    break
+                rejected += 1
+                await asyncio.sleep(0.01)
+            r.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - start
+    prefix = f"load.c{concurrency}"
+    return {
+        f"{prefix}.images_per_s": metric(requests / wall, "img/s", HIGHER),
+        f"{prefix}.latency_ms.p95": metric(percentile(latencies, 95), "ms", LOWER),
+        f"{prefix}.rejected": metric(rejected, "requests", LOWER),
+    }
+
+
+async def bench_video(client, clip_path: str) -> Dict[str, Dict]:
+    with open(clip_path, "rb") as f:
+        data = f.read()
+    start = time.perf_counter()
+    r = await client.post("/detect/video", files={"file": ("bench.mp4", data, "video/mp4")})
+    wall = time.perf_counter() - start
+    r.raise_for_status()
+    frames = r.json()["processed_frames"]
+    return {
+        "video.frames_per_s": metric(frames / wall, "frames/s", HIGHER),
+        "video.request_s": metric(wall, "s", LOWER),
+    }
+
+
+def bench_tracker(sizes: List[int], frames: int, repeat: int = 3) -> Dict[str, Dict]:
+    """Best of ``repeat`` runs per tracker and size, which is far less noisy than the mean."""
+    from bench_tracker import make_scene  # sibling script in bench/
+    from app.tracker import TRACKERS
+    from app.video import make_tracker
+
+    out = {}
+    for n in sizes:
+        scene = make_scene(n, frames)
+        for method in TRACKERS:
+            runs = []
+            for _ in range(repeat):
+                tracker = make_tracker(method)
+                start = time.perf_counter()
+                for boxes, labels, _ in scene:
+                    tracker.update_boxes(boxes, labels)
+                runs.append((time.perf_counter() - start) / frames)
+            out[f"tracker.{method}.objects_{n}.update_us"] = metric(min(runs) * 1e6, "us", LOWER)
+    return out
+
+
+def peak_rss_mb() -> Dict[str, Dict]:
+    from app.config import settings
+
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    out = {"memory.peak_rss_mb": metric(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20, "MB", LOWER)}
+    # Largest model worker; they have exited (and been waited for) once the app has shut down
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if settings.serving_mode == "process" and children:
+        out["memory.worker_peak_rss_mb"] = metric(children * scale / 2**20, "MB", LOWER)
+    return out
+
+
+async def run_app(args, image: bytes, clip_path: Optional[str]) -> Dict[str, Dict]:
+    import httpx
+    from app.main import app
+    from app.infer import model_loader
+
+    results = {}
+    # ASGITransport does not send lifespan events, so run the lifespan here
+    async with app.router.lifespan_context(app):
+        load_start = time.perf_counter()
+        if not await asyncio.to_thread(model_loader.wait, args.load_timeout):
+            raise SystemExit(f"Model not ready after {args.load_timeout}s: {model_loader.status()}")
+        results["startup.model_ready_s"] = metric(time.perf_counter() - load_start, "s", LOWER)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for _ in range(args.warmup):
+                (await client.post("/detect/image", files={"file": ("bench.jpg", image, "image/jpeg")})).raise_for_status()
+            if "image" not in args.skip:
+                results.update(await bench_image(client, image, args.requests))
+            if "load" not in args.skip:
+                for c in args.concurrency:
+                    results.update(await bench_load(client, image, c, max(args.requests, c * 4)))
+            if clip_path:
+                results.update(await bench_video(client, clip_path))
+    return results
+
+
+def environment() -> Dict:
+    from app.config import settings
+
+    def git(*cmd) -> Optional[str]:
+        try:
+            return subprocess.run(["git", *cmd], cwd=BENCH_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    keys = ("model_kind", "serving_mode", "model_workers", "torch_optimization", "torch_threads_per_worker",
+            "batch_max_size", "batch_window_ms", "decode_min_side", "tile_size", "video_fps_sample",
+            "video_max_frames", "tracker_method")
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {k: getattr(settings, k, None) for k in keys},
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[Dict]:
+    """Per-metric relative change against the baseline; ``regressed`` marks changes beyond the threshold."""
+    rows = []
+    for name, m in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        before, after = old["value"], m["value"]
+        if before == 0:
+            change = 0.0 if after == 0 else float("inf")
+        else:
+            change = (after - before) / abs(before)
+        worse = change > threshold if m["better"] == LOWER else change < -threshold
+        rows.append({"metric": name, "baseline": before, "current": after, "change": change, "regressed": worse})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="JPEG to send (default: generated 1280x720 street scene)")
+    parser.add_argument("--requests", type=int, default=20, help="Sequential image requests (and minimum per load level)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="In-flight requests per load level")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed image requests before measuring")
+    parser.add_argument("--video-seconds", type=float, default=20.0, help="Length of the generated clip")
+    parser.add_argument("--tracker-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--tracker-frames", type=int, default=200)
+    parser.add_argument("--skip", default="", help=f"Comma-separated sections to skip: {','.join(SECTIONS)}")
+    parser.add_argument("--load-timeout", type=float, default=600.0, help="Seconds to wait for the model to load")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    parser.add_argument("--json", action="store_true", help="Print JSON only")
+    args = parser.parse_args()
+    args.skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+    unknown = args.skip - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown section(s): {', '.join(sorted(unknown))}")
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            image = f.read()
+    else:
+        image = make_image()
+
+    results: Dict[str, Dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        clip_path = None
+        if "video" not in args.skip:
+            clip_path = os.path.join(tmp, "bench.mp4")
+            make_clip(clip_path, args.video_seconds)
+        if not {"image", "load", "video"} <= args.skip:
+            results.update(asyncio.run(run_app(args, image, clip_path)))
+    if "tracker" not in args.skip:
+        results.update(bench_tracker(args.tracker_sizes, args.tracker_frames))
+    results.update(peak_rss_mb())
+
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(), "metrics": results}
+    rows = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)
+        rows = compare(results, base["metrics"], args.threshold)
+        report["baseline"] = {"commit": base.get("environment", {}).get("commit"), "threshold": args.threshold,
+                              "regressions": [r["metric"] for r in rows if r["regressed"]]}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        env = report["environment"]
+        print(f"commit {env['commit']}{' (dirty)' if env['dirty'] else ''}, {env['cpu_count']} CPUs, "
+              f"{env['settings']['model_kind']} / {env['settings']['serving_mode']}")
+        by_name = {r["metric"]: r for r in rows}
+        print(f"{'metric':<40} {'value':>12} {'unit':<9} {'baseline':>12} {'change':>8}")
+        for name, m in results.items():
+            row = by_name.get(name)
+            line = f"{name:<40} {m['value']:>12} {m['unit']:<9}"
+            if row:
+                flag = "  REGRESSION" if row["regressed"] else ""
+                line += f" {row['baseline']:>12} {row['change'] * 100:>+7.1f}%{flag}"
+            print(line)
+
+    if any(r["regressed"] for r in rows):
+        if not args.json:
+            print(f"\n{sum(r['regressed'] for r in rows)} metric(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+CPU inference-mode benchmark: latency and accuracy drift of each DETR
+optimization against the eager fp32 model on a fixed set of local images.
+
+Usage (from ml-gateway/):
+    python bench/bench_inference.py path/to/images/
+    python bench/bench_inference.py a.jpg b.jpg --modes none,int8 --threads 4 --channels-last
+
+The eager ("none") run is the reference: each optimized mode's detections
+are scored against it as if its boxes were ground truth, so mAP 1.0 means
+no drift. Scores below CONF_THRESHOLD are dropped by the model wrapper in
+both runs.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import TORCH_OPTIMIZATIONS, DetrModel, set_torch_threads  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+IOU_THRESHOLDS = np.arange(0.5, 0.96, 0.05)
+
+
+def load_images(paths: List[str]) -> List[np.ndarray]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            files.append(path)
+    images = [cv2.imread(f, cv2.IMREAD_COLOR) for f in files]
+    missing = [f for f, img in zip(files, images) if img is None]
+    if missing:
+        raise SystemExit(f"Unable to read: {', '.join(missing)}")
+    if not images:
+        raise SystemExit("No images found")
+    return images
+
+
+def to_arrays(result) -> Dict[str, np.ndarray]:
+    return {"boxes": result.boxes, "scores": result.scores, "labels": result.labels}
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def average_precision(reference: List[dict], candidate: List[dict], label: str, iou_threshold: float) -> float:
+    """All-point interpolated AP of ``candidate`` detections of one class against ``reference`` boxes."""
+    records = []  # (score, is_true_positive)
+    total = 0
+    for ref, cand in zip(reference, candidate):
+        gt = ref["boxes"][ref["labels"] == label]
+        mask = cand["labels"] == label
+        boxes, scores = cand["boxes"][mask], cand["scores"][mask]
+        total += len(gt)
+        taken = np.zeros(len(gt), dtype=bool)
+        ious = iou_matrix(boxes, gt) if len(gt) and len(boxes) else None
+        for i in np.argsort(-scores):
+            hit = False
+            if ious is not None:
+                overlaps = np.where(taken, -1.0, ious[i])
+                j = int(overlaps.argmax())
+                if overlaps[j] >= iou_threshold:
+                    taken[j] = hit = True
+            records.append((scores[i], hit))
+    if total == 0:
+        return float("nan")
+    if not records:
+        return 0.0
+
+    records.sort(key=lambda r: -r[0])
+    tp = np.cumsum([hit for _, hit in records])
+    fp = np.cumsum([not hit for _, hit in records])
+    recall = np.concatenate([[0.0], tp / total, [1.0]])
+    precision = np.concatenate([[1.0], tp / np.maximum(tp + fp, 1), [0.0]])
+    # Precision envelope, then area under the recall steps
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    steps = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1]))
+
+
+def mean_ap(reference: List[dict], candidate: List[dict], iou_threshold: float) -> float:
+    labels = set(label for ref in reference for label in ref["labels"])
+    if not labels:
+        return float("nan")
+    return float(np.mean([average_precision(reference, candidate, label, iou_threshold) for label in labels]))
+
+
+def run(model: DetrModel, images: List[np.ndarray], batch: int, warmup: int, repeat: int):
+    batches = [images[i:i + batch] for i in range(0, len(images), batch)]
+    for _ in range(warmup):
+        model.predict_batch(batches[0])
+
+    latencies = []
+    results = []
+    for r in range(repeat):
+        for chunk in batches:
+            start = time.perf_counter()
+            out = model.predict_batch(chunk)
+            latencies.append((time.perf_counter() - start) * 1000 / len(chunk))
+            if r == 0:
+                results += out
+    lat = np.array(latencies)
+    timing = {
+        "ms_per_image_mean": round(float(lat.mean()), 2),
+        "ms_per_image_p50": round(float(np.percentile(lat, 50)), 2),
+        "ms_per_image_p95": round(float(np.percentile(lat, 95)), 2),
+        "images_per_second": round(1000.0 / float(lat.mean()), 2),
+    }
+    return timing, [to_arrays(res) for res in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="+", help="Image files or directories")
+    parser.add_argument("--modes", default=",".join(TORCH_OPTIMIZATIONS),
+                        help=f"Comma-separated optimizations to compare (default: {','.join(TORCH_OPTIMIZATIONS)})")
+    parser.add_argument("--batch", type=int, default=1, help="Images per forward pass")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    parser.add_argument("--channels-last", action="store_true", help="Channels-last weights for the optimized modes")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed batches per mode (torch.compile compiles here)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the image set")
+    parser.add_argument("--json", action="store_true", help="Print JSON only")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in TORCH_OPTIMIZATIONS]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+    if "none" in modes:
+        modes.remove("none")
+    modes.insert(0, "none")  # the eager run is always the reference
+
+    images = load_images(args.images)
+    set_torch_threads(args.threads)
+
+    results = {}
+    reference = None
+    for mode in modes:
+        model = DetrModel(optimization=mode, channels_last=args.channels_last and mode != "none")
+        timing, dets = run(model, images, max(1, args.batch), args.warmup, max(1, args.repeat))
+        del model
+        gc.collect()
+        if reference is None:
+            reference = dets
+        timing["detections"] = int(sum(len(d["scores"]) for d in dets))
+        timing["map50_vs_eager"] = round(mean_ap(reference, dets, 0.5), 4)
+        timing["map50_95_vs_eager"] = round(float(np.mean([mean_ap(reference, dets, t) for t in IOU_THRESHOLDS])), 4)
+        results[mode] = timing
+
+    if args.json:
+        print(json.dumps({"images": len(images), "batch": args.batch, "modes": results}, indent=2))
+        return
+
+    base = results["none"]["ms_per_image_mean"] or 1e-9
+    print(f"{len(images)} images, batch {args.batch}")
+    print(f"{'mode':<8} {'ms/img':>8} {'p50':>8} {'p95':>8} {'img/s':>7} {'speedup':>8} {'dets':>6} {'mAP50':>7} {'mAP50-95':>9}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['ms_per_image_mean']:>8} {r['ms_per_image_p50']:>8} {r['ms_per_image_p95']:>8} "
+              f"{r['images_per_second']:>7} {base / (r['ms_per_image_mean'] or 1e-9):>7.2f}x {r['detections']:>6} "
+              f"{r['map50_vs_eager']:>7} {r['map50_95_vs_eager']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Image ingestion benchmark: time and extra memory per stage, from request
+bytes to the RGB PIL image the DETR pipeline consumes.
+
+Usage (from ml-gateway/):
+    python bench/bench_ingest.py                     # synthetic 4K JPEG
+    python bench/bench_ingest.py photo.jpg --min-side 800
+
+Paths:
+    baseline  imdecode -> Image.fromarray(img[:, :, ::-1])  (the original path)
+    fused     imdecode -> to_pil_rgb (channel swap inside PIL's unpacking)
+    reduced   IMREAD_REDUCED_* decode down to --min-side -> to_pil_rgb
+    raw-bgr   raw frame body -> zero-copy view -> to_pil_rgb
+    raw-rgb   raw RGB body -> reversed view -> to_pil_rgb
+
+"traced MB" is the peak of Python/NumPy allocations during the stage
+(tracemalloc), i.e. intermediate copies; "PIL MB" is the image PIL itself
+allocates (4 bytes per RGB pixel), which every path pays once.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ingest import decode_image, frame_from_bytes, to_pil_rgb  # noqa: E402
+
+
+def make_jpeg(size=(3840, 2160)) -> bytes:
+    """Synthetic street-like JPEG: smooth gradient plus a few boxes."""
+    w, h = size
+    frame = np.empty((h, w, 3), np.uint8)
+    frame[...] = np.linspace(30, 200, w, dtype=np.uint8)[None, :, None]
+    for k in range(12):
+        x, y = (k * 311) % (w - 300), (k * 173) % (h - 200)
+        cv2.rectangle(frame, (x, y), (x + 300, y + 160), (40 + k * 15, 90, 220 - k * 10), -1)
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buf.tobytes()
+
+
+def measure(fn, repeat: int):
+    """(result, mean ms, traced peak MB) of ``fn()`` over ``repeat`` runs."""
+    result = fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    ms = (time.perf_counter() - start) * 1000 / repeat
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, ms, peak / 2**20
+
+
+def pil_mb(img: Image.Image) -> float:
+    return img.width * img.height * 4 / 2**20
+
+
+def run_path(name: str, data: bytes, args, shape=None):
+    if name == "baseline":
+        decode = lambda: cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)  # noqa: E731
+        convert = lambda img: Image.fromarray(img[:, :, ::-1])  # noqa: E731
+    elif name in ("fused", "reduced"):
+        min_side = args.min_side if name == "reduced" else 0
+        decode = lambda: decode_image(data, min_side)[0]  # noqa: E731
+        convert = to_pil_rgb
+    else:
+        fmt = name.split("-")[1]
+        decode = lambda: frame_from_bytes(data, shape, fmt)  # noqa: E731
+        convert = to_pil_rgb
+
+    img, decode_ms, decode_mb = measure(decode, args.repeat)
+    pil, convert_ms, convert_mb = measure(lambda: convert(img), args.repeat)
+    return {
+        "frame": f"{img.shape[1]}x{img.shape[0]}",
+        "decode_ms": round(decode_ms, 2),
+        "decode_traced_mb": round(decode_mb, 2),
+        "to_pil_ms": round(convert_ms, 2),
+        "to_pil_traced_mb": round(convert_mb, 2),
+        "pil_mb": round(pil_mb(pil), 2),
+        "total_ms": round(decode_ms + convert_ms, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image", nargs="?", help="JPEG file (default: generated 4K JPEG)")
+    parser.add_argument("--min-side", type=int, default=800, help="Short side kept by the reduced decode")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print JSON only")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            data = f.read()
+    else:
+        data = make_jpeg()
+    bgr = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    raw_bgr = bgr.tobytes()
+    raw_rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB).tobytes()
+
+    results = {
+        "baseline": run_path("baseline", data, args),
+        "fused": run_path("fused", data, args),
+        "reduced": run_path("reduced", data, args),
+        "raw-bgr": run_path("raw-bgr", raw_bgr, args, bgr.shape),
+        "raw-rgb": run_path("raw-rgb", raw_rgb, args, bgr.shape),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    base = results["baseline"]["total_ms"] or 1e-9
+    print(f"{len(data) / 2**20:.1f} MB JPEG, {bgr.shape[1]}x{bgr.shape[0]}")
+    print(f"{'path':<9} {'frame':>10} {'decode ms':>10} {'traced MB':>10} {'to_pil ms':>10} {'traced MB':>10} "
+          f"{'PIL MB':>7} {'total ms':>9} {'speedup':>8}")
+    for name, r in results.items():
+        print(f"{name:<9} {r['frame']:>10} {r['decode_ms']:>10} {r['decode_traced_mb']:>10} {r['to_pil_ms']:>10} "
+              f"{r['to_pil_traced_mb']:>10} {r['pil_mb']:>7} {r['total_ms']:>9} {base / (r['total_ms'] or 1e-9):>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
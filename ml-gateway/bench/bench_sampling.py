@@ -0,0 +1,90 @@
+"""
+Frame-sampling benchmark: decoder work per sampled frame for each strategy.
+
+Usage (from ml-gateway/):
+    python bench/bench_sampling.py                      # synthetic 30 fps clip
+    python bench/bench_sampling.py path/to/video.mp4 --fps-sample 2
+
+"read" is the original behaviour (decode + convert every frame); "grab"
+and "seek" are the strategies used by app.sampling.FrameSampler.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.sampling import FrameSampler  # noqa: E402
+
+
+def make_clip(path: str, seconds: int = 20, fps: int = 30, size=(1280, 720)):
+    """Write a synthetic clip with a few moving boxes."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    w, h = size
+    for i in range(seconds * fps):
+        frame = np.full((h, w, 3), 40, np.uint8)
+        for k in range(5):
+            x = (i * (3 + k) + k * 200) % (w - 120)
+            y = 100 + k * 110
+            cv2.rectangle(frame, (x, y), (x + 120, y + 70), (0, 200 - k * 30, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def run(path: str, strategy: str, fps_sample: int, max_frames: int) -> dict:
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Unable to open {path}")
+    sampler = FrameSampler(cap, fps_sample, max_frames, strategy=strategy)
+    start = time.perf_counter()
+    for _ in sampler:
+        pass
+    elapsed = time.perf_counter() - start
+    cap.release()
+    stats = sampler.stats()
+    stats["seconds"] = round(elapsed, 4)
+    stats["ms_per_sampled"] = round(elapsed * 1000 / max(1, stats["sampled"]), 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?", help="Video file (default: generated synthetic clip)")
+    parser.add_argument("--fps-sample", type=int, default=2)
+    parser.add_argument("--max-frames", type=int, default=120)
+    parser.add_argument("--json", action="store_true", help="Print JSON only")
+    args = parser.parse_args()
+
+    tmpdir = None
+    path = args.video
+    if path is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmpdir.name, "synthetic.mp4")
+        make_clip(path)
+
+    try:
+        results = {s: run(path, s, args.fps_sample, args.max_frames) for s in ("read", "grab", "seek")}
+    finally:
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    base = results["read"]["seconds"] or 1e-9
+    print(f"{'strategy':<8} {'sampled':>8} {'grabbed/sample':>15} {'retrieved':>10} {'seeks':>6} {'ms/sample':>10} {'speedup':>8}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['sampled']:>8} {r['grabbed_per_sampled']:>15} {r['retrieved']:>10} "
+              f"{r['seeks']:>6} {r['ms_per_sampled']:>10} {base / (r['seconds'] or 1e-9):>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
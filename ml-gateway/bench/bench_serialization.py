@@ -0,0 +1,110 @@
+"""
+Video result serialization benchmark: encode time and payload size per
+layout and encoding, on a synthetic video result.
+
+Usage (from ml-gateway/):
+    python bench/bench_serialization.py                       # 600 frames x 40 boxes
+    python bench/bench_serialization.py --frames 2000 --boxes 80 --json
+
+Paths:
+    baseline          JSONResponse(res.model_dump()) of a VideoDetections (the original
+                      path; building its per-box models is not timed)
+    full/json         dicts from the frame arrays, pydantic's Rust serializer to bytes
+    columnar/json     per-frame flat arrays with a label table
+    full/msgpack      the same dicts packed as MessagePack (needs msgpack)
+    columnar/msgpack  columnar layout packed as MessagePack (needs msgpack)
+
+"gzip KB" is the size after gzip level 6, i.e. on the wire with
+compression enabled in front of the service.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from app.encoding import JSON_TYPE, MSGPACK_AVAILABLE, MSGPACK_TYPE, encode_video  # noqa: E402
+from app.detections import DetectionArrays, VideoFrame, VideoResult  # noqa: E402
+from app.schemas import VideoDetections  # noqa: E402
+
+LABELS = ["car", "truck", "bus", "motorcycle", "person", "bicycle"]
+
+
+def make_result(frames: int, boxes: int, seed: int = 0) -> VideoResult:
+    rng = np.random.default_rng(seed)
+    model = "facebook/detr-resnet-50"
+    results = []
+    for i in range(frames):
+        xy = rng.uniform(0, 1800, (boxes, 2))
+        wh = rng.uniform(20, 200, (boxes, 2))
+        scores = rng.uniform(0.5, 1.0, boxes)
+        labels = [LABELS[c] for c in rng.integers(0, len(LABELS), boxes)]
+        dets = DetectionArrays(model, np.hstack([xy, xy + wh]), scores, labels)
+        results.append(VideoFrame(i * 15, i / 2, dets))
+    summary = VideoDetections(
+        model=model, total_frames=frames * 15, processed_frames=frames, fps_sample=2,
+        counts_by_label={label: boxes for label in LABELS},
+        tracking_info={"total_unique_objects": boxes * 3, "method": "centroid"},
+    )
+    return VideoResult(summary, results)
+
+
+def measure(fn, repeat: int):
+    body = fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return body, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--boxes", type=int, default=40, help="Detections per frame")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print JSON only")
+    args = parser.parse_args()
+
+    res = make_result(args.frames, args.boxes)
+    models = VideoDetections.model_validate(res.to_dict())
+    paths = {
+        "baseline": lambda: JSONResponse(models.model_dump()).body,
+        "full/json": lambda: encode_video(res, "full", JSON_TYPE)[0],
+        "columnar/json": lambda: encode_video(res, "columnar", JSON_TYPE)[0],
+    }
+    if MSGPACK_AVAILABLE:
+        paths["full/msgpack"] = lambda: encode_video(res, "full", MSGPACK_TYPE)[0]
+        paths["columnar/msgpack"] = lambda: encode_video(res, "columnar", MSGPACK_TYPE)[0]
+
+    results = {}
+    for name, fn in paths.items():
+        body, ms = measure(fn, args.repeat)
+        results[name] = {
+            "encode_ms": round(ms, 2),
+            "kb": round(len(body) / 1024, 1),
+            "gzip_kb": round(len(gzip.compress(body, 6)) / 1024, 1),
+        }
+
+    if args.json:
+        print(json.dumps({"frames": args.frames, "boxes_per_frame": args.boxes, "paths": results}, indent=2))
+        return
+
+    base = results["baseline"]
+    print(f"{args.frames} frames x {args.boxes} boxes ({args.frames * args.boxes} detections)"
+          f"{'' if MSGPACK_AVAILABLE else '; msgpack not installed, MessagePack paths skipped'}")
+    print(f"{'path':<17} {'encode ms':>10} {'speedup':>8} {'KB':>9} {'size':>6} {'gzip KB':>8}")
+    for name, r in results.items():
+        print(f"{name:<17} {r['encode_ms']:>10} {base['encode_ms'] / (r['encode_ms'] or 1e-9):>7.1f}x "
+              f"{r['kb']:>9} {r['kb'] / base['kb']:>5.0%} {r['gzip_kb']:>8}")
+
+
+if __name__ == "__main__":
+    main()